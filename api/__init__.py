@@ -0,0 +1 @@
+from api.v1 import api_v1, http_error
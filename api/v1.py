@@ -0,0 +1,198 @@
+from flask import Blueprint, current_app, jsonify, request, url_for
+from werkzeug.exceptions import HTTPException
+
+from data_model import year_value
+from datamanager.pagination import PAGE_SIZE, clamp_limit
+from services.movie_lookup import lookup_movie
+
+api_v1 = Blueprint('api_v1', __name__, url_prefix='/api/v1')
+
+
+def _data_manager():
+    return current_app.extensions['data_manager']
+
+
+def _fields():
+    """Parses the sparse fieldset from ?fields=a,b."""
+    fields = request.args.get('fields')
+    return [name.strip() for name in fields.split(',') if name.strip()] if fields else None
+
+
+def _error(status, message):
+    response = jsonify({'error': {'status': status, 'message': message}})
+    response.status_code = status
+    return response
+
+
+def _page_response(page, endpoint, **view_args):
+    """Serializes a Page with links to its neighbouring pages."""
+    if page is None:
+        return _error(404, "User not found")
+    args = {key: value for key, value in request.args.items() if key not in ('after', 'before')}
+    args.update(view_args)
+    args['sort'] = page.sort
+    return jsonify({
+        'data': page.items,
+        'next': url_for(endpoint, after=page.next_cursor, **args) if page.next_cursor else None,
+        'prev': url_for(endpoint, before=page.prev_cursor, **args) if page.prev_cursor else None,
+    })
+
+
+def _list(resource, endpoint, **view_args):
+    try:
+        page = _data_manager().get_records(
+            resource, _fields(), request.args.get('sort'), after=request.args.get('after'),
+            before=request.args.get('before'), limit=request.args.get('limit', PAGE_SIZE),
+            user_id=view_args.get('user_id'))
+    except ValueError as error:
+        return _error(400, str(error))
+    return _page_response(page, endpoint, **view_args)
+
+
+def _get(resource, record_id, user_id=None):
+    try:
+        record = _data_manager().get_record(resource, record_id, _fields(), user_id=user_id)
+    except ValueError as error:
+        return _error(400, str(error))
+    if record is None:
+        return _error(404, "Not found")
+    return jsonify({'data': record})
+
+
+def _json_body():
+    body = request.get_json(silent=True)
+    return body if isinstance(body, dict) else {}
+
+
+@api_v1.errorhandler(HTTPException)
+def http_error(error):
+    """Returns HTTP errors as JSON instead of HTML pages."""
+    return _error(error.code, error.description)
+
+
+@api_v1.route('/users', methods=['GET'])
+def list_users():
+    """Lists users: ?fields=, ?sort=name|recent, ?after=, ?before=, ?limit=."""
+    return _list('users', 'api_v1.list_users')
+
+
+@api_v1.route('/users', methods=['POST'])
+def create_user():
+    """Creates a user from {"name": ...}."""
+    name = str(_json_body().get('name') or '').strip()
+    if not name:
+        return _error(400, "name is required")
+    user = _data_manager().add_user(name)
+    if not user:
+        return _error(409, "User already exists")
+    response = jsonify({'data': {'id': user.id, 'name': user.name}})
+    response.status_code = 201
+    response.headers['Location'] = url_for('api_v1.get_user', user_id=user.id)
+    return response
+
+
+@api_v1.route('/users/<int:user_id>', methods=['GET'])
+def get_user(user_id):
+    """Returns one user."""
+    return _get('users', user_id)
+
+
+@api_v1.route('/users/<int:user_id>', methods=['DELETE'])
+def delete_user(user_id):
+    """Deletes a user and their collection."""
+    if _data_manager().get_record('users', user_id, ['id']) is None:
+        return _error(404, "User not found")
+    _data_manager().delete_user(user_id)
+    return '', 204
+
+
+@api_v1.route('/users/<int:user_id>/movies', methods=['GET'])
+def list_user_movies(user_id):
+    """Lists a user's collection: ?fields=, ?sort=recent|title|year|rating, cursors."""
+    return _list('user_movies', 'api_v1.list_user_movies', user_id=user_id)
+
+
+@api_v1.route('/users/<int:user_id>/movies', methods=['POST'])
+def add_user_movie(user_id):
+    """Adds a movie by {"title": ..., "year": ...}; the year is optional."""
+    data_manager = _data_manager()
+    if data_manager.get_record('users', user_id, ['id']) is None:
+        return _error(404, "User not found")
+    body = _json_body()
+    title = str(body.get('title') or '').strip()
+    if not title:
+        return _error(400, "title is required")
+    year = str(body.get('year') or '').strip() or None
+    if year is not None and year_value(year) is None:
+        return _error(400, "year must be a release year")
+    movie = lookup_movie(data_manager, title, year=year)
+    if not movie:
+        return _error(502, "Error fetching data")
+    if 'error' in movie:
+        return _error(404, movie['error'])
+    movie_id, error = data_manager.add_movie(movie, user_id)
+    if error:
+        return _error(409 if error == "Movie already exists" else 500, error)
+    poster_verifier = current_app.extensions.get('poster_verifier')
+    if poster_verifier:
+        poster_verifier.submit(movie.get('Poster'))
+    response = _get('user_movies', movie_id, user_id=user_id)
+    if response.status_code == 200:
+        response.status_code = 201
+    return response
+
+
+@api_v1.route('/users/<int:user_id>/movies/<int:movie_id>', methods=['GET'])
+def get_user_movie(user_id, movie_id):
+    """Returns one movie of a user's collection."""
+    return _get('user_movies', movie_id, user_id=user_id)
+
+
+@api_v1.route('/users/<int:user_id>/movies/<int:movie_id>', methods=['PATCH', 'PUT'])
+def rate_user_movie(user_id, movie_id):
+    """Sets the user's rating from {"rating": 0-10}."""
+    data_manager = _data_manager()
+    user_movie = data_manager.get_user_movie(user_id, movie_id)
+    if not user_movie:
+        return _error(404, "Movie not found")
+    try:
+        rating = float(str(_json_body().get('rating')).replace(',', '.'))
+    except ValueError:
+        return _error(400, "rating must be a number")
+    if not 0.0 < rating < 10.0:
+        return _error(400, "Rating must be between 0 and 10")
+    if not data_manager.update_movie(user_movie, rating):
+        return _error(500, "No update was made")
+    return _get('user_movies', movie_id, user_id=user_id)
+
+
+@api_v1.route('/users/<int:user_id>/movies/<int:movie_id>', methods=['DELETE'])
+def delete_user_movie(user_id, movie_id):
+    """Removes a movie from a user's collection."""
+    if not _data_manager().delete_movie(user_id, movie_id):
+        return _error(404, "Movie not found")
+    return '', 204
+
+
+@api_v1.route('/movies', methods=['GET'])
+def list_movies():
+    """Lists the catalog: ?fields=, ?sort=title|year|rating|user_rating|most_rated|recent."""
+    return _list('movies', 'api_v1.list_movies')
+
+
+@api_v1.route('/movies/search', methods=['GET'])
+def search_movies():
+    """Searches the catalog: ?q=, ?fields=, ?limit=."""
+    query = request.args.get('q', '').strip()
+    try:
+        records = _data_manager().search_records(
+            query, _fields(), limit=clamp_limit(request.args.get('limit', 20)))
+    except ValueError as error:
+        return _error(400, str(error))
+    return jsonify({'data': records})
+
+
+@api_v1.route('/movies/<int:movie_id>', methods=['GET'])
+def get_movie(movie_id):
+    """Returns one catalog movie."""
+    return _get('movies', movie_id)
@@ -1,168 +1,204 @@
-import json
 import os
-from json import JSONDecodeError
 
-from flask import Flask, render_template, request, abort, redirect, url_for
+from flask import Flask
+
+from api import api_v1
+from datamanager import create_data_manager
+from datamanager.orphan_gc import OrphanCollector
+from services.assets import AssetPipeline
+from services.cache_purger import CachePurger, CACHE_PURGE_INTERVAL
+from services.omdb_api import omdb_client
+from services.compression import Compression, COMPRESS_LEVEL, COMPRESS_MIN_SIZE
+from services.coordination import (ChangeFeed, DailyBudget, LeaderLock, coordination_path,
+                                   COORDINATION_PATH)
+from services.instrumentation import Instrumentation
+from services.metadata_refresher import (MetadataRefresher, METADATA_MAX_AGE,
+                                         METADATA_REFRESH_BATCH, METADATA_REFRESH_BUDGET,
+                                         METADATA_REFRESH_INTERVAL)
+from services.metrics import metrics
+from services.omdb_async import AsyncOmdbSearch
+from services.omdb_cache import omdb_cache
+from services.movie_staging import MovieStaging, create_staging_backend, MOVIE_STAGING_TTL
+from services.poster_mirror import PosterMirror
+from services.poster_verifier import PosterVerifier, poster_url
+from services.recommendations import (RecommendationIndex, RECOMMENDATION_FEED_INTERVAL,
+                                      RECOMMENDATION_NEIGHBORS)
+from services.response_cache import ResponseCache, create_cache_backend, RESPONSE_CACHE_TTL
+from views import web
 
-from datamanager.sqlite_data_manager import SQLiteDataManager
-from services.omdb_api import fetch_movie_data as fetch_from_api, check_poster_availability
-
-app = Flask(__name__)
 BASE_DIR = os.path.abspath(os.path.dirname(__file__))
 
-app.config[
-    'SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(BASE_DIR,
-                                                           'data', 'moviwebapp.db')}"
-
-data_manager = SQLiteDataManager(app)
-
-
-@app.route('/', methods=['GET', 'POST'])
-def home():
-    """Displays the homepage."""
-    return render_template("home.html")
 
-
-@app.route('/users')
-def list_users():
-    """Lists all registered users."""
-    users = data_manager.get_all_users()
-    return render_template('list_users.html', users=users)
-
-
-@app.route('/users/<int:user_id>', methods=["GET"])
-def list_user_movies(user_id):
+def create_app(config=None):
     """
-       Displays and manages a specific user's movie collection.
-       Allows adding, rating, and deleting movies for a given user.
+    Creates the application and its services.
+
+    Every call builds its own engines, caches and worker threads, so
+    process managers that fork should call it in each worker, after the
+    fork (see wsgi.py). Besides the keys the services read, it reads:
+    BACKGROUND_WORKERS: start the threads that verify posters, refresh
+    metadata and recommendations, sweep orphans and purge expired cache
+    rows; False for one-off apps, e.g. running migrations before workers
+    start
+    COORDINATION_BACKEND: "process" for a single process, "sqlite" when
+    several worker processes share the host (see gunicorn.conf.py): only
+    the process holding the leader lock runs the singleton jobs, the
+    metadata budget is counted across processes and every process's
+    recommendations hear about the others' rating changes
+    WARM_UP_CONNECTIONS: database connections opened per engine at boot
+
+    :param config: Mapping applied over the defaults and FLASK_* variables
+    :return: Flask app with its services in app.extensions
     """
-    user_movies = data_manager.get_user_movies(user_id)
-
-    return render_template("user_movies.html",
-                           user_id=user_id,
-                           user_movies=user_movies)
-
-
-@app.route('/users/add', methods=['GET', 'POST'])
-def add_user():
-    """Allows a new user to be added."""
-    if request.method == 'POST':
-        username = request.form.get('name')
-        if not username:
-            return render_template('add_user.html',
-                                   error='Username is required')
-
-        result = data_manager.add_user(username)
-        if not result:
-            return render_template('add_user.html',
-                                   error='Failed to add user (maybe duplicate?)')
-
-        return render_template('add_user.html',
-                               message=f'User added successfully')
-
-    return render_template('add_user.html')
-
-
-@app.route('/users/<int:user_id>/update_movie/<int:movie_id>', methods=['GET', 'POST'])
-def update_movie(user_id, movie_id):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = (
+        f"sqlite:///{os.path.join(BASE_DIR, 'data', 'moviwebapp.db')}")
+    app.config['SQLITE_READ_POOL_SIZE'] = 5
+    app.config.from_prefixed_env()
+    app.config.update(config or {})
+    background = app.config.setdefault('BACKGROUND_WORKERS', True)
+    shared_path = coordination_path(app.config.setdefault('COORDINATION_BACKEND', 'process'),
+                                    app.config.setdefault('COORDINATION_PATH', COORDINATION_PATH))
+
+    data_manager = create_data_manager(app)
+    leader_lock = LeaderLock(shared_path and f"{shared_path}.lock")
+    change_feed = None
+    if shared_path is not None:
+        change_feed = ChangeFeed(shared_path)
+        data_manager.subscribe("data_changed", change_feed.publish)
+    poster_mirror = PosterMirror(omdb_client)
+    data_manager.subscribe("posters_released", poster_mirror.remove)
+    poster_verifier = PosterVerifier(app, data_manager, omdb_client, mirror=poster_mirror)
+    orphan_collector = OrphanCollector(app, data_manager,
+                                       interval=app.config.setdefault('ORPHAN_GC_INTERVAL', 60))
+    omdb_search = AsyncOmdbSearch(omdb_client)
+    daily_budget = app.config.setdefault('METADATA_REFRESH_BUDGET', METADATA_REFRESH_BUDGET)
+    metadata_refresher = MetadataRefresher(
+        app, data_manager, omdb_client, poster_verifier=poster_verifier,
+        daily_budget=daily_budget, budget=DailyBudget(daily_budget, shared_path),
+        batch_size=app.config.setdefault('METADATA_REFRESH_BATCH', METADATA_REFRESH_BATCH),
+        interval=app.config.setdefault('METADATA_REFRESH_INTERVAL', METADATA_REFRESH_INTERVAL),
+        max_age=app.config.setdefault('METADATA_MAX_AGE', METADATA_MAX_AGE))
+    response_cache = ResponseCache(
+        create_cache_backend(app.config.setdefault('RESPONSE_CACHE_BACKEND', 'memory')),
+        ttl=app.config.setdefault('RESPONSE_CACHE_TTL', RESPONSE_CACHE_TTL))
+    data_manager.subscribe("data_changed", response_cache.data_changed)
+    movie_staging = MovieStaging(
+        create_staging_backend(app.config.setdefault('MOVIE_STAGING_BACKEND', 'memory')),
+        ttl=app.config.setdefault('MOVIE_STAGING_TTL', MOVIE_STAGING_TTL))
+    cache_purger = CachePurger(
+        [omdb_cache.persistent, movie_staging.backend, response_cache.backend],
+        interval=app.config.setdefault('CACHE_PURGE_INTERVAL', CACHE_PURGE_INTERVAL))
+    recommendations = RecommendationIndex(
+        app, data_manager,
+        neighbors=app.config.setdefault('RECOMMENDATION_NEIGHBORS', RECOMMENDATION_NEIGHBORS),
+        feed=change_feed,
+        feed_interval=app.config.setdefault('RECOMMENDATION_FEED_INTERVAL',
+                                            RECOMMENDATION_FEED_INTERVAL))
+    data_manager.subscribe("data_changed", recommendations.data_changed)
+
+    def start_singleton_jobs():
+        """Starts the jobs that must run in one process only."""
+        poster_verifier.submit_pending()
+        if app.config.get('ORPHAN_GC_MODE') == 'deferred':
+            orphan_collector.start()
+        if metadata_refresher.daily_budget > 0:
+            metadata_refresher.start()
+        cache_purger.purge()
+        cache_purger.start()
+
+    if background:
+        recommendations.start()
+        leader_lock.run_when_leader(start_singleton_jobs)
+    with app.app_context():
+        instrumentation = Instrumentation(
+            app, data_manager.engines(),
+            slow_request_threshold=app.config.setdefault('SLOW_REQUEST_THRESHOLD', None))
+    AssetPipeline(app)
+    Compression(app, min_size=app.config.setdefault('COMPRESS_MIN_SIZE', COMPRESS_MIN_SIZE),
+                level=app.config.setdefault('COMPRESS_LEVEL', COMPRESS_LEVEL))
+    app.extensions.update(
+        data_manager=data_manager, poster_mirror=poster_mirror, poster_verifier=poster_verifier,
+        orphan_collector=orphan_collector, omdb_search=omdb_search,
+        metadata_refresher=metadata_refresher, response_cache=response_cache,
+        movie_staging=movie_staging, cache_purger=cache_purger,
+        recommendations=recommendations, instrumentation=instrumentation,
+        leader_lock=leader_lock, change_feed=change_feed)
+    app.register_blueprint(web)
+    app.register_blueprint(api_v1)
+    app.add_template_filter(poster_url)
+    app.add_template_global(response_cache.fragment, 'cached_fragment')
+    register_metrics(app)
+
+    precompile_templates(app)
+    with app.app_context():
+        data_manager.warm_up(app.config.setdefault('WARM_UP_CONNECTIONS', 1))
+    app.extensions['ready'] = True
+    return app
+
+
+def register_metrics(app):
+    """Exposes the cache and OMDb search counters of an app's services."""
+    omdb_search = app.extensions['omdb_search']
+    caches = {
+        'omdb_memory': omdb_cache.memory,
+        'omdb_persistent': omdb_cache.persistent,
+        'omdb_search': omdb_search.cache,
+        'response': app.extensions['response_cache'].backend,
+        'movie_staging': app.extensions['movie_staging'].backend,
+    }
+
+    def cache_lookups():
+        """Hit and miss counters of the OMDb, search, response and staging caches."""
+        lookups = {}
+        for name, cache in caches.items():
+            lookups[(name, 'hit')] = cache.hits
+            lookups[(name, 'miss')] = cache.misses
+        return lookups
+
+    metrics.counter_callback("cache_lookups_total", "Cache hits and misses since startup.",
+                             ("cache", "result"), cache_lookups)
+    metrics.counter_callback("omdb_search_flights_total",
+                             "OMDb search calls started and shared.", ("result",),
+                             lambda: {'started': omdb_search.flights.calls,
+                                      'shared': omdb_search.flights.shared})
+
+
+def precompile_templates(app):
+    """Compiles every template into Jinja's cache, so first requests skip parsing."""
+    for name in app.jinja_env.list_templates():
+        app.jinja_env.get_template(name)
+
+
+def shutdown_app(app):
     """
-      Updates the rating of a specific movie.
-      Displays current data and accepts new rating via form.
+    Stops an app's worker threads and closes its connections.
+
+    The app reports itself unready first. Loops finish their current
+    batch, poster checks that have not started are dropped (they are
+    queued again on the next start) and queued rating updates are
+    committed before the engines are disposed.
     """
-    movie = data_manager.get_user_movie(user_id, movie_id)
-    if not movie:
-        abort(404, description="Movie not found")
-
-    if request.method == 'POST':
-        rating = request.form.get('rating')
-        if not rating:
-            return render_template('update_movie.html', movie=movie,
-                                   user_id=user_id)
-        rating_str = rating.replace(',', '.')
-
-        try:
-            rating_float = float(rating_str)
-            if not 0.0 < rating_float < 10.0:
-                return render_template('update_movie.html', movie=movie,
-                                       error="Rating must be between 0 and 10", user_id=user_id)
-        except (ValueError, TypeError):
-            return render_template('update_movie.html', movie=movie,
-                                   error="Please enter a valid rating between 0 and 10.",
-                                   user_id=user_id)
-
-        result = data_manager.update_movie(movie, rating_float)
-        if not result:
-            if not result:
-                return render_template("update_movie.html", movie=movie,
-                                       error="No update was made", user_id=user_id)
-
-    return render_template('update_movie.html', movie=movie, user_id=user_id)
-
-
-@app.route('/users/delete/<int:user_id>', methods=['POST'])
-def delete_user(user_id):
-    """delete a user in the database."""
-    data_manager.delete_user(user_id)
-    return redirect(url_for('list_users'))
-
-
-@app.route('/movies')
-def list_movies():
-    """Lists all movies in the database."""
-    movies = data_manager.get_all_movies()
-    return render_template('list_movies.html', movies=movies)
-
-
-@app.route('/users/<int:user_id>/add_movie', methods=["GET", "POST"])
-def add_movie(user_id):
-    """add a movie in the database."""
-    if request.method == 'POST':
-        movie_title = request.form.get('Title')
-        if movie_title:
-            movie = fetch_from_api(movie_title)
-            if 'error' in movie:
-                return render_template('add_movie.html',
-                                       error=movie['error'], user_id=user_id)
-            movie['Poster'] = check_poster_availability(movie.get('Poster', ''))
-            return render_template('add_movie.html', movie=movie,
-                                   user_id=user_id)
-
-        movie_data = request.form.get("movie_json")
-        if movie_data:
-            try:
-                movie_data = json.loads(movie_data.replace("'", '"'))
-            except (TypeError, JSONDecodeError):
-                return render_template("add_movie.html",
-                                       error="Error fetching data", user_id=user_id)
-
-            error = data_manager.add_movie(movie_data, user_id)
-            if error:
-                return render_template('add_movie.html', error=error,
-                                       user_id=user_id)
-            return render_template('add_movie.html',
-                                   error=f"{movie_data.get('Title')} added successfully",
-                                   user_id=user_id)
-    return render_template('add_movie.html', user_id=user_id)
-
-
-@app.route('/users/<int:user_id>/delete_movie/<int:movie_id>', methods=['POST'])
-def delete_movie(user_id, movie_id):
-    """Deletes a movie from a user's collection."""
-    data_manager.delete_movie(user_id, movie_id)
-    return redirect(url_for('list_user_movies', user_id=user_id))
-
-
-@app.errorhandler(400)
-def bad_request(error):
-    """Handles bad request (400) errors with a custom error page."""
-    return render_template("error.html", error=error)
-
-
-@app.errorhandler(404)
-def not_found(error):
-    """Handles not found (404) errors with a custom error page."""
-    return render_template("error.html", error=error)
+    extensions = app.extensions
+    extensions['ready'] = False
+    # Stop waiting for the lock first, so no job starts after it is stopped.
+    extensions['leader_lock'].stop()
+    extensions['metadata_refresher'].stop()
+    extensions['orphan_collector'].stop()
+    extensions['recommendations'].stop()
+    extensions['cache_purger'].stop()
+    extensions['omdb_search'].shutdown()
+    extensions['poster_verifier'].shutdown(cancel_pending=True)
+    extensions['leader_lock'].release()
+    if extensions['change_feed'] is not None:
+        extensions['change_feed'].close()
+    with app.app_context():
+        extensions['data_manager'].close()
 
 
 if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=5002, debug=True)
+    dev_app = create_app()
+    try:
+        dev_app.run(host="0.0.0.0", port=5002, debug=True)
+    finally:
+        shutdown_app(dev_app)
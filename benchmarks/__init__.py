@@ -0,0 +1,8 @@
+"""
+Benchmark suite for the routes and data managers.
+
+Run from the repository root:
+
+    python -m benchmarks.run --users 200 --movies 2000 --links 25 --output before.json
+    python -m benchmarks.compare before.json after.json
+"""
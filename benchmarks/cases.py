@@ -0,0 +1,289 @@
+import io
+import itertools
+from datetime import datetime, timezone
+from typing import NamedTuple
+
+from datamanager.pagination import MOVIE_SORTS, USER_SORTS, USER_MOVIE_SORTS, LEADERBOARD_SORTS
+from datamanager.records import RESOURCES
+from services.response_cache import EPOCH
+
+from benchmarks.harness import Case
+from benchmarks.seed import movie_title, synthetic_movie, user_name
+
+WRITER = "bench-writer"
+IMPORT_ROWS = 50
+
+
+class BenchmarkError(Exception):
+    """A benchmarked operation did not produce the expected result."""
+
+
+class Fixture(NamedTuple):
+    """Ids of seeded rows the cases operate on."""
+    user_id: int
+    movie_id: int
+    writer_id: int
+    popular_movie_id: int
+    popular_title: str
+    poster_digest: str
+    titles: list
+
+
+def load_fixture(web, stub, movies):
+    """Looks up the seeded rows used by the cases and prepares a writer user."""
+    data_manager = web.data_manager
+    with web.app.app_context():
+        user_id = data_manager.get_user_by_name(user_name(0)).id
+        movie_id = data_manager.get_user_movies_page(user_id).items[0].movie_id
+        popular = data_manager.get_top_movies_page("most_rated").items[0]
+        writer = data_manager.add_user(WRITER) or data_manager.get_user_by_name(WRITER)
+        fixture = Fixture(user_id=user_id, movie_id=movie_id, writer_id=writer.id,
+                          popular_movie_id=popular.id, popular_title=popular.title,
+                          poster_digest=web.poster_mirror.mirror(stub.poster_url(1)),
+                          titles=[movie_title(number) for number in range(min(movies, 100))])
+    return fixture
+
+
+def _expect(response, *statuses):
+    if response.status_code not in statuses:
+        raise BenchmarkError(f"{response.request.method} {response.request.path} returned "
+                             f"{response.status_code}, expected {statuses}")
+    return response
+
+
+def _link_popular(web, fixture, stub_url):
+    """Adds the most rated movie to the writer's collection and returns its id."""
+    data_manager = web.data_manager
+    number = int(fixture.popular_title.rsplit(" ", 1)[-1])
+    data_manager.import_watchlist_chunk([{
+        'line': 1, 'user': WRITER, 'title': fixture.popular_title, 'rating': 5.0,
+        'movie': synthetic_movie(number, stub_url)}])
+    return data_manager.get_movies_by_titles([fixture.popular_title])[fixture.popular_title]
+
+
+def route_cases(web, fixture, stub_url):
+    """Cases driving every route of the app through the Flask test client."""
+    client = web.app.test_client()
+    counter = itertools.count()
+    user, movie = fixture.user_id, fixture.movie_id
+
+    def get(path, *statuses, **kwargs):
+        return lambda _: _expect(client.get(path, **kwargs), *(statuses or (200,)))
+
+    def download(path, **kwargs):
+        return lambda _: len(_expect(client.get(path, **kwargs), 200).get_data())
+
+    def cold():
+        web.response_cache.bump(EPOCH)
+
+    def new_user():
+        return web.data_manager.add_user(f"bench-route-{next(counter)}").id
+
+    def link_popular():
+        return _link_popular(web, fixture, stub_url)
+
+    def import_csv(_):
+        name = f"bench-import-{next(counter)}"
+        rows = "".join(f"{name},{title},7.5\n" for title in fixture.titles[:10])
+        data = {'file': (io.BytesIO(f"user,title,rating\n{rows}".encode()), "watchlist.csv")}
+        return _expect(client.post("/import", data=data, content_type="multipart/form-data"), 200)
+
+    def stage_movie():
+        movie_data = synthetic_movie(1_000_000 + next(counter), stub_url)
+        return web.movie_staging.stage(fixture.writer_id, movie_data)
+
+    def confirm_movie(token):
+        return _expect(client.post(f"/users/{fixture.writer_id}/add_movie",
+                                   data={'movie_token': token}), 200)
+
+    cases = [
+        Case("GET /", "routes", get("/"), concurrent=True),
+        Case("GET /static/style.css", "routes", get("/static/style.css"), concurrent=True),
+        Case("GET /assets/<fingerprinted> (gzip)", "routes",
+             get(f"/assets/{web.assets.manifest['style.css']}",
+                 headers={'Accept-Encoding': 'gzip'}),
+             concurrent=True),
+        Case("GET /metrics", "routes", get("/metrics"), concurrent=True),
+        Case("GET /healthz", "routes", get("/healthz"), concurrent=True),
+        Case("GET /readyz", "routes", get("/readyz"), concurrent=True),
+        Case("GET /movies/search?q=synthetic 0001", "routes",
+             get("/movies/search?q=synthetic%200001"), concurrent=True),
+        Case("GET /movies/search?q=director 42", "routes",
+             get("/movies/search?q=director%2042"), concurrent=True),
+        Case("GET /movies/export (csv)", "routes", download("/movies/export"), concurrent=True),
+        Case("GET /movies/export (jsonl, gzip)", "routes",
+             download("/movies/export?format=jsonl", headers={'Accept-Encoding': 'gzip'}),
+             concurrent=True),
+        Case("GET /users/<id>/export", "routes", download(f"/users/{user}/export"),
+             concurrent=True),
+        Case("GET /movies/suggest (cached)", "routes", get("/movies/suggest?q=benchmark"),
+             concurrent=True),
+        Case("GET /movies/suggest (OMDb stub)", "routes",
+             lambda _: _expect(client.get(f"/movies/suggest?q=stub{next(counter)}"), 200)),
+        Case("GET /users/<id>/recommendations", "routes",
+             get(f"/users/{user}/recommendations"), concurrent=True),
+        Case("GET /users/add", "routes", get("/users/add"), concurrent=True),
+        Case("POST /users/add", "routes", lambda _: _expect(client.post(
+            "/users/add", data={'name': f"bench-new-{next(counter)}"}), 200)),
+        Case("GET /users/<id>/add_movie", "routes", get(f"/users/{user}/add_movie"),
+             concurrent=True),
+        Case("POST /users/<id>/add_movie (local title)", "routes", lambda _: _expect(client.post(
+            f"/users/{user}/add_movie", data={'Title': fixture.popular_title}), 200)),
+        Case("POST /users/<id>/add_movie (OMDb stub)", "routes", lambda _: _expect(client.post(
+            f"/users/{user}/add_movie", data={'Title': f"Stub Film {next(counter)}"}), 200)),
+        Case("POST /users/<id>/add_movie (confirm)", "routes", confirm_movie,
+             setup=stage_movie),
+        Case("GET /users/<id>/update_movie/<id>", "routes",
+             get(f"/users/{user}/update_movie/{movie}"), concurrent=True),
+        Case("POST /users/<id>/update_movie/<id>", "routes", lambda _: _expect(client.post(
+            f"/users/{user}/update_movie/{movie}",
+            data={'rating': str(1 + next(counter) % 8)}), 200)),
+        Case("POST /users/<id>/delete_movie/<id>", "routes", lambda movie_id: _expect(
+            client.post(f"/users/{fixture.writer_id}/delete_movie/{movie_id}"), 302),
+             setup=link_popular),
+        Case("POST /users/delete/<id>", "routes", lambda user_id: _expect(
+            client.post(f"/users/delete/{user_id}"), 302), setup=new_user),
+        Case("POST /import", "routes", import_csv),
+        Case("GET /posters/<digest>", "routes", get(f"/posters/{fixture.poster_digest}"),
+             concurrent=True),
+        Case("GET /api/v1/users", "routes", get("/api/v1/users"), concurrent=True),
+        Case("GET /api/v1/users/<id>", "routes", get(f"/api/v1/users/{user}"), concurrent=True),
+        Case("GET /api/v1/users/<id>/movies", "routes", get(f"/api/v1/users/{user}/movies"),
+             concurrent=True),
+        Case("GET /api/v1/users/<id>/movies/<id>", "routes",
+             get(f"/api/v1/users/{user}/movies/{movie}"), concurrent=True),
+        Case("GET /api/v1/movies", "routes", get("/api/v1/movies"), concurrent=True),
+        Case("GET /api/v1/movies?fields=id,title&limit=100 (gzip)", "routes",
+             get("/api/v1/movies?fields=id,title&limit=100",
+                 headers={'Accept-Encoding': 'gzip'}), concurrent=True),
+        Case("GET /api/v1/movies/<id>", "routes", get(f"/api/v1/movies/{movie}"),
+             concurrent=True),
+        Case("GET /api/v1/movies/search?q=synthetic", "routes",
+             get("/api/v1/movies/search?q=synthetic"), concurrent=True),
+        Case("POST /api/v1/users", "routes", lambda _: _expect(client.post(
+            "/api/v1/users", json={'name': f"bench-api-{next(counter)}"}), 201)),
+        Case("DELETE /api/v1/users/<id>", "routes", lambda user_id: _expect(
+            client.delete(f"/api/v1/users/{user_id}"), 204), setup=new_user),
+        Case("POST /api/v1/users/<id>/movies", "routes", lambda user_id: _expect(client.post(
+            f"/api/v1/users/{user_id}/movies", json={'title': fixture.popular_title}), 201),
+             setup=new_user),
+        Case("PATCH /api/v1/users/<id>/movies/<id>", "routes", lambda _: _expect(client.patch(
+            f"/api/v1/users/{user}/movies/{movie}",
+            json={'rating': 1 + next(counter) % 8}), 200)),
+        Case("DELETE /api/v1/users/<id>/movies/<id>", "routes", lambda movie_id: _expect(
+            client.delete(f"/api/v1/users/{fixture.writer_id}/movies/{movie_id}"), 204),
+             setup=link_popular),
+    ]
+    # Pages behind the response cache, rendered from scratch and served from the cache.
+    for path in ("/users", "/users?sort=recent", f"/users/{user}", f"/users/{user}?sort=rating",
+                 "/movies", "/movies?sort=user_rating", "/movies/top",
+                 "/movies/top?sort=most_rated"):
+        cases.append(Case(f"GET {path} (render)", "routes", get(path), setup=cold))
+        cases.append(Case(f"GET {path} (cached)", "routes", get(path), concurrent=True))
+    return cases
+
+
+def data_manager_cases(web, fixture, stub_url):
+    """Cases calling every DataManagerInterface method directly."""
+    data_manager = web.data_manager
+    counter = itertools.count()
+    user, movie = fixture.user_id, fixture.movie_id
+
+    def call(method, *args, **kwargs):
+        return lambda _: getattr(data_manager, method)(*args, **kwargs)
+
+    def new_user():
+        return data_manager.add_user(f"bench-dm-{next(counter)}").id
+
+    def second_page(sort):
+        return lambda: data_manager.get_movies_page(sort).next_cursor
+
+    def unlinked_popular():
+        # Other users keep the movie in the catalog after the writer's link goes.
+        data_manager.delete_movie(fixture.writer_id, fixture.popular_movie_id)
+        return data_manager.get_movie(fixture.popular_movie_id)
+
+    def import_chunk(_):
+        name = f"bench-chunk-{next(counter)}"
+        entries = [{'line': line, 'user': name, 'title': title, 'rating': 6.5}
+                   for line, title in enumerate(fixture.titles[:IMPORT_ROWS], start=1)]
+        errors = data_manager.import_watchlist_chunk(entries)
+        if errors:
+            raise BenchmarkError(f"import_watchlist_chunk rejected rows: {errors[:3]}")
+
+    def expect_none(result):
+        if result is not None:
+            raise BenchmarkError(result)
+
+    cases = [
+        Case("get_all_users", "data_manager", call("get_all_users")),
+        Case("get_all_movies", "data_manager", call("get_all_movies")),
+        Case("get_movies_page(title, page 2)", "data_manager",
+             lambda cursor: data_manager.get_movies_page("title", after=cursor),
+             setup=second_page("title")),
+        Case("get_records(movies, fields=id,title, limit=100)", "data_manager",
+             call("get_records", "movies", ["id", "title"], limit=100)),
+        Case("get_record(movies)", "data_manager", call("get_record", "movies", movie)),
+        Case("get_record(user_movies)", "data_manager",
+             call("get_record", "user_movies", movie, user_id=user)),
+        Case("get_user_movies", "data_manager", call("get_user_movies", user)),
+        Case("get_user_movie", "data_manager", call("get_user_movie", user, movie)),
+        Case("get_user_by_name", "data_manager", call("get_user_by_name", user_name(0))),
+        Case("get_movie", "data_manager", call("get_movie", movie)),
+        Case(f"get_movies_by_titles({len(fixture.titles)})", "data_manager",
+             call("get_movies_by_titles", fixture.titles)),
+        Case("find_movie", "data_manager",
+             call("find_movie", {'Title': fixture.popular_title, 'imdbID': None})),
+        Case(f"get_movies_by_ids({len(fixture.titles)})", "data_manager",
+             call("get_movies_by_ids", range(movie, movie + len(fixture.titles)))),
+        Case("iter_records(movies)", "data_manager",
+             lambda _: sum(1 for _ in data_manager.iter_records("movies"))),
+        Case("get_ratings(user)", "data_manager", call("get_ratings", [user])),
+        Case("get_ratings(all)", "data_manager", call("get_ratings")),
+        Case("search_movies(synthetic 0001)", "data_manager",
+             call("search_movies", "synthetic 0001")),
+        Case("search_movies(director 42)", "data_manager", call("search_movies", "director 42")),
+        Case("search_records(synthetic 0001)", "data_manager",
+             call("search_records", "synthetic 0001")),
+        Case("get_unverified_posters", "data_manager", call("get_unverified_posters")),
+        Case("get_stale_movies", "data_manager",
+             lambda _: data_manager.get_stale_movies(datetime.now(timezone.utc))),
+        Case("update_movie_metadata", "data_manager",
+             lambda _: data_manager.update_movie_metadata({movie: {
+                 'genre': f"Genre {next(counter) % 20}", 'runtime': 90 + next(counter) % 60}})),
+        Case("add_user", "data_manager",
+             lambda _: data_manager.add_user(f"bench-add-{next(counter)}")),
+        Case("add_movie", "data_manager", lambda _: expect_none(data_manager.add_movie(
+            synthetic_movie(3_000_000 + next(counter), stub_url), fixture.writer_id)[1])),
+        Case("add_movie_to_user", "data_manager",
+             lambda linked: expect_none(data_manager.add_movie_to_user(
+                 linked, fixture.writer_id)), setup=unlinked_popular, in_context=True),
+        Case("update_movie", "data_manager",
+             lambda link: data_manager.update_movie(link, 1 + next(counter) % 8),
+             setup=lambda: data_manager.get_user_movie(user, movie), in_context=True),
+        Case("delete_movie", "data_manager",
+             lambda movie_id: data_manager.delete_movie(fixture.writer_id, movie_id),
+             setup=lambda: _link_popular(web, fixture, stub_url), in_context=True),
+        Case("delete_user", "data_manager", lambda user_id: data_manager.delete_user(user_id),
+             setup=new_user, in_context=True),
+        Case(f"import_watchlist_chunk({IMPORT_ROWS})", "data_manager", import_chunk),
+        Case("set_poster_status", "data_manager",
+             call("set_poster_status", f"{stub_url}posters/1.jpg", "ok")),
+        Case("sweep_orphans", "data_manager", call("sweep_orphans")),
+    ]
+    for sort in USER_SORTS:
+        cases.append(Case(f"get_users_page({sort})", "data_manager",
+                          call("get_users_page", sort)))
+    for sort in MOVIE_SORTS:
+        cases.append(Case(f"get_movies_page({sort})", "data_manager",
+                          call("get_movies_page", sort)))
+    for sort in LEADERBOARD_SORTS:
+        cases.append(Case(f"get_top_movies_page({sort})", "data_manager",
+                          call("get_top_movies_page", sort)))
+    for sort in USER_MOVIE_SORTS:
+        cases.append(Case(f"get_user_movies_page({sort})", "data_manager",
+                          call("get_user_movies_page", user, sort)))
+    for resource in RESOURCES:
+        cases.append(Case(f"get_records({resource})", "data_manager",
+                          call("get_records", resource, user_id=user)))
+    return [case._replace(in_context=True) for case in cases]
@@ -0,0 +1,67 @@
+import argparse
+import json
+import sys
+
+METRICS = ("p50_ms", "p95_ms", "p99_ms")
+
+
+def load(path):
+    with open(path, encoding="utf-8") as handle:
+        report = json.load(handle)
+    return {(result['group'], result['name']): result for result in report['results']
+            if 'error' not in result}
+
+
+def compare(baseline, candidate, metric="p95_ms", threshold=10.0, min_delta_ms=0.05):
+    """
+    Pairs up the cases of two reports.
+
+    :param metric: Latency metric the verdict is based on
+    :param threshold: Percentage change counted as a regression or improvement
+    :param min_delta_ms: Absolute change below which a case is unchanged,
+                         so sub-millisecond noise is not flagged
+    :return: List of row dicts sorted by relative change, worst first
+    """
+    rows = []
+    for key in sorted(baseline.keys() & candidate.keys()):
+        before, after = baseline[key][metric], candidate[key][metric]
+        change = (after - before) / before * 100 if before else 0.0
+        if abs(after - before) < min_delta_ms or abs(change) < threshold:
+            verdict = "same"
+        else:
+            verdict = "slower" if change > 0 else "faster"
+        rows.append({'group': key[0], 'name': key[1], 'before': before, 'after': after,
+                     'change_pct': round(change, 1), 'verdict': verdict})
+    return sorted(rows, key=lambda row: -row['change_pct'])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.compare",
+        description="Compares two benchmark reports; exits with 1 on regressions.")
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--metric", choices=METRICS, default="p95_ms")
+    parser.add_argument("--threshold", type=float, default=10.0,
+                        help="Percent change counted as a regression.")
+    parser.add_argument("--json", action="store_true", help="Print the rows as JSON.")
+    args = parser.parse_args(argv)
+
+    baseline, candidate = load(args.baseline), load(args.candidate)
+    rows = compare(baseline, candidate, args.metric, args.threshold)
+    if args.json:
+        print(json.dumps(rows, indent=2))
+    else:
+        for row in rows:
+            print(f"{row['verdict']:<7} {row['change_pct']:>+7.1f}%  "
+                  f"{row['before']:>9.3f} -> {row['after']:>9.3f} ms  "
+                  f"{row['group']}: {row['name']}")
+        for key in sorted(baseline.keys() - candidate.keys()):
+            print(f"removed  {key[0]}: {key[1]}")
+        for key in sorted(candidate.keys() - baseline.keys()):
+            print(f"added    {key[0]}: {key[1]}")
+    return 1 if any(row['verdict'] == "slower" for row in rows) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
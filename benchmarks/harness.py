@@ -0,0 +1,109 @@
+import math
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from typing import Any, Callable, NamedTuple, Optional
+
+
+class Case(NamedTuple):
+    """
+    One benchmarked operation.
+
+    ``setup`` runs untimed before every iteration and its return value is
+    passed to ``run``. With ``in_context`` both run inside one Flask app
+    context, as data manager calls do within a request; otherwise setup
+    gets its own context and ``run`` none (the test client pushes one).
+    Cases marked ``concurrent`` may run from several threads at once.
+    """
+    name: str
+    group: str
+    run: Callable[[Any], Any]
+    setup: Optional[Callable[[], Any]] = None
+    in_context: bool = False
+    concurrent: bool = False
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an ascending list."""
+    if not sorted_values:
+        return None
+    rank = max(math.ceil(fraction * len(sorted_values)), 1)
+    return sorted_values[rank - 1]
+
+
+def summarize(durations, wall_time):
+    """Latency percentiles in milliseconds and throughput per second."""
+    ordered = sorted(durations)
+    return {
+        'iterations': len(ordered),
+        'p50_ms': round(percentile(ordered, 0.50) * 1000, 4),
+        'p95_ms': round(percentile(ordered, 0.95) * 1000, 4),
+        'p99_ms': round(percentile(ordered, 0.99) * 1000, 4),
+        'mean_ms': round(sum(ordered) / len(ordered) * 1000, 4),
+        'max_ms': round(ordered[-1] * 1000, 4),
+        'throughput_per_s': round(len(ordered) / wall_time, 2) if wall_time else None,
+    }
+
+
+class Runner:
+    """Times cases against a Flask app."""
+
+    def __init__(self, app, iterations=200, warmup=20, concurrency=1, memory_iterations=20):
+        self.app = app
+        self.iterations = iterations
+        self.warmup = warmup
+        self.concurrency = concurrency
+        self.memory_iterations = memory_iterations
+
+    def _once(self, case):
+        """Runs one iteration and returns the duration of case.run."""
+        with self.app.app_context() if case.in_context else nullcontext():
+            if case.setup is None:
+                argument = None
+            elif case.in_context:
+                argument = case.setup()
+            else:
+                with self.app.app_context():
+                    argument = case.setup()
+            started = time.perf_counter()
+            case.run(argument)
+            return time.perf_counter() - started
+
+    def _timed(self, case, iterations):
+        concurrency = self.concurrency if case.concurrent else 1
+        started = time.perf_counter()
+        if concurrency > 1:
+            with ThreadPoolExecutor(max_workers=concurrency) as executor:
+                durations = list(executor.map(lambda _: self._once(case), range(iterations)))
+        else:
+            durations = [self._once(case) for _ in range(iterations)]
+        return durations, time.perf_counter() - started, concurrency
+
+    def _peak_memory(self, case):
+        """Peak Python heap growth over a few iterations, in KiB."""
+        tracemalloc.start()
+        try:
+            baseline = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            for _ in range(self.memory_iterations):
+                self._once(case)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        return round(max(peak - baseline, 0) / 1024, 1)
+
+    def measure(self, case):
+        """
+        Warms up, times and memory-profiles a case.
+
+        Memory is traced in a separate pass, since tracemalloc slows down
+        every allocation and would skew the latencies.
+        """
+        for _ in range(self.warmup):
+            self._once(case)
+        durations, wall_time, concurrency = self._timed(case, self.iterations)
+        result = {'name': case.name, 'group': case.group, 'concurrency': concurrency}
+        result.update(summarize(durations, wall_time))
+        result['peak_memory_kib'] = self._peak_memory(case)
+        return result
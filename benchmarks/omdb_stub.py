@@ -0,0 +1,107 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+# Smallest byte string guess_mimetype() recognizes as a JPEG.
+POSTER_BYTES = b"\xff\xd8\xff\xe0" + b"\x00" * 1020
+SEARCH_RESULTS = 10
+
+
+def movie_details(title, imdb_id, port):
+    """Returns a deterministic OMDb detail response."""
+    number = int(imdb_id[2:])
+    return {
+        'Title': title,
+        'Year': str(1950 + number % 75),
+        'Director': f"Director {number % 97}",
+        'imdbRating': f"{1 + number % 90 / 10:.1f}",
+        'imdbID': imdb_id,
+        'Poster': f"http://127.0.0.1:{port}/posters/{number % 500}.jpg",
+        'Response': 'True',
+    }
+
+
+def imdb_id_for(title):
+    """Derives a stable fake IMDb id from a title."""
+    return "tt" + str(sum(ord(char) * (index + 1) for index, char in enumerate(title))).zfill(7)
+
+
+class OmdbStubHandler(BaseHTTPRequestHandler):
+    """Answers t=, i= and s= queries and poster downloads without touching the network."""
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_HEAD(self):
+        self._respond(*self._route(), head=True)
+
+    def do_GET(self):
+        self._respond(*self._route())
+
+    def _route(self):
+        url = urlparse(self.path)
+        if url.path.startswith("/posters/"):
+            return 200, "image/jpeg", POSTER_BYTES
+        params = {key: values[0] for key, values in parse_qs(url.query).items()}
+        port = self.server.server_address[1]
+        if 's' in params:
+            body = {'Search': [{'Title': f"{params['s'].title()} {index}",
+                                'Year': str(1990 + index), 'imdbID': f"tt{index:07d}",
+                                'Type': 'movie',
+                                'Poster': f"http://127.0.0.1:{port}/posters/{index}.jpg"}
+                               for index in range(SEARCH_RESULTS)],
+                    'totalResults': str(SEARCH_RESULTS), 'Response': 'True'}
+        elif 'i' in params:
+            body = movie_details(f"Movie {params['i']}", params['i'], port)
+        elif params.get('t', '').lower().startswith("missing"):
+            body = {'Response': 'False', 'Error': 'Movie not found!'}
+        elif 't' in params:
+            body = movie_details(params['t'], imdb_id_for(params['t']), port)
+        else:
+            body = {'Response': 'False', 'Error': 'Incorrect IMDb ID.'}
+        return 200, "application/json", json.dumps(body).encode()
+
+    def _respond(self, status, content_type, body, head=False):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if not head:
+            self.wfile.write(body)
+
+
+class OmdbStub:
+    """
+    Local stand-in for the OMDb API and its poster host.
+
+    Use as a context manager; ``url`` is suitable for OMDB_API_URL.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0):
+        self.server = ThreadingHTTPServer((host, port), OmdbStubHandler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    def poster_url(self, number=0):
+        """Returns the URL of a stub poster."""
+        return f"{self.url}posters/{number}.jpg"
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
@@ -0,0 +1,227 @@
+import argparse
+import importlib.metadata
+import json
+import os
+import platform
+import re
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import wait
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import sqlalchemy
+from flask import request, request_finished
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+from benchmarks.omdb_stub import OmdbStub
+
+BACKENDS = ("sqlite", "sqlalchemy", "memory")
+GROUPS = ("routes", "data_manager")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.run",
+        description="Seeds a synthetic database, times every route and data manager "
+                    "method and writes the results as JSON.")
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--movies", type=int, default=1000)
+    parser.add_argument("--links", type=int, default=20, help="Movies per user.")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed of the synthetic data.")
+    parser.add_argument("--backend", choices=BACKENDS, default="sqlite")
+    parser.add_argument("--database-uri",
+                        help="Database for the sqlalchemy backend. It must be empty; the "
+                             "sqlite backend uses a file in the work directory.")
+    parser.add_argument("--read-pool-size", type=int,
+                        help="SQLITE_READ_POOL_SIZE, the app default if omitted.")
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--memory-iterations", type=int, default=20,
+                        help="Iterations traced with tracemalloc for peak memory.")
+    parser.add_argument("--concurrency", type=int, default=1,
+                        help="Threads driving the read-only routes.")
+    parser.add_argument("--group", choices=GROUPS, action="append",
+                        help="Only run this group; may be repeated.")
+    parser.add_argument("--filter", help="Only run cases whose name matches this regex.")
+    parser.add_argument("--output", help="Result file, stdout if omitted.")
+    parser.add_argument("--workdir", help="Directory for the database and caches; a "
+                                          "temporary directory removed afterwards if omitted.")
+    args = parser.parse_args(argv)
+    if args.backend == "sqlalchemy" and not args.database_uri:
+        parser.error("--backend sqlalchemy needs --database-uri")
+    return args
+
+
+def configure_environment(args, workdir, omdb_url):
+    """Points the app at the work directory and the OMDb stub before it is created."""
+    database_uri = args.database_uri or f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.environ.update({
+        'FLASK_SQLALCHEMY_DATABASE_URI': database_uri,
+        'FLASK_DATA_MANAGER_BACKEND': args.backend,
+        'OMDB_API_URL': omdb_url,
+        'OMDB_API_KEY': "benchmark",
+        'OMDB_CACHE_PATH': os.path.join(workdir, "omdb_cache.db"),
+        'POSTER_MIRROR_DIR': os.path.join(workdir, "posters"),
+        'RESPONSE_CACHE_PATH': os.path.join(workdir, "response_cache.db"),
+        'ASSET_BUILD_DIR': os.path.join(workdir, "assets"),
+    })
+    if args.read_pool_size is not None:
+        os.environ['FLASK_SQLITE_READ_POOL_SIZE'] = str(args.read_pool_size)
+
+
+def git_commit():
+    """Returns the checked-out commit and whether the tree has local changes."""
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=root, capture_output=True,
+                                text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"],
+                                    cwd=root, capture_output=True, text=True,
+                                    check=True).stdout.strip())
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+    return commit, dirty
+
+
+def environment():
+    """Describes the machine and library versions the results came from."""
+    commit, dirty = git_commit()
+    return {
+        'commit': commit,
+        'dirty': dirty,
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'flask': importlib.metadata.version("flask"),
+        'sqlalchemy': sqlalchemy.__version__,
+        'sqlite': sqlite3.sqlite_version,
+    }
+
+
+def max_rss_kib():
+    """Peak resident set size of the process, None where unavailable."""
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss // 1024 if sys.platform == "darwin" else rss
+
+
+def verify_posters(web):
+    """Verifies and mirrors the seeded posters so the checks do not overlap the timings."""
+    with web.app.app_context():
+        poster_urls = web.data_manager.get_unverified_posters(limit=1000)
+    futures = [web.poster_verifier.submit(poster_url) for poster_url in poster_urls]
+    wait([future for future in futures if future is not None])
+
+
+def run(args, workdir):
+    with OmdbStub() as stub:
+        configure_environment(args, workdir, stub.url)
+        from app import create_app, shutdown_app
+        app = create_app()
+        web = SimpleNamespace(app=app, **app.extensions)
+        from benchmarks.cases import (BenchmarkError, data_manager_cases, load_fixture,
+                                      route_cases)
+        from benchmarks.harness import Runner
+        from benchmarks.seed import seed_database
+
+        started = time.perf_counter()
+        with web.app.app_context():
+            seeded = seed_database(web.data_manager, args.users, args.movies, args.links,
+                                   stub.url, seed=args.seed)
+        seeded['seconds'] = round(time.perf_counter() - started, 3)
+        verify_posters(web)
+        web.recommendations.wait()
+
+        fixture = load_fixture(web, stub, args.movies)
+        groups = args.group or GROUPS
+        cases = []
+        if "routes" in groups:
+            cases.extend(route_cases(web, fixture, stub.url))
+        if "data_manager" in groups:
+            cases.extend(data_manager_cases(web, fixture, stub.url))
+        if args.filter:
+            cases = [case for case in cases if re.search(args.filter, case.name)]
+
+        endpoints = set()
+
+        def record_endpoint(sender, response, **extra):
+            if request.url_rule is not None:
+                endpoints.add(request.url_rule.endpoint)
+
+        request_finished.connect(record_endpoint, web.app)
+
+        runner = Runner(web.app, iterations=args.iterations, warmup=args.warmup,
+                        concurrency=args.concurrency, memory_iterations=args.memory_iterations)
+        results = []
+        for case in cases:
+            try:
+                result = runner.measure(case)
+            except BenchmarkError as error:
+                result = {'name': case.name, 'group': case.group, 'error': str(error)}
+            results.append(result)
+            print(_format(result), file=sys.stderr)
+
+        shutdown_app(app)
+
+    routes = {rule.endpoint for rule in web.app.url_map.iter_rules()}
+    return {
+        'environment': environment(),
+        'config': {
+            'backend': args.backend,
+            'users': args.users,
+            'movies': args.movies,
+            'links_per_user': args.links,
+            'seed': args.seed,
+            'iterations': args.iterations,
+            'warmup': args.warmup,
+            'concurrency': args.concurrency,
+            'read_pool_size': (web.app.config.get('SQLITE_READ_POOL_SIZE')
+                               if args.backend == "sqlite" else None),
+        },
+        'seed': seeded,
+        'results': results,
+        'uncovered_endpoints': sorted(routes - endpoints) if "routes" in groups else None,
+        'max_rss_kib': max_rss_kib(),
+    }
+
+
+def _format(result):
+    if 'error' in result:
+        return f"{result['name']:<60} ERROR {result['error']}"
+    return (f"{result['name']:<60} p50 {result['p50_ms']:>9.3f} ms  "
+            f"p95 {result['p95_ms']:>9.3f} ms  p99 {result['p99_ms']:>9.3f} ms  "
+            f"{result['throughput_per_s']:>9.1f}/s  {result['peak_memory_kib']:>8.1f} KiB")
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    workdir = args.workdir or tempfile.mkdtemp(prefix="moviwebapp-bench-")
+    os.makedirs(workdir, exist_ok=True)
+    try:
+        report = run(args, workdir)
+    finally:
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as handle:
+            handle.write(output + "\n")
+    else:
+        print(output)
+    return 1 if any('error' in result for result in report['results']) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,84 @@
+import random
+
+from services.bulk_import import chunked
+
+SEED_CHUNK_SIZE = 1000
+DIRECTORS = 200
+
+
+def movie_title(number):
+    """Title of the synthetic movie with the given number."""
+    return f"Synthetic Movie {number:06d}"
+
+
+def user_name(number):
+    """Name of the synthetic user with the given number."""
+    return f"bench-user-{number:06d}"
+
+
+def synthetic_movie(number, poster_base_url):
+    """Returns OMDb data for a synthetic movie."""
+    return {
+        'Title': movie_title(number),
+        'Director': f"Director {number % DIRECTORS}",
+        'Year': str(1950 + number % 75),
+        'imdbRating': f"{1 + (number * 37) % 90 / 10:.1f}",
+        'Poster': f"{poster_base_url}posters/{number % 500}.jpg",
+    }
+
+
+def synthetic_entries(users, movies, links, poster_base_url, seed=0):
+    """
+    Yields watchlist rows linking every user to ``links`` distinct movies.
+
+    The rows are in the format of DataManagerInterface.import_watchlist_chunk.
+    Movies are drawn with a skewed distribution so some titles are rated by
+    many users, like in a real catalog. The same arguments always yield the
+    same rows.
+    """
+    rng = random.Random(seed)
+    links = min(links, movies)
+    line = 0
+    for user in range(users):
+        picked = set()
+        while len(picked) < links:
+            picked.add(min(int(rng.paretovariate(1.2)) - 1, movies - 1)
+                       if rng.random() < 0.5 else rng.randrange(movies))
+        for number in sorted(picked):
+            line += 1
+            yield {'line': line, 'user': user_name(user), 'title': movie_title(number),
+                   'rating': round(rng.uniform(0.5, 9.5), 1),
+                   'movie': synthetic_movie(number, poster_base_url)}
+
+
+def seed_database(data_manager, users, movies, links, poster_base_url, seed=0,
+                  chunk_size=SEED_CHUNK_SIZE):
+    """
+    Fills an empty data manager with synthetic users, movies and ratings.
+
+    Movies nobody links to are added through a placeholder user, so the
+    catalog has exactly ``movies`` titles.
+
+    :param data_manager: DataManagerInterface implementation
+    :param users: Number of users
+    :param movies: Number of movies
+    :param links: Movies per user
+    :param poster_base_url: Base URL of the stub poster host
+    :return: Dict with the number of rows written and rejected
+    """
+    rows = errors = 0
+    seen = set()
+    for chunk in chunked(synthetic_entries(users, movies, links, poster_base_url, seed),
+                         chunk_size):
+        seen.update(entry['title'] for entry in chunk)
+        errors += len(data_manager.import_watchlist_chunk(chunk))
+        rows += len(chunk)
+
+    unlinked = [number for number in range(movies) if movie_title(number) not in seen]
+    catalog = ({'line': index, 'user': "bench-catalog", 'title': movie_title(number),
+                'rating': None, 'movie': synthetic_movie(number, poster_base_url)}
+               for index, number in enumerate(unlinked, start=1))
+    for chunk in chunked(catalog, chunk_size):
+        errors += len(data_manager.import_watchlist_chunk(chunk))
+        rows += len(chunk)
+    return {'rows': rows, 'errors': errors}
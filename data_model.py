@@ -1,11 +1,50 @@
+import re
+from datetime import datetime, timezone
+
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import Column, Integer, String, Float, ForeignKey
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime, Index, Text
 
 db = SQLAlchemy()
 
+# Movie columns the metadata refresher may update from OMDb.
+OMDB_METADATA_COLUMNS = ('imdb_id', 'rating', 'poster', 'genre', 'runtime', 'plot')
+
+
+def normalize_title(title):
+    """
+    Returns a title case-folded and with punctuation stripped, for matching.
+
+    Apostrophes are dropped rather than turned into spaces, so "Schindler's
+    List" and "Schindlers List" get the same key.
+    """
+    if not title:
+        return ""
+    title = re.sub(r"['\u2019]", "", title.casefold())
+    return " ".join(re.sub(r"[^\w\s]", " ", title).split())
+
+
+def omdb_value(value):
+    """Returns an OMDb field, None for the "N/A" OMDb sends for missing values."""
+    return None if value in (None, "", "N/A") else value
+
+
+def year_value(year):
+    """Parses a release year such as 2021 or OMDb's "2021\u20132023", None if there is none."""
+    match = re.match(r"\s*(\d{4})", str(year or ""))
+    return int(match.group(1)) if match else None
+
+
+def runtime_minutes(runtime):
+    """Parses an OMDb runtime such as "142 min", None if it is missing."""
+    match = re.match(r"\s*(\d+)", runtime or "")
+    return int(match.group(1)) if match else None
+
 
 class User(db.Model):
     __tablename__ = 'user'
+    __table_args__ = (
+        Index('uq_user_name', 'name', unique=True),
+    )
     id = Column(Integer, primary_key=True, autoincrement=True)
     name = Column(String(100), nullable=False)
 
@@ -21,14 +60,67 @@ class User(db.Model):
 
 class Movie(db.Model):
     __tablename__ = 'movie'
+    __table_args__ = (
+        Index('ix_movie_title', 'title'),
+        Index('uq_movie_imdb_id', 'imdb_id', unique=True),
+        Index('ix_movie_title_key', 'title_key'),
+        Index('ix_movie_metadata_refreshed_at', 'metadata_refreshed_at'),
+    )
     id = Column(Integer, primary_key=True, autoincrement=True)
     title = Column(String(100), nullable=False)
     director = Column(String(100), nullable=True)
     release_year = Column(Integer, nullable=False)
     rating = Column(Float, nullable=True)
     poster = Column(String, nullable=True)
+    poster_status = Column(String(16), nullable=True)
+    poster_checked_at = Column(DateTime, nullable=True)
+    poster_hash = Column(String(64), nullable=True)
+    imdb_id = Column(String(16), nullable=True)
+    title_key = Column(String(100), nullable=True, default=lambda context: normalize_title(
+        context.get_current_parameters().get('title')))
+    genre = Column(String(200), nullable=True)
+    runtime = Column(Integer, nullable=True)
+    plot = Column(Text, nullable=True)
+    metadata_refreshed_at = Column(DateTime, nullable=True)
 
     user_movies = db.relationship("UserMovies", back_populates="movie", cascade="all, delete")
+    rating_stats = db.relationship("MovieRatingStats", uselist=False, cascade="all, delete")
+
+    @staticmethod
+    def values_from_omdb(movie):
+        """
+        Maps an OMDb result dict to Movie column values.
+
+        Results carrying an IMDb id count as freshly refreshed metadata.
+        """
+        imdb_id = omdb_value(movie.get('imdbID'))
+        return {
+            'title': movie.get('Title'),
+            'title_key': normalize_title(movie.get('Title')),
+            'director': movie.get('Director'),
+            'release_year': movie.get('Year'),
+            'rating': rating_value(movie.get('imdbRating')),
+            'poster': movie.get('Poster'),
+            'imdb_id': imdb_id,
+            'genre': omdb_value(movie.get('Genre')),
+            'runtime': runtime_minutes(movie.get('Runtime')),
+            'plot': omdb_value(movie.get('Plot')),
+            'metadata_refreshed_at': datetime.now(timezone.utc) if imdb_id else None,
+        }
+
+    def to_omdb(self):
+        """Returns the movie in the OMDb result format, the inverse of values_from_omdb."""
+        return {
+            'Title': self.title,
+            'Director': self.director,
+            'Year': self.release_year,
+            'imdbRating': self.rating,
+            'Poster': self.poster,
+            'imdbID': self.imdb_id,
+            'Genre': self.genre,
+            'Runtime': f"{self.runtime} min" if self.runtime else None,
+            'Plot': self.plot,
+        }
 
     def __repr__(self):
         return (f"id: {self.id} title:{self.title} director:{self.director} "
@@ -41,6 +133,10 @@ class Movie(db.Model):
 
 class UserMovies(db.Model):
     __tablename__ = 'user_movies'
+    __table_args__ = (
+        Index('uq_user_movies_user_movie', 'user_id', 'movie_id', unique=True),
+        Index('ix_user_movies_movie_user', 'movie_id', 'user_id'),
+    )
     id = Column(Integer, primary_key=True, autoincrement=True)
     user_id = Column(Integer, ForeignKey("user.id"), nullable=False)
     movie_id = Column(Integer, ForeignKey("movie.id"), nullable=False)
@@ -48,3 +144,57 @@ class UserMovies(db.Model):
 
     user = db.relationship("User", back_populates="user_movies")
     movie = db.relationship("Movie", back_populates="user_movies")
+
+
+# Ratings run from 0 to 10; bucket n counts ratings in [n, n + 1).
+RATING_BUCKETS = 10
+
+
+def rating_value(rating):
+    """Returns a rating as a float, None if it is missing or not numeric (e.g. "N/A")."""
+    try:
+        return float(rating) if rating is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def rating_bucket(rating):
+    """Returns the histogram bucket index of a rating."""
+    return max(0, min(int(rating), RATING_BUCKETS - 1))
+
+
+class MovieRatingStats(db.Model):
+    """
+    Aggregates of the users' ratings of a movie.
+
+    Maintained by the data managers whenever a rating is added, changed or
+    removed, so listing and ranking by user rating never scans user_movies.
+    """
+    __tablename__ = 'movie_rating_stats'
+    __table_args__ = (
+        Index('ix_movie_rating_stats_mean', 'rating_mean', 'movie_id'),
+        Index('ix_movie_rating_stats_count', 'rating_count', 'movie_id'),
+    )
+    movie_id = Column(Integer, ForeignKey("movie.id", ondelete="CASCADE"), primary_key=True)
+    rating_count = Column(Integer, nullable=False, default=0)
+    rating_sum = Column(Float, nullable=False, default=0.0)
+    rating_mean = Column(Float, nullable=True)
+    bucket_0 = Column(Integer, nullable=False, default=0)
+    bucket_1 = Column(Integer, nullable=False, default=0)
+    bucket_2 = Column(Integer, nullable=False, default=0)
+    bucket_3 = Column(Integer, nullable=False, default=0)
+    bucket_4 = Column(Integer, nullable=False, default=0)
+    bucket_5 = Column(Integer, nullable=False, default=0)
+    bucket_6 = Column(Integer, nullable=False, default=0)
+    bucket_7 = Column(Integer, nullable=False, default=0)
+    bucket_8 = Column(Integer, nullable=False, default=0)
+    bucket_9 = Column(Integer, nullable=False, default=0)
+
+    @property
+    def histogram(self):
+        """Rating counts per bucket, lowest bucket first."""
+        return [getattr(self, f"bucket_{bucket}") or 0 for bucket in range(RATING_BUCKETS)]
+
+    def __repr__(self):
+        return (f"movie_id: {self.movie_id} rating_count:{self.rating_count} "
+                f"rating_mean:{self.rating_mean}")
@@ -0,0 +1,28 @@
+from datamanager.engine_config import is_sqlite_url
+from datamanager.memory_data_manager import InMemoryDataManager
+from datamanager.sqlalchemy_data_manager import SQLAlchemyDataManager
+from datamanager.sqlite_data_manager import SQLiteDataManager
+
+BACKENDS = {
+    'sqlite': SQLiteDataManager,
+    'sqlalchemy': SQLAlchemyDataManager,
+    'memory': InMemoryDataManager,
+}
+
+
+def create_data_manager(app):
+    """
+    Creates the data manager selected by app.config['DATA_MANAGER_BACKEND'].
+
+    Backends are "sqlite", "sqlalchemy" (PostgreSQL and other server
+    databases) and "memory". Without an explicit choice the backend follows
+    SQLALCHEMY_DATABASE_URI.
+    """
+    backend = app.config.get('DATA_MANAGER_BACKEND')
+    if not backend:
+        uri = app.config.get('SQLALCHEMY_DATABASE_URI')
+        backend = 'sqlite' if not uri or is_sqlite_url(uri) else 'sqlalchemy'
+        app.config['DATA_MANAGER_BACKEND'] = backend
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown data manager backend: {backend!r}")
+    return BACKENDS[backend](app)
@@ -1,11 +1,59 @@
 from abc import ABC, abstractmethod
-from typing import List, Optional, Union
+from datetime import datetime
+from typing import (Any, ContextManager, Dict, Iterable, Iterator, List, Optional, Tuple,
+                    Union)
 
 from data_model import User, Movie, UserMovies
+from datamanager.events import EventEmitter
+from datamanager.pagination import Page, PAGE_SIZE
+from datamanager.search import SEARCH_LIMIT
 
 
-class DataManagerInterface(ABC):
-    """Abstract base class defining the interface for data managers."""
+class DataManagerInterface(EventEmitter, ABC):
+    """
+    Abstract base class defining the interface for data managers.
+
+    Implementations emit "posters_released" with a ``poster_hashes`` set
+    when deleting movies leaves mirrored posters without any movie, and
+    keep each movie's MovieRatingStats in step with its users' ratings.
+
+    After every committed write they emit "data_changed" with
+    ``user_ids``: the set of users whose collections changed (empty when
+    only the catalog changed), or None when any page may show the change.
+    """
+
+    def engines(self) -> List[Any]:
+        """Returns the SQLAlchemy engines the backend uses, for instrumentation."""
+        return []
+
+    def ping(self) -> bool:
+        """Returns whether the storage answers queries, for readiness checks."""
+        return True
+
+    def warm_up(self, connections: int = 1) -> None:
+        """Opens pooled connections ahead of the first requests."""
+
+    def close(self) -> None:
+        """Commits queued writes and releases every connection, on shutdown."""
+
+    @abstractmethod
+    def transaction(self) -> ContextManager[Any]:
+        """
+        Groups several writes into one unit of work.
+
+        Write methods called inside the block join it instead of committing
+        on their own; the block commits once on exit and the events of all
+        its writes are emitted afterwards, coalesced. Blocks may be nested.
+
+        Usage::
+
+            with data_manager.transaction():
+                user = data_manager.add_user(name)
+                data_manager.add_movie(movie, user.id)
+
+        :return: Context manager
+        """
+        pass
 
     @abstractmethod
     def get_all_users(self) -> List[User]:
@@ -17,6 +65,125 @@ class DataManagerInterface(ABC):
         """Returns a list of all movies."""
         pass
 
+    @abstractmethod
+    def get_users_page(self, sort: str = "name", after: Optional[str] = None,
+                       before: Optional[str] = None, limit: int = PAGE_SIZE) -> Page:
+        """
+        Returns one page of users using keyset pagination.
+
+        :param sort: "name" or "recent"
+        :param after: Cursor of the last item of the previous page
+        :param before: Cursor of the first item of the next page
+        :param limit: Page size
+        :return: Page of User objects
+        """
+        pass
+
+    @abstractmethod
+    def get_movies_page(self, sort: str = "title", after: Optional[str] = None,
+                        before: Optional[str] = None, limit: int = PAGE_SIZE) -> Page:
+        """
+        Returns one page of movies using keyset pagination.
+
+        :param sort: "title", "year", "rating", "recent", "user_rating" or "most_rated"
+        :param after: Cursor of the last item of the previous page
+        :param before: Cursor of the first item of the next page
+        :param limit: Page size
+        :return: Page of Movie objects
+        """
+        pass
+
+    @abstractmethod
+    def get_top_movies_page(self, sort: str = "user_rating", min_ratings: int = 1,
+                            after: Optional[str] = None, before: Optional[str] = None,
+                            limit: int = PAGE_SIZE) -> Page:
+        """
+        Returns one page of the user rating leaderboard.
+
+        :param sort: "user_rating" or "most_rated"
+        :param min_ratings: Minimum number of user ratings to be ranked
+        :param after: Cursor of the last item of the previous page
+        :param before: Cursor of the first item of the next page
+        :param limit: Page size
+        :return: Page of Movie objects with rating_stats loaded
+        """
+        pass
+
+    @abstractmethod
+    def get_user_movies_page(self, user_id: int, sort: str = "recent",
+                             after: Optional[str] = None, before: Optional[str] = None,
+                             limit: int = PAGE_SIZE) -> Optional[Page]:
+        """
+        Returns one page of a user's collection using keyset pagination.
+
+        :param user_id: ID of the user
+        :param sort: "title", "year", "rating" (the user's rating) or "recent"
+        :param after: Cursor of the last item of the previous page
+        :param before: Cursor of the first item of the next page
+        :param limit: Page size
+        :return: Page of UserMovies or None if user not found
+        """
+        pass
+
+    @abstractmethod
+    def get_records(self, resource: str, fields: Optional[List[str]] = None,
+                    sort: Optional[str] = None, after: Optional[str] = None,
+                    before: Optional[str] = None, limit: int = PAGE_SIZE,
+                    user_id: Optional[int] = None) -> Optional[Page]:
+        """
+        Returns one page of plain dicts for the JSON API.
+
+        Only the requested columns are read; no model objects are built
+        where the backend can avoid it.
+
+        :param resource: "users", "movies" or "user_movies"
+        :param fields: Field names to include, None for all
+        :param sort: Sort name of the resource, None for its default
+        :param after: Cursor of the last item of the previous page
+        :param before: Cursor of the first item of the next page
+        :param limit: Page size
+        :param user_id: Owner of the collection for "user_movies"
+        :return: Page of dicts, None if the user of "user_movies" is not found
+        :raises ValueError: For unknown field names
+        """
+        pass
+
+    @abstractmethod
+    def iter_records(self, resource: str, fields: Optional[List[str]] = None,
+                     user_id: Optional[int] = None) -> Optional[Iterator[dict]]:
+        """
+        Streams every record of a resource as plain dicts, ordered by key,
+        e.g. for exports.
+
+        Rows are read in batches as the iterator advances, so memory does
+        not grow with the table. The iterator uses the current app
+        context's session until it is exhausted. A database error while
+        iterating is raised by the iterator, since the records before it
+        may already have been written out.
+
+        :param resource: "users", "movies" or "user_movies"
+        :param fields: Field names to include, None for all
+        :param user_id: Owner of the collection for "user_movies"
+        :return: Iterator of dicts, None if the user of "user_movies" is not found
+        :raises ValueError: For unknown field names
+        """
+        pass
+
+    @abstractmethod
+    def get_record(self, resource: str, record_id: int, fields: Optional[List[str]] = None,
+                   user_id: Optional[int] = None) -> Optional[dict]:
+        """
+        Returns a single record as a plain dict.
+
+        :param resource: "users", "movies" or "user_movies" (looked up by movie id)
+        :param record_id: ID of the record
+        :param fields: Field names to include, None for all
+        :param user_id: Owner of the collection for "user_movies"
+        :return: Dict or None if not found
+        :raises ValueError: For unknown field names
+        """
+        pass
+
     @abstractmethod
     def get_user_movies(self, user_id: int) -> Optional[List[UserMovies]]:
         """
@@ -80,13 +247,18 @@ class DataManagerInterface(ABC):
         pass
 
     @abstractmethod
-    def add_movie(self, movie: dict, user_id: int) -> Optional[str]:
+    def add_movie(self, movie: dict, user_id: int) -> Tuple[Optional[int], Optional[str]]:
         """
         Adds a movie and links it to a user.
 
+        A movie already in the catalog is linked instead: the one with the
+        same IMDb id or, failing that, the same title (see
+        identity.match_movie).
+
         :param movie: Dictionary containing movie data
         :param user_id: ID of the user
-        :return: Error message or None on success
+        :return: (ID of the movie linked, None) on success, (None, error
+                 message) on failure
         """
         pass
 
@@ -101,6 +273,103 @@ class DataManagerInterface(ABC):
         """
         pass
 
+    @abstractmethod
+    def find_movie(self, movie: dict) -> Optional[Movie]:
+        """
+        Finds the catalog movie that movie data refers to, the one add_movie
+        would link (see identity.match_movie).
+
+        :param movie: Dictionary containing movie data
+        :return: Movie object or None if the catalog has no such movie
+        """
+        pass
+
+    @abstractmethod
+    def find_movie_by_title(self, title: str, year: Optional[int] = None) -> Optional[Movie]:
+        """
+        Finds a catalog movie by title, ignoring case and punctuation.
+
+        :param title: Title to look up
+        :param year: Release year; without one, the most recent movie with
+                     the title (the oldest entry among equal years)
+        :return: Movie object or None if the catalog has no such movie
+        """
+        pass
+
+    @abstractmethod
+    def get_movies_by_titles(self, titles: Iterable[str]) -> Dict[str, int]:
+        """
+        Looks up movie ids by title, ignoring case and punctuation.
+
+        :param titles: Iterable of titles
+        :return: Dict of title to movie id, the oldest movie for repeated titles
+        """
+        pass
+
+    @abstractmethod
+    def get_movies_by_ids(self, movie_ids: Iterable[int]) -> Dict[int, Movie]:
+        """
+        Retrieves several movies at once, for display.
+
+        :param movie_ids: Iterable of movie ids
+        :return: Dict of movie id to Movie, without ids that do not exist
+        """
+        pass
+
+    @abstractmethod
+    def get_ratings(self, user_ids: Optional[Iterable[int]] = None) -> Optional[
+            Dict[int, Dict[int, float]]]:
+        """
+        Retrieves the numeric ratings of users, e.g. to build a rating matrix.
+
+        :param user_ids: Users to read, every user with ratings if None
+        :return: Dict of user id to a dict of movie id to rating; users
+                 without numeric ratings are left out. None on failure
+        """
+        pass
+
+    @abstractmethod
+    def search_movies(self, query: str, limit: int = SEARCH_LIMIT) -> List[Movie]:
+        """
+        Searches the local catalog by title, director and year.
+
+        Every word of the query must match the start of a word in the
+        movie. Title matches rank above director and year matches.
+
+        :param query: Search text
+        :param limit: Maximum number of results
+        :return: List of Movie objects, best match first
+        """
+        pass
+
+    @abstractmethod
+    def search_records(self, query: str, fields: Optional[List[str]] = None,
+                       limit: int = SEARCH_LIMIT) -> List[dict]:
+        """
+        Searches the catalog like search_movies, returning "movies" records
+        for the JSON API. Only the requested columns are read.
+
+        :param query: Search text
+        :param fields: Field names to include, None for all
+        :param limit: Maximum number of results
+        :return: List of dicts, best match first
+        :raises ValueError: For unknown field names
+        """
+        pass
+
+    @abstractmethod
+    def import_watchlist_chunk(self, entries: List[dict]) -> List[Tuple[int, str]]:
+        """
+        Writes a chunk of watchlist rows in a single transaction.
+
+        Users and movies that do not exist yet are created.
+
+        :param entries: Dicts with "line", "user", "title", "rating" and,
+                        for titles not in the catalog, "movie" (OMDb data)
+        :return: List of (line, error message) for rows not imported
+        """
+        pass
+
     @abstractmethod
     def update_movie(self, movie: UserMovies, rating: float) -> Optional[UserMovies]:
         """
@@ -132,3 +401,64 @@ class DataManagerInterface(ABC):
         :return: None
         """
         pass
+
+    @abstractmethod
+    def set_poster_status(self, poster_url: str, status: str,
+                          poster_hash: Optional[str] = None) -> int:
+        """
+        Records the verification result for every movie using a poster URL.
+
+        :param poster_url: Poster URL that was checked
+        :param status: Verification status, "ok" or "broken"
+        :param poster_hash: Digest of the locally mirrored poster, if any
+        :return: Number of movies updated
+        """
+        pass
+
+    @abstractmethod
+    def get_unverified_posters(self, limit: int = 100,
+                               after: Optional[str] = None) -> List[str]:
+        """
+        Retrieves poster URLs that have not been verified or mirrored yet.
+
+        :param limit: Maximum number of URLs to return
+        :param after: Only return URLs sorting after this one, to page
+                      through them
+        :return: List of distinct poster URLs, sorted
+        """
+        pass
+
+    @abstractmethod
+    def get_stale_movies(self, refreshed_before: datetime, limit: int = 100) -> List[Movie]:
+        """
+        Retrieves movies whose OMDb metadata is due for a refresh.
+
+        :param refreshed_before: Movies refreshed at or after this time are fresh
+        :param limit: Maximum number of movies to return
+        :return: List of Movies, never refreshed first, then oldest first
+        """
+        pass
+
+    @abstractmethod
+    def update_movie_metadata(self, updates: Dict[int, dict]) -> int:
+        """
+        Stores refreshed OMDb metadata and marks the movies as refreshed.
+
+        Only OMDB_METADATA_COLUMNS are written; None values keep the stored
+        ones and an IMDb id another movie has is not taken over. Movies
+        with a new poster URL have it verified again.
+
+        :param updates: Dict of movie id to Movie column values; empty
+                        values only mark the movie as refreshed
+        :return: Number of movies whose metadata changed
+        """
+        pass
+
+    @abstractmethod
+    def sweep_orphans(self) -> int:
+        """
+        Deletes every movie that no user links to.
+
+        :return: Number of movies deleted
+        """
+        pass
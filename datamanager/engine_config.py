@@ -0,0 +1,69 @@
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+
+# Applied to every new SQLite connection. WAL lets readers run while a
+# writer commits, and busy_timeout makes writers wait instead of failing
+# with "database is locked".
+DEFAULT_SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64000,
+    'temp_store': 'MEMORY',
+}
+
+# Pragmas that need write access and are skipped on read-only connections.
+WRITE_ONLY_PRAGMAS = {'journal_mode'}
+
+
+def is_sqlite_url(url):
+    """True if the database URL points at SQLite."""
+    return make_url(url).get_backend_name() == 'sqlite'
+
+
+def is_file_database(url):
+    """True for SQLite URLs that point at a file rather than memory."""
+    database = make_url(url).database
+    return bool(database) and database != ':memory:' and 'mode=memory' not in str(url)
+
+
+def apply_sqlite_pragmas(engine, pragmas, read_only=False):
+    """
+    Registers a connect hook that sets pragmas on every new connection.
+
+    :param engine: SQLite engine
+    :param pragmas: Mapping of pragma names to values
+    :param read_only: Skip pragmas that would write to the database file
+    """
+    pragmas = {name: value for name, value in pragmas.items()
+               if not (read_only and name in WRITE_ONLY_PRAGMAS)}
+    if read_only:
+        pragmas['query_only'] = 'ON'
+
+    @event.listens_for(engine, "connect")
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+        finally:
+            cursor.close()
+
+    return set_pragmas
+
+
+def create_read_engine(database, pragmas, pool_size):
+    """
+    Creates a pooled engine that opens the SQLite file in read-only mode.
+
+    :param database: Path of the SQLite database file
+    :param pragmas: Pragmas applied to each read-only connection
+    :param pool_size: Number of pooled read connections
+    :return: SQLAlchemy engine
+    """
+    engine = create_engine(f"sqlite:///file:{database}?mode=ro&uri=true",
+                           pool_size=pool_size, max_overflow=pool_size,
+                           connect_args={'check_same_thread': False})
+    apply_sqlite_pragmas(engine, pragmas, read_only=True)
+    return engine
@@ -0,0 +1,54 @@
+def coalesce(events):
+    """
+    Merges events queued by a unit of work.
+
+    Repeated "data_changed" events become one with the union of their
+    user_ids (None if any was None) and "posters_released" events one with
+    the union of their digests. Other events are kept in order.
+
+    :param events: List of (event, payload) pairs
+    :return: List of (event, payload) pairs
+    """
+    merged = []
+    positions = {}
+    for event, payload in events:
+        if event not in ("data_changed", "posters_released"):
+            merged.append((event, payload))
+            continue
+        if event not in positions:
+            positions[event] = len(merged)
+            merged.append((event, dict(payload)))
+            continue
+        combined = merged[positions[event]][1]
+        key = 'user_ids' if event == "data_changed" else 'poster_hashes'
+        if combined[key] is None or payload[key] is None:
+            combined[key] = None
+        else:
+            combined[key] = set(combined[key]) | set(payload[key])
+    return merged
+
+
+class EventEmitter:
+    """Minimal publish/subscribe helper for data manager write events."""
+
+    def subscribe(self, event, callback):
+        """
+        Registers a callback for an event.
+
+        :param event: Event name, e.g. "posters_released"
+        :param callback: Callable invoked with the event's keyword arguments
+        """
+        self.__dict__.setdefault('_subscribers', {}).setdefault(event, []).append(callback)
+
+    def emit(self, event, **payload):
+        """Calls every callback registered for an event."""
+        for callback in self.__dict__.get('_subscribers', {}).get(event, []):
+            try:
+                callback(**payload)
+            except Exception as error:
+                print(f"Error in {event} subscriber: {error}")
+
+    def emit_all(self, events):
+        """Emits the (event, payload) pairs queued by a unit of work, coalesced."""
+        for event, payload in coalesce(events):
+            self.emit(event, **payload)
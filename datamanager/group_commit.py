@@ -0,0 +1,93 @@
+import threading
+import time
+from concurrent.futures import Future
+
+
+class GroupCommit:
+    """
+    Batches writes from concurrent requests into shared transactions.
+
+    submit() queues an item and blocks until the batch containing it has
+    been committed. A worker thread collects items for up to ``window``
+    seconds after the first one arrives (at most ``max_batch`` items) and
+    hands them to ``apply_batch`` inside an app context, so N concurrent
+    writes pay for one commit and one fsync. A write arriving alone waits
+    at most ``window`` seconds longer than it would have.
+    """
+
+    def __init__(self, app, apply_batch, window=0.005, max_batch=100):
+        """
+        :param app: Flask app the worker pushes contexts for
+        :param apply_batch: Callable receiving a list of items and returning
+                            one result per item, in order
+        :param window: Seconds to wait for more items after the first
+        :param max_batch: Maximum items per transaction
+        """
+        self.app = app
+        self.apply_batch = apply_batch
+        self.window = window
+        self.max_batch = max_batch
+        self.batches = 0
+        self.items = 0
+        self._pending = []
+        self._condition = threading.Condition()
+        self._worker = None
+        self._stopped = False
+
+    def submit(self, item):
+        """
+        Queues an item and waits for its batch to commit.
+
+        :return: The result apply_batch returned for the item
+        :raises RuntimeError: After stop()
+        """
+        future = Future()
+        with self._condition:
+            if self._stopped:
+                raise RuntimeError("Group commit is stopped")
+            self._pending.append((item, future))
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name="group-commit",
+                                                daemon=True)
+                self._worker.start()
+            self._condition.notify()
+        return future.result()
+
+    def stop(self, wait=True):
+        """Commits what is queued, then stops the worker."""
+        with self._condition:
+            self._stopped = True
+            self._condition.notify()
+            worker = self._worker
+        if wait and worker is not None:
+            worker.join()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._pending and not self._stopped:
+                    self._condition.wait()
+                if not self._pending:
+                    return
+                deadline = time.monotonic() + self.window
+                while len(self._pending) < self.max_batch and not self._stopped:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._condition.wait(remaining)
+                batch = self._pending[:self.max_batch]
+                self._pending = self._pending[self.max_batch:]
+            self._commit(batch)
+
+    def _commit(self, batch):
+        try:
+            with self.app.app_context():
+                results = self.apply_batch([item for item, _ in batch])
+        except Exception as error:
+            for _, future in batch:
+                future.set_exception(error)
+            return
+        self.batches += 1
+        self.items += len(batch)
+        for (_, future), result in zip(batch, results):
+            future.set_result(result)
@@ -0,0 +1,37 @@
+def movie_identity(values):
+    """
+    Returns the key two new movies are duplicates under: their IMDb id or,
+    without one, their normalized title.
+
+    :param values: Movie column values, as from Movie.values_from_omdb
+    """
+    if values.get('imdb_id'):
+        return 'imdb', values['imdb_id']
+    return 'title', values.get('title_key')
+
+
+def match_movie(values, by_imdb_id, by_title_key):
+    """
+    Finds the catalog movie that new movie values refer to.
+
+    Movies with the same IMDb id are the same movie. Values without one
+    match the oldest movie with the same title, ignoring case and
+    punctuation. Values with an IMDb id only fall back to the title for
+    movies that have no IMDb id yet and the same year, so remakes sharing
+    a title stay separate movies.
+
+    :param values: Movie column values, as from Movie.values_from_omdb
+    :param by_imdb_id: Dict of IMDb id to movie
+    :param by_title_key: Dict of title key to movies, oldest first
+    :return: The matching movie (any object with imdb_id and
+             release_year) or None
+    """
+    candidates = by_title_key.get(values.get('title_key')) or []
+    if values.get('imdb_id'):
+        match = by_imdb_id.get(values['imdb_id'])
+        if match is not None:
+            return match
+        year = str(values.get('release_year'))
+        return next((movie for movie in candidates
+                     if movie.imdb_id is None and str(movie.release_year) == year), None)
+    return candidates[0] if candidates else None
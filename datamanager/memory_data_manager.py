@@ -0,0 +1,556 @@
+import itertools
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from operator import attrgetter
+
+from data_model import (User, Movie, MovieRatingStats, UserMovies, OMDB_METADATA_COLUMNS,
+                        RATING_BUCKETS, normalize_title, rating_bucket, rating_value,
+                        year_value)
+from datamanager.data_manager_interface import DataManagerInterface
+from datamanager.identity import match_movie
+from datamanager.pagination import (PAGE_SIZE, MOVIE_SORTS, USER_SORTS, USER_MOVIE_SORTS,
+                                    LEADERBOARD_SORTS, paginate_items, resolve_sort)
+from datamanager.records import RESOURCES, resolve_fields, to_record
+from datamanager.search import SEARCH_LIMIT, match_score, search_terms
+
+
+def _numeric(value, number_type):
+    """Converts numeric strings like SQLite column affinity does."""
+    try:
+        return number_type(value)
+    except (TypeError, ValueError):
+        return value
+
+
+class InMemoryDataManager(DataManagerInterface):
+    """
+    Data manager that keeps everything in process memory.
+
+    Rows are plain (transient) model instances held in dicts by id, with
+    secondary indexes for the lookups the app performs: users by name,
+    movies by normalized title and IMDb id and links by user and by movie.
+    Nothing is persisted, which makes it suitable for tests and read
+    replicas that are rebuilt on startup.
+
+    Reads ORPHAN_GC_MODE from app.config like SQLAlchemyDataManager.
+    """
+
+    def __init__(self, app=None):
+        self.users = {}
+        self.movies = {}
+        self.links = {}
+        self.users_by_name = {}
+        self.movies_by_title_key = {}
+        self.movies_by_imdb_id = {}
+        self.links_by_user = {}
+        self.links_by_movie = {}
+        self.rating_stats = {}
+        self._ids = {User: itertools.count(1), Movie: itertools.count(1),
+                     UserMovies: itertools.count(1)}
+        self._lock = threading.RLock()
+        self._unit = threading.local()
+        self.deferred_orphan_gc = app is not None and app.config.setdefault(
+            'ORPHAN_GC_MODE', 'immediate') == 'deferred'
+
+    @contextmanager
+    def transaction(self):
+        """
+            Groups writes into one unit of work, like a database transaction.
+
+            The lock is held for the whole unit, so other writers never
+            interleave with it. Writes are applied immediately and logged.
+            If the block raises or a write inside it fails, the outermost
+            block undoes them in reverse order and emits no events;
+            otherwise it emits their events once, after the last write.
+        """
+        with self._lock:
+            unit = self._unit
+            depth = getattr(unit, 'depth', 0)
+            if depth == 0:
+                unit.events, unit.undo, unit.failed = [], [], False
+            unit.depth = depth + 1
+            try:
+                yield None
+            except BaseException:
+                unit.failed = True
+                raise
+            finally:
+                unit.depth = depth
+                if depth == 0:
+                    undo_log, events, unit.undo, unit.events = unit.undo, unit.events, [], []
+                    if unit.failed:
+                        for undo in reversed(undo_log):
+                            undo()
+                    else:
+                        self.emit_all(events)
+
+    def _publish(self, event, **payload):
+        """Emits an event, or queues it until the current unit of work ends."""
+        if getattr(self._unit, 'depth', 0):
+            self._unit.events.append((event, payload))
+        else:
+            self.emit(event, **payload)
+
+    def _log_undo(self, undo):
+        """Records how to revert a write if the current unit of work fails."""
+        if getattr(self._unit, 'depth', 0):
+            self._unit.undo.append(undo)
+
+    def _fail(self):
+        """Marks the current unit of work for rollback, as a failed statement would."""
+        if getattr(self._unit, 'depth', 0):
+            self._unit.failed = True
+
+    def get_all_users(self):
+        """Returns a list of all users."""
+        return list(self.users.values())
+
+    def get_all_movies(self):
+        """Returns a list of all movies."""
+        return list(self.movies.values())
+
+    def get_users_page(self, sort="name", after=None, before=None, limit=PAGE_SIZE):
+        """Returns one page of users using keyset pagination."""
+        sort = resolve_sort(USER_SORTS, sort, "name")
+        return paginate_items(self.get_all_users(), USER_SORTS, sort, after, before, limit)
+
+    def get_movies_page(self, sort="title", after=None, before=None, limit=PAGE_SIZE):
+        """Returns one page of movies using keyset pagination."""
+        sort = resolve_sort(MOVIE_SORTS, sort, "title")
+        return paginate_items(self.get_all_movies(), MOVIE_SORTS, sort, after, before, limit)
+
+    def get_top_movies_page(self, sort="user_rating", min_ratings=1, after=None, before=None,
+                            limit=PAGE_SIZE):
+        """Returns one page of the user rating leaderboard."""
+        sort = resolve_sort(LEADERBOARD_SORTS, sort, "user_rating")
+        with self._lock:
+            ranked = [self.movies[stats.movie_id] for stats in self.rating_stats.values()
+                      if stats.rating_count >= min_ratings and stats.movie_id in self.movies]
+        return paginate_items(ranked, LEADERBOARD_SORTS, sort, after, before, limit)
+
+    def get_user_movies_page(self, user_id, sort="recent", after=None, before=None,
+                             limit=PAGE_SIZE):
+        """Returns one page of a user's collection or None if user not found."""
+        sort = resolve_sort(USER_MOVIE_SORTS, sort, "recent")
+        user_movies = self.get_user_movies(user_id)
+        if user_movies is None:
+            return None
+        return paginate_items(user_movies, USER_MOVIE_SORTS, sort, after, before, limit)
+
+    def get_records(self, resource, fields=None, sort=None, after=None, before=None,
+                    limit=PAGE_SIZE, user_id=None):
+        """Returns one page of plain dicts for the JSON API."""
+        spec = RESOURCES[resource]
+        fields = resolve_fields(spec, fields)
+        sort = resolve_sort(spec.sorts, sort, spec.default_sort)
+        items = self._resource_items(resource, user_id)
+        if items is None:
+            return None
+        page = paginate_items(items, spec.sorts, sort, after, before, limit)
+        return page._replace(items=[to_record(spec, fields, item) for item in page.items])
+
+    def iter_records(self, resource, fields=None, user_id=None):
+        """Streams every record of a resource as plain dicts, ordered by key."""
+        spec = RESOURCES[resource]
+        fields = resolve_fields(spec, fields)
+        items = self._resource_items(resource, user_id)
+        if items is None:
+            return None
+        return (to_record(spec, fields, item) for item in sorted(items, key=spec.key.value))
+
+    def get_record(self, resource, record_id, fields=None, user_id=None):
+        """Returns a single record as a plain dict."""
+        spec = RESOURCES[resource]
+        fields = resolve_fields(spec, fields)
+        for item in self._resource_items(resource, user_id) or []:
+            if spec.key.value(item) == record_id:
+                return to_record(spec, fields, item)
+        return None
+
+    def _resource_items(self, resource, user_id):
+        if resource == 'users':
+            return self.get_all_users()
+        if resource == 'movies':
+            return self.get_all_movies()
+        return self.get_user_movies(user_id)
+
+    def get_user_movies(self, user_id):
+        """Retrieves all movies associated with a given user."""
+        if user_id not in self.users:
+            return None
+        return list(self.links_by_user.get(user_id, {}).values())
+
+    def get_user_movie(self, user_id, movie_id):
+        """Retrieves a specific UserMovies entry for a given user and movie."""
+        return self.links_by_user.get(user_id, {}).get(movie_id)
+
+    def get_user_by_name(self, username):
+        """Retrieves a user by name, "Error" if there is none."""
+        return self.users_by_name.get(username, "Error")
+
+    def get_movie(self, movie_id):
+        """Retrieves a movie by its ID."""
+        return self.movies.get(movie_id)
+
+    def add_item(self, item):
+        """
+            Generic method to add an item.
+
+            :param item: User, Movie or UserMovies instance
+            :return: The added item or None if it violates a unique index
+        """
+        with self._lock:
+            if isinstance(item, User):
+                if item.name in self.users_by_name:
+                    self._fail()
+                    return None
+                item.id = next(self._ids[User])
+                self._index_user(item)
+            elif isinstance(item, Movie):
+                if item.imdb_id and item.imdb_id in self.movies_by_imdb_id:
+                    self._fail()
+                    return None
+                if item.title_key is None:
+                    item.title_key = normalize_title(item.title)
+                item.id = next(self._ids[Movie])
+                self._index_movie(item)
+            elif isinstance(item, UserMovies):
+                if (item.movie_id in self.links_by_user.get(item.user_id, {})
+                        or item.movie_id not in self.movies):
+                    self._fail()
+                    return None
+                item.id = next(self._ids[UserMovies])
+                item.movie = self.movies[item.movie_id]
+                self._link(item)
+            else:
+                return None
+            return item
+
+    def add_user(self, username):
+        """Adds a new user, None if the name is taken."""
+        user = self.add_item(User(name=username))
+        if user:
+            self._publish("data_changed", user_ids={user.id})
+        return user
+
+    def add_movie_to_user(self, movie, user_id):
+        """Links an existing movie to a user."""
+        if movie.id in self.links_by_user.get(user_id, {}):
+            self._fail()
+            return "Movie already exists"
+        link = UserMovies(movie_id=movie.id, user_id=user_id, movie_rating=movie.rating)
+        if self.add_item(link) is None:
+            return "Error with the database"
+        self._publish("data_changed", user_ids={user_id})
+        return None
+
+    def add_movie(self, movie, user_id):
+        """Adds a movie, unless it is in the catalog already, and links it to a user."""
+        with self.transaction():
+            linked = self._match_movie(Movie.values_from_omdb(movie)) or self._new_movie(movie)
+            error = self.add_movie_to_user(linked, user_id)
+        return (None, error) if error else (linked.id, None)
+
+    def find_movie(self, movie):
+        """Finds the catalog movie that movie data refers to."""
+        return self._match_movie(Movie.values_from_omdb(movie))
+
+    def find_movie_by_title(self, title, year=None):
+        """Finds a catalog movie by title, the most recent one without a year."""
+        with self._lock:
+            movies = list(self.movies_by_title_key.get(normalize_title(title), ()))
+        if year is not None:
+            movies = [movie for movie in movies if year_value(movie.release_year) == year]
+        # max keeps the first of equal years, the oldest entry, as the SQL backends do.
+        return max(movies, key=lambda movie: year_value(movie.release_year) or 0,
+                   default=None)
+
+    def get_movies_by_titles(self, titles):
+        """Looks up movie ids by title, ignoring case and punctuation."""
+        movies = {title: self.movies_by_title_key.get(normalize_title(title)) for title in titles}
+        return {title: matches[0].id for title, matches in movies.items() if matches}
+
+    def get_movies_by_ids(self, movie_ids):
+        """Retrieves several movies at once, for display."""
+        return {movie_id: self.movies[movie_id] for movie_id in movie_ids
+                if movie_id in self.movies}
+
+    def get_ratings(self, user_ids=None):
+        """Retrieves the numeric ratings of users, every user's if user_ids is None."""
+        with self._lock:
+            ratings = {}
+            for user_id in self.links_by_user if user_ids is None else user_ids:
+                rated = {link.movie_id: rating_value(link.movie_rating)
+                         for link in self.links_by_user.get(user_id, {}).values()}
+                rated = {movie_id: rating for movie_id, rating in rated.items()
+                         if rating is not None}
+                if rated:
+                    ratings[user_id] = rated
+            return ratings
+
+    def search_movies(self, query, limit=SEARCH_LIMIT):
+        """Searches the catalog by word prefixes of title, director and year."""
+        terms = search_terms(query)
+        if not terms:
+            return []
+        scored = []
+        for movie in self.get_all_movies():
+            score = match_score(movie, terms)
+            if score is not None:
+                scored.append((-score, movie.id, movie))
+        scored.sort(key=lambda entry: entry[:2])
+        return [movie for _, _, movie in scored[:limit]]
+
+    def search_records(self, query, fields=None, limit=SEARCH_LIMIT):
+        """Searches the catalog, returning "movies" records for the JSON API."""
+        spec = RESOURCES['movies']
+        fields = resolve_fields(spec, fields)
+        return [to_record(spec, fields, movie) for movie in self.search_movies(query, limit)]
+
+    def import_watchlist_chunk(self, entries):
+        """Adds a chunk of watchlist rows, creating missing users and movies."""
+        errors = []
+        user_ids = set()
+        with self.transaction():
+            for entry in entries:
+                user = self.users_by_name.get(entry['user']) or self.add_user(entry['user'])
+                data = entry.get('movie') or {'Title': entry['title']}
+                movie = self._match_movie(Movie.values_from_omdb(data)) or self._new_movie(data)
+                if movie.id in self.links_by_user.get(user.id, {}):
+                    errors.append((entry['line'], "Movie already exists"))
+                    continue
+                rating = entry.get('rating')
+                user_ids.add(user.id)
+                self.add_item(UserMovies(user_id=user.id, movie_id=movie.id,
+                                         movie_rating=rating if rating is not None
+                                         else movie.rating))
+            self._publish("data_changed", user_ids=user_ids)
+        return errors
+
+    def update_movie(self, movie, rating):
+        """Updates the user-specific movie rating."""
+        if not rating or not isinstance(rating, (float, int)) or not movie:
+            return None
+        with self._lock:
+            self._rate(movie, float(rating))
+        self._publish("data_changed", user_ids={movie.user_id})
+        return movie
+
+    def delete_movie(self, user_id, movie_id):
+        """Deletes a movie from a user's collection and possibly from the catalog."""
+        with self._lock:
+            movie = self.movies.get(movie_id)
+            link = self.links_by_user.get(user_id, {}).get(movie_id)
+            if not movie or not link:
+                return None
+            self._unlink(link)
+            if not self.deferred_orphan_gc:
+                self._release_posters(self._sweep_orphans({movie_id}))
+        self._publish("data_changed", user_ids={user_id})
+        return movie
+
+    def delete_user(self, user_id):
+        """Deletes a user, their links and movies no one else has."""
+        with self._lock:
+            user = self.users.get(user_id)
+            if user is None:
+                return
+            links = list(self.links_by_user.get(user_id, {}).values())
+            for link in links:
+                self._unlink(link)
+            self._unindex_user(user)
+            if not self.deferred_orphan_gc:
+                self._release_posters(self._sweep_orphans({link.movie_id for link in links}))
+        self._publish("data_changed", user_ids={user_id})
+
+    def sweep_orphans(self):
+        """Deletes every movie that no user links to."""
+        with self._lock:
+            orphans = [movie_id for movie_id in self.movies
+                       if not self.links_by_movie.get(movie_id)]
+            self._release_posters(self._sweep_orphans(orphans))
+        if orphans:
+            self._publish("data_changed", user_ids=set())
+        return len(orphans)
+
+    def set_poster_status(self, poster_url, status, poster_hash=None):
+        """Records the verification result for every movie using a poster URL."""
+        updated = 0
+        owners = set()
+        checked_at = datetime.now(timezone.utc)
+        with self._lock:
+            for movie in self.movies.values():
+                if movie.poster == poster_url:
+                    self._update_movie(movie, {'poster_status': status,
+                                               'poster_checked_at': checked_at,
+                                               'poster_hash': poster_hash})
+                    owners |= self.links_by_movie.get(movie.id, set())
+                    updated += 1
+        if updated:
+            self._publish("data_changed", user_ids=owners)
+        return updated
+
+    def get_unverified_posters(self, limit=100, after=None):
+        """Retrieves poster URLs that have not been verified or mirrored yet, sorted."""
+        posters = set()
+        with self._lock:
+            for movie in self.movies.values():
+                pending = movie.poster_status is None or (movie.poster_status == "ok"
+                                                          and movie.poster_hash is None)
+                if movie.poster and pending and (after is None or movie.poster > after):
+                    posters.add(movie.poster)
+        return sorted(posters)[:limit]
+
+    def get_stale_movies(self, refreshed_before, limit=100):
+        """Retrieves movies whose OMDb metadata is due for a refresh, oldest first."""
+        with self._lock:
+            stale = [movie for movie in self.movies.values()
+                     if movie.metadata_refreshed_at is None
+                     or movie.metadata_refreshed_at < refreshed_before]
+        stale.sort(key=lambda movie: (movie.metadata_refreshed_at is not None,
+                                      movie.metadata_refreshed_at or refreshed_before, movie.id))
+        return stale[:limit]
+
+    def update_movie_metadata(self, updates):
+        """Stores refreshed OMDb metadata and marks the movies as refreshed."""
+        refreshed_at = datetime.now(timezone.utc)
+        changed = 0
+        released = set()
+        with self._lock:
+            for movie_id, values in updates.items():
+                movie = self.movies.get(movie_id)
+                if movie is None:
+                    continue
+                values = {column: value for column, value in values.items()
+                          if column in OMDB_METADATA_COLUMNS and value is not None
+                          and getattr(movie, column) != value}
+                if values.get('imdb_id') in self.movies_by_imdb_id:
+                    del values['imdb_id']
+                changed += bool(values)
+                if 'poster' in values:
+                    released.add(movie.poster_hash)
+                    values.update(poster_status=None, poster_checked_at=None, poster_hash=None)
+                self._update_movie(movie, dict(values, metadata_refreshed_at=refreshed_at))
+            self._release_posters(released)
+        if changed:
+            self._publish("data_changed", user_ids=None)
+        return changed
+
+    def _new_movie(self, movie):
+        values = Movie.values_from_omdb(movie)
+        values['release_year'] = _numeric(values['release_year'], int)
+        values['rating'] = _numeric(values['rating'], float)
+        return self.add_item(Movie(**values))
+
+    def _match_movie(self, values):
+        return match_movie(values, self.movies_by_imdb_id, self.movies_by_title_key)
+
+    # The write primitives below keep the indexes in step and log their
+    # inverse, so a failed unit of work can be undone.
+
+    def _index_user(self, user):
+        self.users[user.id] = user
+        self.users_by_name[user.name] = user
+        self._log_undo(lambda: self._unindex_user(user))
+
+    def _unindex_user(self, user):
+        self.users.pop(user.id, None)
+        self.users_by_name.pop(user.name, None)
+        self.links_by_user.pop(user.id, None)
+        self._log_undo(lambda: self._index_user(user))
+
+    def _index_movie(self, movie):
+        self.movies[movie.id] = movie
+        same_title = self.movies_by_title_key.setdefault(movie.title_key, [])
+        same_title.append(movie)
+        same_title.sort(key=attrgetter('id'))
+        if movie.imdb_id:
+            self.movies_by_imdb_id[movie.imdb_id] = movie
+        self._log_undo(lambda: self._unindex_movie(movie))
+
+    def _unindex_movie(self, movie):
+        self.movies.pop(movie.id, None)
+        self.links_by_movie.pop(movie.id, None)
+        same_title = self.movies_by_title_key.get(movie.title_key, [])
+        if movie in same_title:
+            same_title.remove(movie)
+            if not same_title:
+                del self.movies_by_title_key[movie.title_key]
+        if movie.imdb_id and self.movies_by_imdb_id.get(movie.imdb_id) is movie:
+            del self.movies_by_imdb_id[movie.imdb_id]
+        self._log_undo(lambda: self._index_movie(movie))
+
+    def _update_movie(self, movie, values):
+        """Sets movie columns, keeping the IMDb id index current."""
+        previous = {column: getattr(movie, column) for column in values}
+        if 'imdb_id' in values:
+            if self.movies_by_imdb_id.get(movie.imdb_id) is movie:
+                del self.movies_by_imdb_id[movie.imdb_id]
+            if values['imdb_id']:
+                self.movies_by_imdb_id[values['imdb_id']] = movie
+        for column, value in values.items():
+            setattr(movie, column, value)
+        self._log_undo(lambda: self._update_movie(movie, previous))
+
+    def _link(self, link):
+        self.links[link.id] = link
+        self.links_by_user.setdefault(link.user_id, {})[link.movie_id] = link
+        self.links_by_movie.setdefault(link.movie_id, set()).add(link.user_id)
+        self._apply_rating(link.movie_id, new=link.movie_rating)
+        self._log_undo(lambda: self._unlink(link))
+
+    def _unlink(self, link):
+        self._apply_rating(link.movie_id, old=link.movie_rating)
+        self.links.pop(link.id, None)
+        self.links_by_user.get(link.user_id, {}).pop(link.movie_id, None)
+        self.links_by_movie.get(link.movie_id, set()).discard(link.user_id)
+        self._log_undo(lambda: self._link(link))
+
+    def _rate(self, link, rating):
+        previous = link.movie_rating
+        self._apply_rating(link.movie_id, previous, rating)
+        link.movie_rating = rating
+        self._log_undo(lambda: self._rate(link, previous))
+
+    def _apply_rating(self, movie_id, old=None, new=None):
+        """Updates a movie's MovieRatingStats for one rating change."""
+        old, new = rating_value(old), rating_value(new)
+        if old == new:
+            return
+        stats = self.rating_stats.get(movie_id)
+        if stats is None:
+            stats = MovieRatingStats(movie_id=movie_id, rating_count=0, rating_sum=0.0,
+                                     **{f"bucket_{bucket}": 0 for bucket in range(RATING_BUCKETS)})
+            self.rating_stats[movie_id] = stats
+            self.movies[movie_id].rating_stats = stats
+        for rating, delta in ((old, -1), (new, 1)):
+            if rating is None:
+                continue
+            stats.rating_count += delta
+            stats.rating_sum += delta * rating
+            bucket = f"bucket_{rating_bucket(rating)}"
+            setattr(stats, bucket, getattr(stats, bucket) + delta)
+        if stats.rating_count <= 0:
+            del self.rating_stats[movie_id]
+            self.movies[movie_id].rating_stats = None
+        else:
+            stats.rating_mean = stats.rating_sum / stats.rating_count
+
+    def _sweep_orphans(self, movie_ids):
+        """Removes movies without links and returns their poster digests."""
+        poster_hashes = set()
+        for movie_id in movie_ids:
+            movie = self.movies.get(movie_id)
+            if movie is None or self.links_by_movie.get(movie_id):
+                continue
+            self._unindex_movie(movie)
+            poster_hashes.add(movie.poster_hash)
+        return poster_hashes
+
+    def _release_posters(self, poster_hashes):
+        in_use = {movie.poster_hash for movie in self.movies.values()}
+        released = {poster_hash for poster_hash in poster_hashes
+                    if poster_hash and poster_hash not in in_use}
+        if released:
+            self._publish("posters_released", poster_hashes=released)
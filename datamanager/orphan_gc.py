@@ -0,0 +1,39 @@
+import threading
+
+
+class OrphanCollector:
+    """
+    Background thread that periodically deletes movies left without users.
+
+    Used with ORPHAN_GC_MODE = "deferred", where delete_user and
+    delete_movie only remove links and leave the movie sweep to this thread.
+    """
+
+    def __init__(self, app, data_manager, interval=60):
+        self.app = app
+        self.data_manager = data_manager
+        self.interval = interval
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Starts the sweep loop in a daemon thread."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="orphan-gc", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Stops the sweep loop after the current sweep."""
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def sweep(self):
+        """Runs one sweep and returns the number of movies deleted."""
+        with self.app.app_context():
+            return self.data_manager.sweep_orphans()
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            self.sweep()
@@ -0,0 +1,210 @@
+import base64
+import binascii
+import json
+from typing import Any, Callable, List, NamedTuple, Optional
+
+from sqlalchemy import func, tuple_
+
+from data_model import User, Movie, MovieRatingStats, UserMovies
+
+PAGE_SIZE = 24
+MAX_PAGE_SIZE = 100
+
+
+class SortKey(NamedTuple):
+    """A stable sort order: a column expression plus the primary key as tie-breaker."""
+    column: Any
+    id_column: Any
+    descending: bool
+    value: Callable[[Any], Any]
+
+
+class Page(NamedTuple):
+    """One page of results with the cursors of its neighbouring pages."""
+    items: List[Any]
+    sort: str
+    next_cursor: Optional[str] = None
+    prev_cursor: Optional[str] = None
+
+
+def _rating(value):
+    return value if value is not None else -1.0
+
+
+def _user_rating(movie):
+    return _rating(movie.rating_stats.rating_mean if movie.rating_stats else None)
+
+
+def _rating_count(movie):
+    return movie.rating_stats.rating_count if movie.rating_stats else 0
+
+
+MOVIE_SORTS = {
+    'title': SortKey(Movie.title, Movie.id, False, lambda movie: movie.title),
+    'year': SortKey(Movie.release_year, Movie.id, True, lambda movie: movie.release_year),
+    'rating': SortKey(func.coalesce(Movie.rating, -1.0), Movie.id, True,
+                      lambda movie: _rating(movie.rating)),
+    'recent': SortKey(Movie.id, Movie.id, True, lambda movie: movie.id),
+    'user_rating': SortKey(func.coalesce(MovieRatingStats.rating_mean, -1.0), Movie.id, True,
+                           _user_rating),
+    'most_rated': SortKey(func.coalesce(MovieRatingStats.rating_count, 0), Movie.id, True,
+                          _rating_count),
+}
+
+# Sorts that need movie_rating_stats joined to the movie query.
+STATS_SORTS = {'user_rating', 'most_rated'}
+
+# The leaderboard reads movie_rating_stats directly, so it seeks on the
+# (rating_mean, movie_id) and (rating_count, movie_id) indexes.
+LEADERBOARD_SORTS = {
+    'user_rating': SortKey(MovieRatingStats.rating_mean, MovieRatingStats.movie_id, True,
+                           _user_rating),
+    'most_rated': SortKey(MovieRatingStats.rating_count, MovieRatingStats.movie_id, True,
+                          _rating_count),
+}
+
+USER_SORTS = {
+    'name': SortKey(User.name, User.id, False, lambda user: user.name),
+    'recent': SortKey(User.id, User.id, True, lambda user: user.id),
+}
+
+USER_MOVIE_SORTS = {
+    'title': SortKey(Movie.title, UserMovies.id, False, lambda um: um.movie.title),
+    'year': SortKey(Movie.release_year, UserMovies.id, True,
+                    lambda um: um.movie.release_year),
+    'rating': SortKey(func.coalesce(UserMovies.movie_rating, -1.0), UserMovies.id, True,
+                      lambda um: _rating(um.movie_rating)),
+    'recent': SortKey(UserMovies.id, UserMovies.id, True, lambda um: um.id),
+}
+
+
+def encode_cursor(sort_key, item):
+    """Encodes the position of an item as an opaque URL-safe token."""
+    position = [sort_key.value(item), item.id]
+    return base64.urlsafe_b64encode(json.dumps(position).encode()).decode().rstrip("=")
+
+
+def decode_cursor(token):
+    """
+    Decodes a cursor token.
+
+    :return: [sort value, id] or None if the token is missing or malformed
+    """
+    if not token:
+        return None
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        position = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, binascii.Error, UnicodeDecodeError):
+        return None
+    if not isinstance(position, list) or len(position) != 2:
+        return None
+    value, item_id = position
+    # Only what encode_cursor produces: a scalar sort value and an integer
+    # id. Anything else cannot be compared with the rows.
+    if isinstance(value, (list, dict)) or type(item_id) is not int:
+        return None
+    return position
+
+
+def resolve_sort(sorts, sort, default):
+    """Returns a valid sort name, falling back to the default."""
+    return sort if sort in sorts else default
+
+
+def clamp_limit(limit):
+    """Keeps the page size between 1 and MAX_PAGE_SIZE."""
+    try:
+        limit = int(limit)
+    except (TypeError, ValueError):
+        return PAGE_SIZE
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+
+def paginate(query, sorts, sort, after=None, before=None, limit=PAGE_SIZE):
+    """
+    Applies keyset pagination to a query.
+
+    Rows are ordered by the sort column and the id tie-breaker, and the
+    cursor seeks past the last row seen instead of using OFFSET, so every
+    page costs the same regardless of how deep it is.
+
+    :param query: SQLAlchemy query returning the paged entities
+    :param sorts: Mapping of sort names to SortKey
+    :param sort: Requested sort name
+    :param after: Cursor of the last item of the previous page
+    :param before: Cursor of the first item of the next page
+    :param limit: Page size
+    :return: Page
+    """
+    sort_key = sorts[sort]
+    limit = clamp_limit(limit)
+    after, before = decode_cursor(after), decode_cursor(before)
+    backwards = before is not None and after is None
+    # Walking backwards flips the direction and the page is reversed at the end.
+    descending = sort_key.descending != backwards
+    position = before if backwards else after
+
+    row_key = tuple_(sort_key.column, sort_key.id_column)
+    if position is not None:
+        query = query.filter(row_key < tuple_(*position) if descending
+                             else row_key > tuple_(*position))
+    if descending:
+        query = query.order_by(sort_key.column.desc(), sort_key.id_column.desc())
+    else:
+        query = query.order_by(sort_key.column.asc(), sort_key.id_column.asc())
+
+    return _build_page(query.limit(limit + 1).all(), sort_key, sort, limit, backwards,
+                       position is not None)
+
+
+def sort_value(value):
+    """Orders Python values the way SQLite does: NULL, then numbers, then text."""
+    if value is None:
+        return 0, 0
+    if isinstance(value, (int, float)):
+        return 1, value
+    return 2, str(value)
+
+
+def paginate_items(items, sorts, sort, after=None, before=None, limit=PAGE_SIZE):
+    """
+    Applies the same keyset pagination as paginate() to in-memory objects.
+
+    :param items: Iterable of the paged objects
+    :return: Page
+    """
+    sort_key = sorts[sort]
+    limit = clamp_limit(limit)
+    after, before = decode_cursor(after), decode_cursor(before)
+    backwards = before is not None and after is None
+    descending = sort_key.descending != backwards
+    position = before if backwards else after
+
+    def row_key(item):
+        return sort_value(sort_key.value(item)), item.id
+
+    ordered = sorted(items, key=row_key, reverse=descending)
+    if position is not None:
+        seek = (sort_value(position[0]), position[1])
+        ordered = [item for item in ordered
+                   if (row_key(item) < seek if descending else row_key(item) > seek)]
+    return _build_page(ordered[:limit + 1], sort_key, sort, limit, backwards,
+                       position is not None)
+
+
+def _build_page(items, sort_key, sort, limit, backwards, has_position):
+    has_more = len(items) > limit
+    items = items[:limit]
+    if backwards:
+        items.reverse()
+    if not items:
+        return Page(items=[], sort=sort)
+
+    if backwards:
+        next_cursor = encode_cursor(sort_key, items[-1])
+        prev_cursor = encode_cursor(sort_key, items[0]) if has_more else None
+    else:
+        next_cursor = encode_cursor(sort_key, items[-1]) if has_more else None
+        prev_cursor = encode_cursor(sort_key, items[0]) if has_position else None
+    return Page(items=items, sort=sort, next_cursor=next_cursor, prev_cursor=prev_cursor)
@@ -0,0 +1,54 @@
+from contextlib import contextmanager
+
+from sqlalchemy import event
+
+
+class QueryCounter:
+    """
+    Records the SQL statements executed on one or more engines while active.
+
+    Pass every engine of the data manager, since page reads may go to its
+    read-only engine. Usage::
+
+        with QueryCounter(*data_manager.engines()) as counter:
+            client.get('/users/1')
+        assert counter.count <= 3, counter.statements
+    """
+
+    def __init__(self, *engines):
+        self.engines = engines
+        self.statements = []
+
+    @property
+    def count(self):
+        """Number of statements executed so far."""
+        return len(self.statements)
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+    def __enter__(self):
+        for engine in self.engines:
+            event.listen(engine, "before_cursor_execute", self._record)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        for engine in self.engines:
+            event.remove(engine, "before_cursor_execute", self._record)
+        return False
+
+
+@contextmanager
+def assert_max_queries(expected, *engines):
+    """
+    Fails with AssertionError if the block runs more than ``expected`` statements.
+
+    :param expected: Maximum number of statements allowed
+    :param engines: SQLAlchemy engines to watch
+    """
+    with QueryCounter(*engines) as counter:
+        yield counter
+    if counter.count > expected:
+        statements = "\n".join(counter.statements)
+        raise AssertionError(f"Expected at most {expected} queries, "
+                             f"got {counter.count}:\n{statements}")
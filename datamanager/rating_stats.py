@@ -0,0 +1,100 @@
+from sqlalchemy import and_, case, delete, func, insert, select, update
+
+from data_model import MovieRatingStats, UserMovies, RATING_BUCKETS, rating_bucket, rating_value
+
+STATS_REFRESH_BATCH = 500
+
+
+def bucket_column(bucket):
+    """Returns the MovieRatingStats column counting a histogram bucket."""
+    return getattr(MovieRatingStats, f"bucket_{bucket}")
+
+
+def _in_bucket(rating, bucket):
+    if bucket == 0:
+        return rating < 1
+    if bucket == RATING_BUCKETS - 1:
+        return rating >= bucket
+    return and_(rating >= bucket, rating < bucket + 1)
+
+
+def apply_rating_change(executor, movie_id, old=None, new=None):
+    """
+    Updates a movie's aggregates for one rating being added, changed or removed.
+
+    Runs one UPDATE in the caller's transaction. A movie without a stats
+    row is recomputed from user_movies instead, and rows left without
+    ratings are deleted.
+
+    :param executor: Session or connection
+    :param movie_id: ID of the rated movie
+    :param old: Previous rating, None when the rating is new
+    :param new: New rating, None when the rating is removed
+
+    Non-numeric ratings such as OMDb's "N/A" count as no rating.
+    """
+    old, new = rating_value(old), rating_value(new)
+    if old == new:
+        return
+    count = MovieRatingStats.rating_count + ((new is not None) - (old is not None))
+    total = MovieRatingStats.rating_sum + ((new or 0.0) - (old or 0.0))
+    values = {MovieRatingStats.rating_count: count,
+              MovieRatingStats.rating_sum: total,
+              MovieRatingStats.rating_mean: case((count > 0, total / count))}
+    bucket_deltas = {}
+    if old is not None:
+        bucket_deltas[rating_bucket(old)] = bucket_deltas.get(rating_bucket(old), 0) - 1
+    if new is not None:
+        bucket_deltas[rating_bucket(new)] = bucket_deltas.get(rating_bucket(new), 0) + 1
+    for bucket, delta in bucket_deltas.items():
+        if delta:
+            values[bucket_column(bucket)] = bucket_column(bucket) + delta
+
+    updated = executor.execute(update(MovieRatingStats).where(
+        MovieRatingStats.movie_id == movie_id).values(values).execution_options(
+        synchronize_session=False))
+    if not updated.rowcount:
+        refresh_rating_stats(executor, [movie_id])
+    elif new is None:
+        executor.execute(delete(MovieRatingStats).where(
+            MovieRatingStats.movie_id == movie_id, MovieRatingStats.rating_count <= 0
+        ).execution_options(synchronize_session=False))
+
+
+def _aggregate(movie_filter=None):
+    rating = UserMovies.movie_rating
+    query = select(UserMovies.movie_id, func.count(rating), func.sum(rating), func.avg(rating),
+                   *(func.sum(case((_in_bucket(rating, bucket), 1), else_=0))
+                     for bucket in range(RATING_BUCKETS)))
+    # BETWEEN also skips "N/A" text that SQLite stores in the float column.
+    query = query.where(rating.between(0, 10))
+    if movie_filter is not None:
+        query = query.where(movie_filter)
+    return query.group_by(UserMovies.movie_id)
+
+
+STATS_COLUMNS = (['movie_id', 'rating_count', 'rating_sum', 'rating_mean']
+                 + [f"bucket_{bucket}" for bucket in range(RATING_BUCKETS)])
+
+
+def refresh_rating_stats(executor, movie_ids):
+    """
+    Recomputes the aggregates of the given movies from user_movies.
+
+    Set-based: one DELETE and one INSERT ... SELECT per batch of
+    STATS_REFRESH_BATCH movies, for bulk changes like imports and user
+    deletion.
+    """
+    movie_ids = sorted(set(movie_ids))
+    for start in range(0, len(movie_ids), STATS_REFRESH_BATCH):
+        batch = movie_ids[start:start + STATS_REFRESH_BATCH]
+        executor.execute(delete(MovieRatingStats).where(
+            MovieRatingStats.movie_id.in_(batch)).execution_options(synchronize_session=False))
+        executor.execute(insert(MovieRatingStats).from_select(
+            STATS_COLUMNS, _aggregate(UserMovies.movie_id.in_(batch))))
+
+
+def rebuild_rating_stats(executor):
+    """Recomputes the aggregates of every movie."""
+    executor.execute(delete(MovieRatingStats))
+    executor.execute(insert(MovieRatingStats).from_select(STATS_COLUMNS, _aggregate()))
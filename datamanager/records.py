@@ -0,0 +1,107 @@
+from operator import attrgetter
+from typing import Any, Callable, Dict, NamedTuple
+
+from data_model import User, Movie, MovieRatingStats, UserMovies
+from datamanager.pagination import MOVIE_SORTS, USER_SORTS, USER_MOVIE_SORTS
+
+
+class Field(NamedTuple):
+    """A serialized attribute: the column to select and how to read it from an object."""
+    column: Any
+    value: Callable[[Any], Any]
+
+
+class Resource(NamedTuple):
+    """Fields, sort orders, lookup key and FROM clause of a record listing."""
+    fields: Dict[str, Field]
+    sorts: Dict[str, Any]
+    default_sort: str
+    key: Field
+    select_from: Callable[[Any, Any], Any]
+
+
+def _stats(attribute):
+    def value(movie):
+        return getattr(movie.rating_stats, attribute) if movie.rating_stats else None
+    return value
+
+
+def _movie_of(attribute):
+    def value(user_movie):
+        return getattr(user_movie.movie, attribute)
+    return value
+
+
+USER_FIELDS = {
+    'id': Field(User.id, attrgetter('id')),
+    'name': Field(User.name, attrgetter('name')),
+}
+
+MOVIE_FIELDS = {
+    'id': Field(Movie.id, attrgetter('id')),
+    'title': Field(Movie.title, attrgetter('title')),
+    'director': Field(Movie.director, attrgetter('director')),
+    'year': Field(Movie.release_year, attrgetter('release_year')),
+    'imdb_rating': Field(Movie.rating, attrgetter('rating')),
+    'poster': Field(Movie.poster, attrgetter('poster')),
+    'imdb_id': Field(Movie.imdb_id, attrgetter('imdb_id')),
+    'genre': Field(Movie.genre, attrgetter('genre')),
+    'runtime': Field(Movie.runtime, attrgetter('runtime')),
+    'user_rating': Field(MovieRatingStats.rating_mean, _stats('rating_mean')),
+    'rating_count': Field(MovieRatingStats.rating_count, _stats('rating_count')),
+}
+
+USER_MOVIE_FIELDS = {
+    'id': Field(UserMovies.id, attrgetter('id')),
+    'movie_id': Field(UserMovies.movie_id, attrgetter('movie_id')),
+    'rating': Field(UserMovies.movie_rating, attrgetter('movie_rating')),
+    'title': Field(Movie.title, _movie_of('title')),
+    'director': Field(Movie.director, _movie_of('director')),
+    'year': Field(Movie.release_year, _movie_of('release_year')),
+    'poster': Field(Movie.poster, _movie_of('poster')),
+}
+
+
+def _users(query, user_id):
+    return query.select_from(User)
+
+
+def _movies(query, user_id):
+    return query.select_from(Movie).outerjoin(MovieRatingStats,
+                                              MovieRatingStats.movie_id == Movie.id)
+
+
+def _user_movies(query, user_id):
+    return query.select_from(UserMovies).join(Movie, UserMovies.movie_id == Movie.id).filter(
+        UserMovies.user_id == user_id)
+
+
+# "user_movies" records are a user's collection, looked up by movie id.
+RESOURCES = {
+    'users': Resource(USER_FIELDS, USER_SORTS, 'name', USER_FIELDS['id'], _users),
+    'movies': Resource(MOVIE_FIELDS, MOVIE_SORTS, 'title', MOVIE_FIELDS['id'], _movies),
+    'user_movies': Resource(USER_MOVIE_FIELDS, USER_MOVIE_SORTS, 'recent',
+                            USER_MOVIE_FIELDS['movie_id'], _user_movies),
+}
+
+
+def resolve_fields(resource, fields):
+    """
+    Validates a sparse fieldset.
+
+    :param resource: Resource
+    :param fields: Requested field names, None or empty for all
+    :return: Field names in request order, always starting with "id"
+    :raises ValueError: For unknown field names
+    """
+    if not fields:
+        return list(resource.fields)
+    unknown = [name for name in fields if name not in resource.fields]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    return ['id'] + [name for name in dict.fromkeys(fields) if name != 'id']
+
+
+def to_record(resource, fields, item):
+    """Serializes a model object to a dict of the requested fields."""
+    return {name: resource.fields[name].value(item) for name in fields}
@@ -0,0 +1,145 @@
+from datetime import datetime, timezone
+
+from sqlalchemy import (Column, DateTime, Integer, MetaData, String, Table, bindparam, cast,
+                        func, inspect, or_, select, text)
+
+from data_model import db, User, Movie, UserMovies, normalize_title
+from datamanager.rating_stats import rebuild_rating_stats
+from datamanager.search import create_movie_fts
+
+schema_version = Table(
+    'schema_version', MetaData(),
+    Column('version', Integer, primary_key=True),
+    Column('description', String(200), nullable=False),
+    Column('applied_at', DateTime, nullable=False),
+)
+
+
+def add_column(connection, column):
+    """Adds a model column to its existing table unless it is already there."""
+    table = column.table.name
+    existing = {col['name'] for col in inspect(connection).get_columns(table)}
+    if column.name in existing:
+        return
+    preparer = connection.dialect.identifier_preparer
+    column_type = column.type.compile(dialect=connection.dialect)
+    connection.execute(text(f"ALTER TABLE {preparer.quote(table)} "
+                            f"ADD COLUMN {preparer.quote(column.name)} {column_type}"))
+
+
+def create_indexes(connection, model):
+    """
+    Creates every index declared on a model that does not exist yet.
+
+    Indexes on columns a later migration adds are left to that migration.
+    """
+    existing = {col['name'] for col in inspect(connection).get_columns(model.__tablename__)}
+    for index in model.__table__.indexes:
+        if all(column.name in existing for column in index.columns):
+            index.create(bind=connection, checkfirst=True)
+
+
+def add_poster_verification(connection):
+    add_column(connection, Movie.__table__.c.poster_status)
+    add_column(connection, Movie.__table__.c.poster_checked_at)
+
+
+def add_poster_mirror(connection):
+    add_column(connection, Movie.__table__.c.poster_hash)
+
+
+def add_indexes_and_unique_constraints(connection):
+    add_column(connection, Movie.__table__.c.imdb_id)
+    # Existing duplicates would make the unique indexes fail: keep the first
+    # link per (user, movie) and rename later users sharing a name.
+    first_links = select(func.min(UserMovies.id)).group_by(UserMovies.user_id,
+                                                           UserMovies.movie_id)
+    connection.execute(UserMovies.__table__.delete().where(
+        UserMovies.__table__.c.id.not_in(first_links.scalar_subquery())))
+    first_users = select(func.min(User.id)).group_by(User.name)
+    user_table = User.__table__
+    connection.execute(user_table.update().where(
+        user_table.c.id.not_in(first_users.scalar_subquery())
+    ).values(name=user_table.c.name + " (" + cast(user_table.c.id, String) + ")"))
+    for model in (User, Movie, UserMovies):
+        create_indexes(connection, model)
+
+
+def add_movie_metadata(connection):
+    movie = Movie.__table__
+    for column in (movie.c.title_key, movie.c.genre, movie.c.runtime, movie.c.plot,
+                   movie.c.metadata_refreshed_at):
+        add_column(connection, column)
+    update_title_keys(connection, movie.c.title_key.is_(None))
+    if connection.dialect.name == "sqlite":
+        # SQLite kept OMDb's "N/A" as the rating of unrated movies, and
+        # links copied it; other databases rejected it.
+        connection.execute(text("UPDATE movie SET rating = NULL WHERE rating = 'N/A'"))
+        connection.execute(text(
+            "UPDATE user_movies SET movie_rating = NULL WHERE movie_rating = 'N/A'"))
+    create_indexes(connection, Movie)
+
+
+def update_title_keys(connection, condition):
+    """Recomputes the normalized title of the movies matching a condition."""
+    movie = Movie.__table__
+    rows = connection.execute(select(movie.c.id, movie.c.title).where(condition)).all()
+    if rows:
+        connection.execute(
+            movie.update().where(movie.c.id == bindparam('movie_id')).values(
+                title_key=bindparam('key')),
+            [{'movie_id': movie_id, 'key': normalize_title(title)} for movie_id, title in rows])
+
+
+def renormalize_apostrophes(connection):
+    movie = Movie.__table__
+    update_title_keys(connection, or_(movie.c.title.contains("'"),
+                                      movie.c.title.contains("\u2019")))
+
+
+# Ordered (version, description, upgrade function) entries. Upgrades must be
+# idempotent: fresh databases are created from the models before they run.
+MIGRATIONS = [
+    (1, "Add poster verification columns", add_poster_verification),
+    (2, "Add poster mirror digest", add_poster_mirror),
+    (3, "Add lookup indexes and unique constraints", add_indexes_and_unique_constraints),
+    (4, "Add movie full-text search index", create_movie_fts),
+    (5, "Add movie rating aggregates", rebuild_rating_stats),
+    (6, "Add movie metadata and normalized titles", add_movie_metadata),
+    (7, "Drop apostrophes from normalized titles", renormalize_apostrophes),
+]
+
+
+def current_version(connection):
+    """Returns the highest applied migration version, 0 for a new database."""
+    schema_version.create(bind=connection, checkfirst=True)
+    return connection.execute(
+        select(func.coalesce(func.max(schema_version.c.version), 0))).scalar()
+
+
+def upgrade_schema(engine):
+    """
+    Creates missing tables and applies pending migrations in order.
+
+    Each migration runs in its own transaction together with its
+    schema_version row, so an interrupted upgrade resumes where it stopped.
+
+    :param engine: SQLAlchemy engine bound to the application database
+    :return: List of applied migration versions
+    """
+    db.metadata.create_all(engine)
+    with engine.begin() as connection:
+        version = current_version(connection)
+
+    applied = []
+    for migration_version, description, upgrade in MIGRATIONS:
+        if migration_version <= version:
+            continue
+        with engine.begin() as connection:
+            upgrade(connection)
+            connection.execute(schema_version.insert().values(
+                version=migration_version, description=description,
+                applied_at=datetime.now(timezone.utc)))
+        print(f"Applied migration {migration_version}: {description}")
+        applied.append(migration_version)
+    return applied
@@ -0,0 +1,115 @@
+import re
+
+from sqlalchemy import String, and_, case, cast, column, literal_column, or_, table, text
+
+from data_model import Movie
+
+SEARCH_LIMIT = 20
+
+# External-content FTS5 table over the movie columns people search by. The
+# triggers keep it in sync with every insert, update and delete on movie,
+# including the set-based deletes, so the data managers need no hooks.
+MOVIE_FTS = table('movie_fts', column('rowid'))
+# bm25() weights for title, director and release_year.
+MOVIE_FTS_WEIGHTS = (10.0, 5.0, 1.0)
+
+MOVIE_FTS_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS movie_fts USING fts5("
+    "title, director, release_year, content='movie', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER IF NOT EXISTS movie_fts_insert AFTER INSERT ON movie BEGIN "
+    "INSERT INTO movie_fts(rowid, title, director, release_year) "
+    "VALUES (new.id, new.title, new.director, new.release_year); END",
+    "CREATE TRIGGER IF NOT EXISTS movie_fts_delete AFTER DELETE ON movie BEGIN "
+    "INSERT INTO movie_fts(movie_fts, rowid, title, director, release_year) "
+    "VALUES ('delete', old.id, old.title, old.director, old.release_year); END",
+    "CREATE TRIGGER IF NOT EXISTS movie_fts_update "
+    "AFTER UPDATE OF title, director, release_year ON movie BEGIN "
+    "INSERT INTO movie_fts(movie_fts, rowid, title, director, release_year) "
+    "VALUES ('delete', old.id, old.title, old.director, old.release_year); "
+    "INSERT INTO movie_fts(rowid, title, director, release_year) "
+    "VALUES (new.id, new.title, new.director, new.release_year); END",
+    "INSERT INTO movie_fts(movie_fts) VALUES ('rebuild')",
+]
+
+
+def search_terms(query):
+    """Splits a search query into lower-case word tokens."""
+    return re.findall(r"\w+", (query or "").lower())
+
+
+def fts_match(terms):
+    """Builds an FTS5 MATCH expression requiring a prefix match of every term."""
+    return " AND ".join(f'"{term}"*' for term in terms)
+
+
+def fts5_available(connection):
+    """True if the connection is SQLite built with FTS5."""
+    if connection.dialect.name != 'sqlite':
+        return False
+    return bool(connection.execute(
+        text("SELECT sqlite_compileoption_used('ENABLE_FTS5')")).scalar())
+
+
+def has_movie_fts(connection):
+    """True if the movie_fts index exists."""
+    if connection.dialect.name != 'sqlite':
+        return False
+    return connection.execute(text(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'movie_fts'"
+    )).first() is not None
+
+
+def create_movie_fts(connection):
+    """Creates and fills the movie_fts index where FTS5 is available."""
+    if not fts5_available(connection):
+        return
+    for statement in MOVIE_FTS_DDL:
+        connection.execute(text(statement))
+
+
+def fts_search(query, terms):
+    """Restricts a Movie query to FTS matches, best bm25 rank first."""
+    weights = ", ".join(str(weight) for weight in MOVIE_FTS_WEIGHTS)
+    return (query.join(MOVIE_FTS, MOVIE_FTS.c.rowid == Movie.id)
+            .filter(text("movie_fts MATCH :match").bindparams(match=fts_match(terms)))
+            .order_by(literal_column(f"bm25(movie_fts, {weights})"), Movie.id))
+
+
+def like_search(query, terms):
+    """
+    Portable fallback: every term must start a word of the title, director or year.
+
+    Titles starting with the first term rank first.
+    """
+    fields = (Movie.title, Movie.director, cast(Movie.release_year, String))
+    patterns = [term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+                for term in terms]
+    conditions = []
+    for pattern in patterns:
+        conditions.append(or_(*(expression.ilike(like, escape="\\")
+                                for expression in fields
+                                for like in (f"{pattern}%", f"% {pattern}%"))))
+    starts_with = Movie.title.ilike(f"{patterns[0]}%", escape="\\")
+    return (query.filter(and_(*conditions))
+            .order_by(case((starts_with, 0), else_=1), Movie.title, Movie.id))
+
+
+def match_score(movie, terms):
+    """
+    Ranks an in-memory movie like the FTS weights do.
+
+    :return: Score, or None if a term matches no word prefix
+    """
+    fields = ((movie.title, MOVIE_FTS_WEIGHTS[0]), (movie.director, MOVIE_FTS_WEIGHTS[1]),
+              (movie.release_year, MOVIE_FTS_WEIGHTS[2]))
+    words = [(search_terms(str(value)), weight) for value, weight in fields
+             if value is not None]
+    score = 0.0
+    for term in terms:
+        weights = [weight for field_words, weight in words
+                   if any(word.startswith(term) for word in field_words)]
+        if not weights:
+            return None
+        score += max(weights)
+    return score
@@ -0,0 +1,1000 @@
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from operator import attrgetter
+
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import and_, delete, exists, func, insert, or_, select, tuple_, update
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from sqlalchemy.orm import load_only
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy.pool import QueuePool
+
+from data_model import (User, Movie, MovieRatingStats, UserMovies, OMDB_METADATA_COLUMNS,
+                        normalize_title, rating_value)
+from datamanager.data_manager_interface import DataManagerInterface
+from datamanager.group_commit import GroupCommit
+from datamanager.identity import match_movie, movie_identity
+from datamanager.pagination import (Page, PAGE_SIZE, MOVIE_SORTS, USER_SORTS, USER_MOVIE_SORTS,
+                                    LEADERBOARD_SORTS, paginate, resolve_sort)
+from datamanager.records import RESOURCES, resolve_fields
+from datamanager.rating_stats import apply_rating_change, refresh_rating_stats
+from datamanager.schema import upgrade_schema
+from datamanager.search import SEARCH_LIMIT, fts_search, has_movie_fts, like_search, search_terms
+from datamanager import views
+
+ORPHAN_SWEEP_BATCH = 500
+RATINGS_BATCH = 5000
+EXPORT_BATCH = 1000
+
+
+class SQLAlchemyDataManager(DataManagerInterface):
+    """Data manager for any database supported by SQLAlchemy, e.g. PostgreSQL."""
+
+    def __init__(self, app):
+        """
+            Binds the data manager to a Flask app.
+
+            Reads these app.config keys:
+            DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_RECYCLE: connection pool
+            sizing for server databases, used unless SQLALCHEMY_ENGINE_OPTIONS
+            already sets them
+            DATA_LOAD_STRATEGY: "joined" or "selectin" eager loading
+            ORPHAN_GC_MODE: "immediate" deletes movies left without users
+            inside the delete transaction, "deferred" leaves them to
+            sweep_orphans()
+            RATING_GROUP_COMMIT_WINDOW: seconds update_movie waits for
+            concurrent rating updates to commit together, 0 to commit each
+            on its own
+            RATING_GROUP_COMMIT_SIZE: maximum rating updates per commit
+
+            Objects are not expired on commit: the session lives for one app
+            context, and reloading what was just written costs a query per
+            object for nothing.
+        """
+        self.configure_engine(app)
+        self.db = SQLAlchemy(app, session_options={'expire_on_commit': False})
+        self.load_strategy = app.config.setdefault('DATA_LOAD_STRATEGY', views.JOINED)
+        self.deferred_orphan_gc = app.config.setdefault('ORPHAN_GC_MODE', 'immediate') == 'deferred'
+        self.read_engine = None
+        self.read_session = None
+        window = app.config.setdefault('RATING_GROUP_COMMIT_WINDOW', 0)
+        self.rating_commits = GroupCommit(
+            app, self._update_ratings, window=window,
+            max_batch=app.config.setdefault('RATING_GROUP_COMMIT_SIZE', 100)) if window else None
+        with app.app_context():
+            self.prepare_engine(app, self.db.engine)
+            upgrade_schema(self.db.engine)
+            with self.db.engine.connect() as connection:
+                self.full_text_search = has_movie_fts(connection)
+
+    def configure_engine(self, app):
+        """Sizes the connection pool before the engine is created."""
+        options = app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', {})
+        options.setdefault('pool_size', app.config.setdefault('DB_POOL_SIZE', 10))
+        options.setdefault('max_overflow', app.config.setdefault('DB_MAX_OVERFLOW', 20))
+        options.setdefault('pool_recycle', app.config.setdefault('DB_POOL_RECYCLE', 1800))
+        options.setdefault('pool_pre_ping', True)
+
+    def prepare_engine(self, app, engine):
+        """Hook for backend-specific engine setup, called before migrations."""
+
+    def engines(self):
+        """Returns the write engine and, if configured, the read-only engine."""
+        engines = [self.db.engine]
+        if self.read_engine is not None:
+            engines.append(self.read_engine)
+        return engines
+
+    def ping(self):
+        """Runs a trivial query on the write engine."""
+        try:
+            with self.db.engine.connect() as connection:
+                connection.execute(select(1))
+            return True
+        except SQLAlchemyError as error:
+            print(f"Database ping failed: {error}")
+            return False
+
+    def warm_up(self, connections=1):
+        """
+        Opens up to ``connections`` connections per engine, at most its pool
+        size, and returns them to the pool. The first requests then skip
+        connecting and, on SQLite, setting the pragmas.
+        """
+        for engine in self.engines():
+            size = engine.pool.size() if isinstance(engine.pool, QueuePool) else 1
+            opened = []
+            try:
+                for _ in range(min(connections, size)):
+                    opened.append(engine.connect())
+                    opened[-1].execute(select(1))
+            except SQLAlchemyError as error:
+                print(f"Error warming up connections: {error}")
+            finally:
+                for connection in opened:
+                    connection.close()
+
+    def close(self):
+        """Commits queued rating updates, then closes every pooled connection."""
+        if self.rating_commits is not None:
+            self.rating_commits.stop()
+        for engine in self.engines():
+            engine.dispose()
+
+    def _remove_read_session(self, exception=None):
+        self.read_session.remove()
+
+    def _reader(self):
+        """Returns the read-only session if configured, else the write session."""
+        return self.read_session if self.read_session is not None else self.db.session
+
+    @contextmanager
+    def transaction(self):
+        """
+            Runs the enclosed writes as one unit of work with a single commit.
+
+            Write methods and transaction() blocks inside join the outermost
+            block, which commits on exit. Events are emitted, coalesced,
+            after that commit. If any step fails, the whole unit is rolled
+            back and no events are emitted; the failing method still
+            returns its error as usual.
+
+            :return: Context manager yielding the write session
+        """
+        session = self.db.session
+        info = session.info
+        depth = info.get('unit_depth', 0)
+        if depth == 0:
+            info.update(unit_events=[], unit_released=[], unit_failed=False)
+        info['unit_depth'] = depth + 1
+        try:
+            yield session
+            if depth == 0:
+                if info['unit_failed']:
+                    session.rollback()
+                    return
+                session.commit()
+        except BaseException:
+            info['unit_failed'] = True
+            if depth == 0:
+                session.rollback()
+            raise
+        finally:
+            info['unit_depth'] = depth
+        if depth == 0:
+            self._release_posters(info['unit_released'])
+            self.emit_all(info['unit_events'])
+
+    def _publish(self, event, **payload):
+        """Queues an event for when the current unit of work commits."""
+        self.db.session.info['unit_events'].append((event, payload))
+
+    def get_all_users(self):
+        """Returns a list of all users."""
+        try:
+            return self._reader().query(User).options(*views.user_row()).all()
+        except SQLAlchemyError:
+            print("Error fetching users")
+            return []
+
+    def get_all_movies(self):
+        """Returns a list of all movies."""
+        try:
+            return self._reader().query(Movie).options(*views.movie_card()).all()
+        except SQLAlchemyError:
+            print("Error fetching movies")
+            return []
+
+    def get_users_page(self, sort="name", after=None, before=None, limit=PAGE_SIZE):
+        """Returns one page of users using keyset pagination."""
+        sort = resolve_sort(USER_SORTS, sort, "name")
+        try:
+            query = self._reader().query(User).options(*views.user_row())
+            return paginate(query, USER_SORTS, sort, after, before, limit)
+        except SQLAlchemyError:
+            print("Error fetching users")
+            return Page(items=[], sort=sort)
+
+    def get_movies_page(self, sort="title", after=None, before=None, limit=PAGE_SIZE):
+        """Returns one page of movies using keyset pagination."""
+        sort = resolve_sort(MOVIE_SORTS, sort, "title")
+        try:
+            query = self._reader().query(Movie).outerjoin(Movie.rating_stats).options(
+                *views.movie_card(stats_joined=True))
+            return paginate(query, MOVIE_SORTS, sort, after, before, limit)
+        except SQLAlchemyError:
+            print("Error fetching movies")
+            return Page(items=[], sort=sort)
+
+    def get_top_movies_page(self, sort="user_rating", min_ratings=1, after=None, before=None,
+                            limit=PAGE_SIZE):
+        """
+            Returns one page of the user rating leaderboard.
+
+            Reads movie_rating_stats through its sort indexes, so a page
+            costs the same however many ratings there are.
+
+            :param sort: "user_rating" or "most_rated"
+            :param min_ratings: Minimum number of user ratings to be ranked
+            :return: Page of Movie objects with rating_stats loaded
+        """
+        sort = resolve_sort(LEADERBOARD_SORTS, sort, "user_rating")
+        try:
+            query = self._reader().query(Movie).join(Movie.rating_stats).filter(
+                MovieRatingStats.rating_count >= min_ratings).options(*views.leaderboard_row())
+            return paginate(query, LEADERBOARD_SORTS, sort, after, before, limit)
+        except SQLAlchemyError:
+            print("Error fetching top movies")
+            return Page(items=[], sort=sort)
+
+    def get_user_movies_page(self, user_id, sort="recent", after=None, before=None,
+                             limit=PAGE_SIZE):
+        """
+            Returns one page of a user's collection using keyset pagination.
+
+            :param user_id: ID of the user
+            :return: Page of UserMovies or None if user not found
+        """
+        sort = resolve_sort(USER_MOVIE_SORTS, sort, "recent")
+        try:
+            session = self._reader()
+            if not session.get(User, user_id):
+                return None
+            query = session.query(UserMovies).join(UserMovies.movie).filter(
+                UserMovies.user_id == user_id).options(*views.user_movie_card(self.load_strategy))
+            return paginate(query, USER_MOVIE_SORTS, sort, after, before, limit)
+        except SQLAlchemyError:
+            print("Error fetching users and Movies")
+            return Page(items=[], sort=sort)
+
+    def get_records(self, resource, fields=None, sort=None, after=None, before=None,
+                    limit=PAGE_SIZE, user_id=None):
+        """
+            Returns one page of plain dicts for the JSON API.
+
+            Selects only the requested columns plus the sort key, so rows
+            are never hydrated into model objects.
+
+            :return: Page of dicts, None if the user of "user_movies" is not found
+        """
+        spec = RESOURCES[resource]
+        fields = resolve_fields(spec, fields)
+        sort = resolve_sort(spec.sorts, sort, spec.default_sort)
+        try:
+            session = self._reader()
+            if resource == 'user_movies' and session.query(User.id).filter(
+                    User.id == user_id).first() is None:
+                return None
+            sort_key = spec.sorts[sort]._replace(value=attrgetter('sort_value'))
+            columns = [spec.fields[name].column.label(name) for name in fields]
+            query = spec.select_from(
+                session.query(*columns, sort_key.column.label('sort_value')), user_id)
+            page = paginate(query, {sort: sort_key}, sort, after, before, limit)
+            return page._replace(items=[{name: row._mapping[name] for name in fields}
+                                        for row in page.items])
+        except SQLAlchemyError:
+            print(f"Error fetching {resource}")
+            return Page(items=[], sort=sort)
+
+    def iter_records(self, resource, fields=None, user_id=None):
+        """
+            Streams every record of a resource as plain dicts, ordered by key.
+
+            Rows are fetched EXPORT_BATCH at a time with yield_per, which
+            uses a server-side cursor on databases that have them.
+
+            :return: Iterator of dicts, None if the user of "user_movies" is not found
+        """
+        spec = RESOURCES[resource]
+        fields = resolve_fields(spec, fields)
+        session = self._reader()
+        try:
+            if resource == 'user_movies' and session.query(User.id).filter(
+                    User.id == user_id).first() is None:
+                return None
+        except SQLAlchemyError:
+            print(f"Error fetching {resource}")
+            return None
+        columns = [spec.fields[name].column.label(name) for name in fields]
+        query = spec.select_from(session.query(*columns), user_id).order_by(spec.key.column)
+        return self._stream_records(resource, query.yield_per(EXPORT_BATCH))
+
+    @staticmethod
+    def _stream_records(resource, query):
+        try:
+            for row in query:
+                yield dict(row._mapping)
+        except SQLAlchemyError:
+            # The consumer may have sent part of the records already; raise,
+            # so a download is aborted instead of ending as if complete.
+            print(f"Error streaming {resource}")
+            raise
+
+    def get_record(self, resource, record_id, fields=None, user_id=None):
+        """
+            Returns a single record as a plain dict.
+
+            :return: Dict or None if not found
+        """
+        spec = RESOURCES[resource]
+        fields = resolve_fields(spec, fields)
+        try:
+            columns = [spec.fields[name].column.label(name) for name in fields]
+            row = spec.select_from(self._reader().query(*columns), user_id).filter(
+                spec.key.column == record_id).first()
+            return dict(row._mapping) if row else None
+        except SQLAlchemyError:
+            print(f"Error fetching {resource}")
+            return None
+
+    def get_user_movies(self, user_id):
+        """
+            Retrieves all movies associated with a given user.
+
+            :param user_id: ID of the user
+            :return: List of UserMovies or None if user not found
+        """
+        try:
+            session = self._reader()
+            if not session.get(User, user_id):
+                return None
+            return session.query(UserMovies).join(UserMovies.movie).filter(
+                UserMovies.user_id == user_id).options(
+                *views.user_movie_card(self.load_strategy)).all()
+
+        except SQLAlchemyError:
+            print("Error fetching users and Movies")
+            return []
+
+    def get_user_movie(self, user_id, movie_id):
+        """
+            Retrieves a specific UserMovies entry for a given user and movie.
+
+            :param user_id: ID of the user
+            :param movie_id: ID of the movie
+            :return: UserMovies entry or None if not found
+        """
+        try:
+            existing_movie = self.db.session.query(UserMovies).options(
+                *views.user_movie_detail(self.load_strategy)).filter_by(
+                user_id=user_id, movie_id=movie_id).first()
+            if not existing_movie:
+                return None
+            return existing_movie
+        except SQLAlchemyError:
+            return []
+
+    def get_user_by_name(self, username):
+        """
+            Retrieves a user by name.
+
+            :param username: Name of the user
+            :return: User object, "Error" or None
+        """
+        try:
+            existing_user = self.db.session.query(User).filter_by(name=username).first()
+            if not existing_user:
+                return "Error"
+            return existing_user
+        except SQLAlchemyError:
+            return []
+
+    def get_movie(self, movie_id):
+        """
+            Retrieves a movie by its ID.
+
+            :param movie_id: ID of the movie
+            :return: Movie object or None if not found
+        """
+        try:
+            existing_movie = self.db.session.get(Movie, movie_id)
+            if not existing_movie:
+                return None
+            return existing_movie
+        except SQLAlchemyError:
+            return []
+
+    def add_item(self, item):
+        """
+            Generic method to add an item to the database.
+
+            :param item: SQLAlchemy model instance
+            :return: The added item or None on failure
+        """
+        try:
+            with self.transaction() as session:
+                session.add(item)
+                session.flush()
+            return item
+        except SQLAlchemyError:
+            return None
+
+    def add_user(self, username):
+        """
+            Adds a new user.
+
+            Duplicate names are rejected by the unique index on ``user.name``.
+
+            :param username: Name of the user
+            :return: User object or None if user already exists or error occurs
+        """
+        with self.transaction():
+            user = self.add_item(User(name=username))
+            if user:
+                self._publish("data_changed", user_ids={user.id})
+        return user
+
+    def add_movie_to_user(self, movie, user_id):
+        """
+            Links an existing movie to a user.
+
+            Duplicate links are rejected by the unique (user_id, movie_id) index.
+
+            :param movie: Movie object
+            :param user_id: ID of the user
+            :return: Error message or None on success
+        """
+        try:
+            with self.transaction() as session:
+                new_entry = UserMovies(movie_id=movie.id, user_id=user_id,
+                                       movie_rating=movie.rating)
+                session.add(new_entry)
+                session.flush()
+                apply_rating_change(session, movie.id, new=new_entry.movie_rating)
+                self._publish("data_changed", user_ids={user_id})
+            return None
+
+        except IntegrityError:
+            return "Movie already exists"
+        except SQLAlchemyError:
+            return "Error with the database"
+
+    def add_movie(self, movie, user_id):
+        """
+            Adds a movie and links it to a user.
+
+            An existing movie with the same IMDb id, or failing that the
+            same title (see identity.match_movie), is linked instead of
+            adding a duplicate. Both happen in one transaction, so a failed
+            link does not leave a new movie behind.
+
+            :param movie: Dictionary containing movie data
+            :param user_id: ID of the user
+            :return: (movie id, None) on success, (None, error message) on failure
+        """
+        values = Movie.values_from_omdb(movie)
+        try:
+            with self.transaction() as session:
+                match = self._match_movies(session, [values])[0]
+                if match is not None:
+                    linked = session.get(Movie, match.id)
+                else:
+                    linked = self.add_item(Movie(**values))
+                    if not linked:
+                        return None, "Error with the database"
+                error = self.add_movie_to_user(linked, user_id)
+            return (None, error) if error else (linked.id, None)
+
+        except SQLAlchemyError:
+            return None, "Error with the database"
+
+    def find_movie(self, movie):
+        """
+            Finds the catalog movie that movie data refers to.
+
+            :param movie: Dictionary containing movie data
+            :return: Movie object or None if not found
+        """
+        try:
+            session = self.db.session
+            match = self._match_movies(session, [Movie.values_from_omdb(movie)])[0]
+            return session.get(Movie, match.id) if match is not None else None
+        except SQLAlchemyError:
+            print("Error fetching movie")
+            return None
+
+    def find_movie_by_title(self, title, year=None):
+        """
+            Finds a catalog movie by title, ignoring case and punctuation.
+
+            :param title: Title to look up
+            :param year: Release year; without one, the most recent movie
+                         with the title
+            :return: Movie object or None if not found
+        """
+        query = select(Movie).where(Movie.title_key == normalize_title(title))
+        if year is not None:
+            query = query.where(Movie.release_year == year)
+        try:
+            return self.db.session.scalars(
+                query.order_by(Movie.release_year.desc(), Movie.id).limit(1)).first()
+        except SQLAlchemyError:
+            print("Error fetching movie")
+            return None
+
+    def get_movies_by_titles(self, titles):
+        """
+            Looks up movie ids by title, ignoring case and punctuation.
+
+            :param titles: Iterable of titles
+            :return: Dict of title to movie id, the oldest movie for repeated titles
+        """
+        keys = {}
+        for title in set(titles):
+            keys.setdefault(normalize_title(title), []).append(title)
+        if not keys:
+            return {}
+        try:
+            rows = self.db.session.execute(
+                select(Movie.title_key, func.min(Movie.id)).where(Movie.title_key.in_(keys))
+                .group_by(Movie.title_key)).all()
+            return {title: movie_id for key, movie_id in rows for title in keys[key]}
+        except SQLAlchemyError:
+            print("Error fetching movies")
+            return {}
+
+    def _match_movies(self, session, values):
+        """
+            Finds the catalog movies new movie values refer to, with one query.
+
+            :param values: List of Movie column value dicts
+            :return: List of matching rows (id, imdb_id, title_key,
+                     release_year) or None, in the order of values
+        """
+        imdb_ids = {item['imdb_id'] for item in values if item.get('imdb_id')}
+        title_keys = {item['title_key'] for item in values}
+        rows = session.execute(
+            select(Movie.id, Movie.imdb_id, Movie.title_key, Movie.release_year).where(
+                or_(Movie.imdb_id.in_(imdb_ids), Movie.title_key.in_(title_keys)))
+            .order_by(Movie.id)).all()
+        by_imdb_id = {row.imdb_id: row for row in rows if row.imdb_id}
+        by_title_key = {}
+        for row in rows:
+            by_title_key.setdefault(row.title_key, []).append(row)
+        return [match_movie(item, by_imdb_id, by_title_key) for item in values]
+
+    def get_movies_by_ids(self, movie_ids):
+        """
+            Retrieves several movies at once, for display.
+
+            :param movie_ids: Iterable of movie ids
+            :return: Dict of movie id to Movie, without ids that do not exist
+        """
+        movie_ids = list(set(movie_ids))
+        if not movie_ids:
+            return {}
+        try:
+            movies = self._reader().query(Movie).options(*views.movie_card()).filter(
+                Movie.id.in_(movie_ids)).all()
+            return {movie.id: movie for movie in movies}
+        except SQLAlchemyError:
+            print("Error fetching movies")
+            return {}
+
+    def get_ratings(self, user_ids=None):
+        """
+            Retrieves the numeric ratings of users, e.g. to build a rating matrix.
+
+            Rows are streamed in batches, so reading the whole table keeps
+            only the resulting dicts in memory.
+
+            :param user_ids: Users to read, every user with ratings if None
+            :return: Dict of user id to a dict of movie id to rating, None on failure
+        """
+        query = select(UserMovies.user_id, UserMovies.movie_id, UserMovies.movie_rating).where(
+            UserMovies.movie_rating.isnot(None))
+        if user_ids is not None:
+            user_ids = list(set(user_ids))
+            if not user_ids:
+                return {}
+            query = query.where(UserMovies.user_id.in_(user_ids))
+        ratings = {}
+        try:
+            rows = self._reader().execute(query.execution_options(yield_per=RATINGS_BATCH))
+            for user_id, movie_id, rating in rows:
+                rating = rating_value(rating)
+                if rating is not None:
+                    ratings.setdefault(user_id, {})[movie_id] = rating
+            return ratings
+        except SQLAlchemyError:
+            print("Error fetching ratings")
+            return None
+
+    def search_movies(self, query, limit=SEARCH_LIMIT):
+        """
+            Searches the catalog by word prefixes of title, director and year.
+
+            Uses the movie_fts index ranked by bm25 when the database has
+            one, otherwise a LIKE scan.
+
+            :param query: Search text
+            :param limit: Maximum number of results
+            :return: List of Movie objects, best match first
+        """
+        terms = search_terms(query)
+        if not terms:
+            return []
+        try:
+            movies = self._reader().query(Movie).options(*views.movie_card())
+            search = fts_search if self.full_text_search else like_search
+            return search(movies, terms).limit(limit).all()
+        except SQLAlchemyError:
+            print("Error searching movies")
+            return []
+
+    def search_records(self, query, fields=None, limit=SEARCH_LIMIT):
+        """
+            Searches the catalog for the JSON API, selecting only the
+            requested columns, so rows are never hydrated into Movie objects.
+
+            :return: List of dicts, best match first
+        """
+        spec = RESOURCES['movies']
+        fields = resolve_fields(spec, fields)
+        terms = search_terms(query)
+        if not terms:
+            return []
+        try:
+            columns = [spec.fields[name].column.label(name) for name in fields]
+            records = spec.select_from(self._reader().query(*columns), None)
+            search = fts_search if self.full_text_search else like_search
+            return [{name: row._mapping[name] for name in fields}
+                    for row in search(records, terms).limit(limit)]
+        except SQLAlchemyError:
+            print("Error searching movies")
+            return []
+
+    def import_watchlist_chunk(self, entries):
+        """
+            Writes a chunk of watchlist rows in a single transaction.
+
+            Missing users, movies and links are inserted with one executemany
+            statement each; rows whose link already exists are reported.
+
+            :param entries: Dicts with "line", "user", "title", "rating" and,
+                            for titles not in the catalog, "movie" (OMDb data)
+            :return: List of (line, error message) for rows not imported
+        """
+        try:
+            with self.transaction() as session:
+                names = {entry['user'] for entry in entries}
+                users = dict(session.execute(
+                    select(User.name, User.id).where(User.name.in_(names))).all())
+                new_names = sorted(names - set(users))
+                if new_names:
+                    session.execute(insert(User), [{'name': name} for name in new_names])
+                    users.update(session.execute(
+                        select(User.name, User.id).where(User.name.in_(new_names))).all())
+
+                values = [Movie.values_from_omdb(entry.get('movie') or {'Title': entry['title']})
+                          for entry in entries]
+                movie_ids = [match.id if match is not None else None
+                             for match in self._match_movies(session, values)]
+                new_movies = {}
+                for item, movie_id in zip(values, movie_ids):
+                    if movie_id is None:
+                        new_movies.setdefault(movie_identity(item), item)
+                if new_movies:
+                    session.execute(insert(Movie), list(new_movies.values()))
+                    missing = [index for index, movie_id in enumerate(movie_ids)
+                               if movie_id is None]
+                    matches = self._match_movies(session, [values[index] for index in missing])
+                    for index, match in zip(missing, matches):
+                        movie_ids[index] = match.id
+                imdb_ratings = dict(session.execute(select(Movie.id, Movie.rating).where(
+                    Movie.id.in_(set(movie_ids)))).all())
+
+                pairs = {(users[entry['user']], movie_id)
+                         for entry, movie_id in zip(entries, movie_ids)}
+                existing = set(session.execute(
+                    select(UserMovies.user_id, UserMovies.movie_id).where(
+                        tuple_(UserMovies.user_id, UserMovies.movie_id).in_(pairs))).all())
+                errors = []
+                links = []
+                for entry, movie_id in zip(entries, movie_ids):
+                    pair = (users[entry['user']], movie_id)
+                    if pair in existing:
+                        errors.append((entry['line'], "Movie already exists"))
+                        continue
+                    existing.add(pair)
+                    rating = entry.get('rating')
+                    links.append({'user_id': pair[0], 'movie_id': pair[1],
+                                  'movie_rating': rating if rating is not None
+                                  else imdb_ratings.get(pair[1])})
+                if links:
+                    session.execute(insert(UserMovies), links)
+                    refresh_rating_stats(session, {link['movie_id'] for link in links})
+                self._publish("data_changed", user_ids={link['user_id'] for link in links})
+            return errors
+        except SQLAlchemyError as error:
+            print(f"Error importing watchlist chunk: {error}")
+            return [(entry['line'], "Error with the database") for entry in entries]
+
+    def update_movie(self, movie, rating):
+        """
+            Updates the user-specific movie rating.
+
+            With group commit enabled, updates made outside a unit of work
+            are committed together with concurrent ones by the group commit
+            worker.
+
+            :param movie: UserMovies entry
+            :param rating: New rating
+            :return: Updated UserMovies entry or None on failure
+        """
+        if not rating or not isinstance(rating, (float, int)) or not movie:
+            return None
+        if self.rating_commits is not None and not self.db.session.info.get('unit_depth'):
+            # End this session's read transaction so it cannot block the worker's write.
+            self.db.session.commit()
+            if not self.rating_commits.submit((movie.user_id, movie.movie_id, float(rating))):
+                return None
+            set_committed_value(movie, 'movie_rating', float(rating))
+            return movie
+        try:
+            with self.transaction() as session:
+                old_rating = movie.movie_rating
+                movie.movie_rating = float(rating)
+                apply_rating_change(session, movie.movie_id, old_rating, movie.movie_rating)
+                self._publish("data_changed", user_ids={movie.user_id})
+            return movie
+
+        except SQLAlchemyError:
+            return None
+
+    def _update_ratings(self, updates):
+        """
+            Applies a batch of rating updates in one transaction.
+
+            Links are read with one query and written with one executemany
+            UPDATE; repeated updates of a link apply in order.
+
+            :param updates: List of (user_id, movie_id, rating)
+            :return: List with True for each applied update, False if its
+                     link does not exist or the batch failed
+        """
+        try:
+            with self.transaction() as session:
+                keys = {(user_id, movie_id) for user_id, movie_id, _ in updates}
+                links = {(row.user_id, row.movie_id): row for row in session.execute(
+                    select(UserMovies.id, UserMovies.user_id, UserMovies.movie_id,
+                           UserMovies.movie_rating).where(
+                        tuple_(UserMovies.user_id, UserMovies.movie_id).in_(keys)))}
+                ratings = {key: link.movie_rating for key, link in links.items()}
+                for user_id, movie_id, rating in updates:
+                    key = (user_id, movie_id)
+                    if key in ratings:
+                        apply_rating_change(session, movie_id, ratings[key], rating)
+                        ratings[key] = rating
+                if ratings:
+                    session.execute(update(UserMovies), [
+                        {'id': links[key].id, 'movie_rating': rating}
+                        for key, rating in ratings.items()])
+                self._publish("data_changed", user_ids={user_id for user_id, _ in ratings})
+            return [(user_id, movie_id) in links for user_id, movie_id, _ in updates]
+        except SQLAlchemyError as error:
+            print(f"Error updating ratings: {error}")
+            return [False] * len(updates)
+
+    def delete_movie(self, user_id, movie_id):
+        """
+            Deletes a movie from a user's collection and possibly from the database.
+
+            :param user_id: ID of the user
+            :param movie_id: ID of the movie
+            :return: The deleted Movie or None
+        """
+        try:
+            with self.transaction() as session:
+                movie = session.get(Movie, movie_id)
+                if not movie:
+                    return None
+                link = session.execute(select(UserMovies.movie_rating).where(
+                    UserMovies.user_id == user_id, UserMovies.movie_id == movie_id)).first()
+                if link is None:
+                    return None
+                session.execute(delete(UserMovies).where(
+                    UserMovies.user_id == user_id, UserMovies.movie_id == movie_id))
+                apply_rating_change(session, movie_id, old=link.movie_rating)
+                if not self.deferred_orphan_gc:
+                    session.info['unit_released'] += self._delete_orphans([movie_id])
+                self._publish("data_changed", user_ids={user_id})
+            return movie
+        except SQLAlchemyError:
+            print("Database error while retrieving user movies")
+            return []
+
+    def delete_user(self, user_id):
+        """
+            Deletes a user and their associated movies.
+
+            Runs as one transaction: the user's links are deleted in one
+            statement, the rating aggregates of their movies are recomputed
+            and the movies nobody else links to are swept with set-based
+            deletes, or left to the orphan collector in deferred mode.
+
+            :param user_id: ID of the user
+            :return: None
+        """
+        try:
+            with self.transaction() as session:
+                unlink = delete(UserMovies).where(UserMovies.user_id == user_id)
+                if session.get_bind().dialect.delete_returning:
+                    movie_ids = session.execute(
+                        unlink.returning(UserMovies.movie_id)).scalars().all()
+                else:
+                    movie_ids = session.execute(select(UserMovies.movie_id).where(
+                        UserMovies.user_id == user_id)).scalars().all()
+                    session.execute(unlink)
+                session.execute(delete(User).where(User.id == user_id))
+                refresh_rating_stats(session, movie_ids)
+                if not self.deferred_orphan_gc:
+                    session.info['unit_released'] += self._delete_orphans(movie_ids)
+                self._publish("data_changed", user_ids={user_id})
+            return
+        except SQLAlchemyError as error:
+            print(f"Error fetching user:{error}")
+            return []
+
+    def sweep_orphans(self):
+        """
+            Deletes every movie that no user links to.
+
+            :return: Number of movies deleted
+        """
+        try:
+            with self.transaction() as session:
+                orphaned = ~exists().where(UserMovies.movie_id == Movie.id)
+                session.info['unit_released'] += session.execute(select(Movie.poster_hash).where(
+                    orphaned, Movie.poster_hash.isnot(None))).scalars().all()
+                deleted = session.execute(delete(Movie).where(orphaned).execution_options(
+                    synchronize_session=False)).rowcount
+                if deleted:
+                    self._publish("data_changed", user_ids=set())
+            return deleted
+        except SQLAlchemyError as error:
+            print(f"Error sweeping orphaned movies: {error}")
+            return 0
+
+    def _delete_orphans(self, movie_ids):
+        """
+            Deletes the movies among movie_ids that have no links left.
+
+            Runs inside the caller's transaction in batches of
+            ORPHAN_SWEEP_BATCH ids, one SELECT and one DELETE per batch.
+
+            :return: Poster digests of the deleted movies
+        """
+        poster_hashes = []
+        movie_ids = list(set(movie_ids))
+        for start in range(0, len(movie_ids), ORPHAN_SWEEP_BATCH):
+            orphaned = and_(Movie.id.in_(movie_ids[start:start + ORPHAN_SWEEP_BATCH]),
+                            ~exists().where(UserMovies.movie_id == Movie.id))
+            poster_hashes += self.db.session.execute(select(Movie.poster_hash).where(
+                orphaned, Movie.poster_hash.isnot(None))).scalars().all()
+            self.db.session.execute(delete(Movie).where(orphaned).execution_options(
+                synchronize_session="fetch"))
+        return poster_hashes
+
+    def set_poster_status(self, poster_url, status, poster_hash=None):
+        """
+            Records the verification result for every movie using a poster URL.
+
+            Only the catalog and the collections holding those movies show
+            the poster, so only their pages are invalidated.
+
+            :param poster_url: Poster URL that was checked
+            :param status: Verification status, "ok" or "broken"
+            :param poster_hash: Digest of the locally mirrored poster, if any
+            :return: Number of movies updated
+        """
+        try:
+            with self.transaction() as session:
+                updated = session.query(Movie).filter_by(poster=poster_url).update(
+                    {Movie.poster_status: status,
+                     Movie.poster_checked_at: datetime.now(timezone.utc),
+                     Movie.poster_hash: poster_hash},
+                    synchronize_session=False)
+                if updated:
+                    owners = session.scalars(
+                        select(UserMovies.user_id).join(Movie, Movie.id == UserMovies.movie_id)
+                        .where(Movie.poster == poster_url).distinct()).all()
+                    self._publish("data_changed", user_ids=set(owners))
+            return updated
+        except SQLAlchemyError as error:
+            print(f"Error updating poster status: {error}")
+            return 0
+
+    def get_unverified_posters(self, limit=100, after=None):
+        """
+            Retrieves poster URLs that have not been verified or mirrored yet.
+
+            :param limit: Maximum number of URLs to return
+            :param after: Only return URLs sorting after this one
+            :return: List of distinct poster URLs, sorted
+        """
+        try:
+            query = self.db.session.query(Movie.poster).filter(
+                Movie.poster.isnot(None),
+                or_(Movie.poster_status.is_(None),
+                    and_(Movie.poster_status == "ok", Movie.poster_hash.is_(None))))
+            if after is not None:
+                query = query.filter(Movie.poster > after)
+            rows = query.distinct().order_by(Movie.poster).limit(limit).all()
+            return [row.poster for row in rows]
+        except SQLAlchemyError:
+            print("Error fetching unverified posters")
+            return []
+
+    def get_stale_movies(self, refreshed_before, limit=100):
+        """
+            Retrieves movies whose OMDb metadata is due for a refresh.
+
+            :param refreshed_before: Movies refreshed at or after this time are fresh
+            :param limit: Maximum number of movies to return
+            :return: List of Movies, never refreshed first, then oldest first
+        """
+        try:
+            return self._reader().query(Movie).options(load_only(
+                Movie.id, Movie.title, Movie.release_year, Movie.imdb_id)).filter(
+                or_(Movie.metadata_refreshed_at.is_(None),
+                    Movie.metadata_refreshed_at < refreshed_before)).order_by(
+                Movie.metadata_refreshed_at.asc().nulls_first(), Movie.id).limit(limit).all()
+        except SQLAlchemyError:
+            print("Error fetching stale movies")
+            return []
+
+    def update_movie_metadata(self, updates):
+        """
+            Stores refreshed OMDb metadata and marks the movies as refreshed.
+
+            Only OMDB_METADATA_COLUMNS are written, and values OMDb no longer
+            has (None) keep the stored ones. An IMDb id another movie
+            already has is not taken over. A new poster URL is verified and
+            mirrored again.
+
+            :param updates: Dict of movie id to Movie column values; empty
+                            values only mark the movie as refreshed
+            :return: Number of movies whose metadata changed
+        """
+        if not updates:
+            return 0
+        refreshed_at = datetime.now(timezone.utc)
+        imdb_ids = {values['imdb_id'] for values in updates.values() if values.get('imdb_id')}
+        try:
+            with self.transaction() as session:
+                owners = dict(session.execute(select(Movie.imdb_id, Movie.id).where(
+                    Movie.imdb_id.in_(imdb_ids))).all()) if imdb_ids else {}
+                changed = 0
+                for movie in session.query(Movie).filter(Movie.id.in_(updates)):
+                    values = {column: value for column, value in updates[movie.id].items()
+                              if column in OMDB_METADATA_COLUMNS and value is not None}
+                    if owners.get(values.get('imdb_id'), movie.id) != movie.id:
+                        del values['imdb_id']
+                    values = {column: value for column, value in values.items()
+                              if getattr(movie, column) != value}
+                    if 'poster' in values:
+                        session.info['unit_released'].append(movie.poster_hash)
+                        values.update(poster_status=None, poster_checked_at=None,
+                                      poster_hash=None)
+                    for column, value in values.items():
+                        setattr(movie, column, value)
+                    movie.metadata_refreshed_at = refreshed_at
+                    changed += bool(values)
+                if changed:
+                    self._publish("data_changed", user_ids=None)
+            return changed
+        except SQLAlchemyError as error:
+            print(f"Error updating movie metadata: {error}")
+            return 0
+
+    def _release_posters(self, poster_hashes):
+        """Emits "posters_released" for mirrored posters no movie uses anymore."""
+        poster_hashes = {poster_hash for poster_hash in poster_hashes if poster_hash}
+        if not poster_hashes:
+            return
+        still_used = {row.poster_hash for row in self.db.session.query(Movie.poster_hash).filter(
+            Movie.poster_hash.in_(poster_hashes)).distinct()}
+        released = poster_hashes - still_used
+        if released:
+            self.emit("posters_released", poster_hashes=released)
@@ -0,0 +1,59 @@
+from sqlalchemy.orm import contains_eager, joinedload, load_only, selectinload
+
+from data_model import User, Movie, MovieRatingStats, UserMovies
+
+# Each view returns the loader options one page needs, so templates never
+# trigger lazy loads and only the columns they render are selected.
+# "joined" loads the related movie in the same statement, "selectin" with
+# one extra IN query, which is cheaper when rows repeat the same movie.
+JOINED = "joined"
+SELECTIN = "selectin"
+LOAD_STRATEGIES = (JOINED, SELECTIN)
+
+MOVIE_CARD_COLUMNS = (Movie.id, Movie.title, Movie.director, Movie.release_year,
+                      Movie.rating, Movie.poster, Movie.poster_status, Movie.poster_hash)
+
+
+def user_row():
+    """Options for list_users.html: id and name only."""
+    return [load_only(User.id, User.name)]
+
+
+RATING_STATS_COLUMNS = (MovieRatingStats.movie_id, MovieRatingStats.rating_count,
+                        MovieRatingStats.rating_mean)
+
+
+def movie_card(stats_joined=False):
+    """
+    Options for list_movies.html cards, including the user rating aggregates.
+
+    With ``stats_joined`` the query must join ``Movie.rating_stats`` itself.
+    """
+    stats = contains_eager if stats_joined else joinedload
+    return [load_only(*MOVIE_CARD_COLUMNS),
+            stats(Movie.rating_stats).load_only(*RATING_STATS_COLUMNS)]
+
+
+def user_movie_card(strategy=JOINED):
+    """
+    Options for user_movies.html cards.
+
+    The "joined" strategy expects the query to join ``UserMovies.movie``.
+    """
+    link_columns = load_only(UserMovies.id, UserMovies.user_id, UserMovies.movie_id,
+                             UserMovies.movie_rating)
+    if strategy == SELECTIN:
+        return [link_columns, selectinload(UserMovies.movie).load_only(*MOVIE_CARD_COLUMNS)]
+    return [link_columns, contains_eager(UserMovies.movie).load_only(*MOVIE_CARD_COLUMNS)]
+
+
+def user_movie_detail(strategy=JOINED):
+    """Options for update_movie.html: the link plus its movie."""
+    if strategy == SELECTIN:
+        return [selectinload(UserMovies.movie)]
+    return [joinedload(UserMovies.movie)]
+
+
+def leaderboard_row():
+    """Options for top_movies.html; the query joins ``Movie.rating_stats``."""
+    return [load_only(*MOVIE_CARD_COLUMNS), contains_eager(Movie.rating_stats)]
@@ -0,0 +1,46 @@
+import multiprocessing
+import os
+
+# Worker model: processes for CPU parallelism, threads in each for
+# requests waiting on the database or OMDb. SQLite takes one writer at a
+# time, so more processes mostly add read throughput.
+bind = os.getenv("BIND", f"0.0.0.0:{os.getenv('PORT', '5002')}")
+workers = int(os.getenv("WEB_CONCURRENCY", str(multiprocessing.cpu_count())))
+worker_class = "gthread"
+threads = int(os.getenv("GUNICORN_THREADS", "4"))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "60"))
+# On SIGTERM workers stop accepting connections and get this long to
+# finish the requests in flight.
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+keepalive = 5
+accesslog = "-"
+# Each worker imports wsgi.py after the fork: engines, pools and threads
+# must not be shared across processes.
+preload_app = False
+
+# Search results and cached pages must be visible to whichever worker
+# serves the next request, background jobs run in one worker only and
+# every worker keeps a pooled connection per thread.
+os.environ.setdefault("FLASK_COORDINATION_BACKEND", "sqlite")
+os.environ.setdefault("FLASK_MOVIE_STAGING_BACKEND", "sqlite")
+os.environ.setdefault("FLASK_RESPONSE_CACHE_BACKEND", "sqlite")
+os.environ.setdefault("FLASK_WARM_UP_CONNECTIONS", str(threads))
+
+
+def on_starting(server):
+    """
+    Runs migrations and builds the assets once in the arbiter, so workers
+    starting together do not race to do it.
+    """
+    from app import create_app, shutdown_app
+
+    shutdown_app(create_app({'BACKGROUND_WORKERS': False}))
+
+
+def worker_exit(server, worker):
+    """Stops the worker's threads and closes its connections once its requests drained."""
+    from app import shutdown_app
+
+    app = getattr(worker, "wsgi", None)
+    if app is not None:
+        shutdown_app(app)
@@ -0,0 +1,183 @@
+import hashlib
+import json
+import mimetypes
+import os
+import posixpath
+import re
+from typing import NamedTuple, Tuple
+
+from flask import abort, current_app, request, send_file, url_for
+
+from services.compression import COMPRESSIBLE_TYPES, available_encodings, choose_encoding, compress
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+ASSET_BUILD_DIR = os.getenv("ASSET_BUILD_DIR", os.path.join(BASE_DIR, "static", "dist"))
+ASSET_URL_PATH = "/assets"
+ASSET_MAX_AGE = 365 * 24 * 60 * 60
+# Static subdirectories that are not assets: the build output and the poster mirror.
+ASSET_EXCLUDE = ("dist", "posters")
+# Precompression runs once per build, so it uses the highest levels.
+PRECOMPRESS_LEVELS = {'br': 11, 'gzip': 9}
+FILE_EXTENSIONS = {'br': ".br", 'gzip': ".gz"}
+
+CSS_URL = re.compile(r"""url\(\s*(['"]?)([^'")]+)\1\s*\)""")
+
+
+class Asset(NamedTuple):
+    """A fingerprinted file in the build directory and its precompressed variants."""
+    path: str
+    mimetype: str
+    digest: str
+    encodings: Tuple[str, ...]
+
+
+def fingerprint(name, digest):
+    """Inserts a digest before the extension: style.css -> style.<digest>.css."""
+    root, extension = posixpath.splitext(name)
+    return f"{root}.{digest}{extension}"
+
+
+def asset_url(filename):
+    """
+    Returns the fingerprinted URL of a static file.
+
+    Files the pipeline does not know, e.g. added after startup, fall back
+    to Flask's static route.
+    """
+    assets = current_app.extensions.get('assets')
+    name = assets.manifest.get(filename) if assets else None
+    if name is None:
+        return url_for('static', filename=filename)
+    return url_for('asset', filename=name)
+
+
+class AssetPipeline:
+    """
+    Serves the static folder under content-hashed URLs.
+
+    On startup every file is copied to the build directory under a name
+    containing the first 12 hex digits of its SHA-256, e.g.
+    ``style.1a2b3c4d5e6f.css``, next to gzip (and with brotli installed,
+    brotli) variants of text files. Stylesheets have their ``url()``
+    references rewritten to the fingerprinted names first, so their hash
+    covers what they load. Since a changed file gets a new URL, responses
+    are cacheable forever.
+
+    Templates link assets with ``asset_url('style.css')``. The build
+    directory also gets a manifest.json mapping source to fingerprinted
+    names, for deploy tooling.
+    """
+
+    def __init__(self, app, build_dir=ASSET_BUILD_DIR, url_path=ASSET_URL_PATH):
+        self.app = app
+        self.build_dir = build_dir
+        self.url_path = url_path
+        self.manifest = {}
+        self.assets = {}
+        self.build()
+        app.add_url_rule(f"{url_path}/<path:filename>", 'asset', self.serve)
+        app.add_template_global(asset_url)
+        app.extensions['assets'] = self
+
+    def source_files(self):
+        """Yields the static files as slash-separated paths relative to the static folder."""
+        static_folder = self.app.static_folder
+        for directory, subdirectories, files in os.walk(static_folder):
+            relative = os.path.relpath(directory, static_folder)
+            if relative == ".":
+                subdirectories[:] = [name for name in subdirectories
+                                     if name not in ASSET_EXCLUDE and not name.startswith(".")]
+            for name in sorted(files):
+                if not name.startswith("."):
+                    yield posixpath.normpath(posixpath.join(relative.replace(os.sep, "/"), name))
+
+    def build(self):
+        """
+        Fingerprints and precompresses every static file.
+
+        Files already built with the same content are left alone, so the
+        build is cheap on restarts and safe for several workers at once.
+        """
+        sources = sorted(self.source_files(), key=lambda name: name.endswith(".css"))
+        for name in sources:
+            try:
+                with open(os.path.join(self.app.static_folder, name), "rb") as handle:
+                    content = handle.read()
+            except OSError as error:
+                print(f"Error reading asset {name}: {error}")
+                continue
+            if name.endswith(".css"):
+                content = self._rewrite_css(name, content)
+            self._add(name, content)
+        self._write(os.path.join(self.build_dir, "manifest.json"),
+                    json.dumps(self.manifest, indent=2, sort_keys=True).encode())
+
+    def serve(self, filename):
+        """Serves a fingerprinted asset, precompressed when the client accepts it."""
+        asset = self.assets.get(filename)
+        if asset is None:
+            abort(404, description="Asset not found")
+        encoding = choose_encoding(request.accept_encodings, asset.encodings)
+        path = asset.path + FILE_EXTENSIONS[encoding] if encoding else asset.path
+        response = send_file(path, mimetype=asset.mimetype, conditional=True,
+                             max_age=ASSET_MAX_AGE,
+                             etag=f"{asset.digest}-{encoding or 'identity'}")
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+        if asset.encodings:
+            response.vary.add("Accept-Encoding")
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+        return response
+
+    def _add(self, name, content):
+        digest = hashlib.sha256(content).hexdigest()[:12]
+        fingerprinted = fingerprint(name, digest)
+        path = os.path.join(self.build_dir, *fingerprinted.split("/"))
+        mimetype = mimetypes.guess_type(name)[0] or "application/octet-stream"
+        self._write(path, content, overwrite=False)
+        encodings = []
+        if mimetype.startswith(COMPRESSIBLE_TYPES):
+            for encoding in available_encodings():
+                compressed = compress(content, encoding, PRECOMPRESS_LEVELS[encoding])
+                # Variants that save less than a tenth are not worth a decode.
+                if len(compressed) < len(content) * 0.9:
+                    self._write(path + FILE_EXTENSIONS[encoding], compressed, overwrite=False)
+                    encodings.append(encoding)
+        self.manifest[name] = fingerprinted
+        self.assets[fingerprinted] = Asset(path, mimetype, digest, tuple(encodings))
+
+    def _rewrite_css(self, name, content):
+        """Points url() references to other static files at their fingerprinted names."""
+        directory = posixpath.dirname(name)
+        static_prefix = self.app.static_url_path.rstrip("/") + "/"
+
+        def replace(match):
+            reference = match.group(2).strip()
+            target, _, suffix = reference.partition("?")
+            if target.startswith(static_prefix):
+                target = target[len(static_prefix):]
+            elif target.startswith(("/", "data:", "http:", "https:", "#")) or "//" in target:
+                return match.group(0)
+            else:
+                target = posixpath.normpath(posixpath.join(directory, target))
+            fingerprinted = self.manifest.get(target)
+            if fingerprinted is None:
+                return match.group(0)
+            relative = posixpath.relpath(fingerprinted, directory or ".")
+            return f"url({match.group(1)}{relative}{match.group(1)})"
+
+        return CSS_URL.sub(replace, content.decode("utf-8")).encode("utf-8")
+
+    @staticmethod
+    def _write(path, content, overwrite=True):
+        if not overwrite and os.path.exists(path):
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temporary = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(temporary, "wb") as handle:
+                handle.write(content)
+            os.replace(temporary, path)
+        except OSError as error:
+            print(f"Error writing asset {path}: {error}")
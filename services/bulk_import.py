@@ -0,0 +1,176 @@
+import csv
+import io
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+IMPORT_CHUNK_SIZE = int(os.getenv("IMPORT_CHUNK_SIZE", "1000"))
+IMPORT_CONCURRENCY = int(os.getenv("IMPORT_CONCURRENCY", "8"))
+IMPORT_FORMATS = ("csv", "jsonl")
+
+
+class ImportReport:
+    """Progress and per-row errors of a bulk import."""
+
+    def __init__(self):
+        self.rows = 0
+        self.imported = 0
+        self.chunks = 0
+        self.omdb_lookups = 0
+        self.errors = []
+
+    def add_error(self, line, message):
+        """Records an error for an input line."""
+        self.errors.append((line, message))
+
+    def to_dict(self):
+        """Returns the report as a JSON-serializable dict."""
+        return {
+            'rows': self.rows,
+            'imported': self.imported,
+            'failed': len(self.errors),
+            'chunks': self.chunks,
+            'omdb_lookups': self.omdb_lookups,
+            'errors': [{'line': line, 'error': message} for line, message in self.errors],
+        }
+
+
+def guess_format(filename):
+    """Returns "csv" or "jsonl" based on a file name, defaulting to csv."""
+    if filename and filename.lower().endswith((".jsonl", ".ndjson", ".json")):
+        return "jsonl"
+    return "csv"
+
+
+def read_rows(stream, fmt):
+    """
+    Yields (line number, row dict) pairs from a CSV or JSON Lines text stream.
+
+    CSV files need a header with at least "user" and "title" columns and
+    may add "rating". JSON Lines objects use the same keys. Lines that
+    cannot be parsed are yielded with a None row.
+    """
+    if fmt == "jsonl":
+        for line_number, line in enumerate(stream, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError:
+                row = None
+            yield line_number, row if isinstance(row, dict) else None
+    else:
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+
+
+def chunked(iterable, size):
+    """Yields lists of at most size items."""
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def _text(value):
+    """
+    Returns a row value as stripped text. Numbers count as text, since
+    titles such as 1917 arrive as JSON numbers.
+
+    :raises TypeError: For other values, such as lists or booleans
+    """
+    if value is None:
+        return ''
+    if isinstance(value, bool) or not isinstance(value, (str, int, float)):
+        raise TypeError(type(value).__name__)
+    return str(value).strip()
+
+
+def _parse_row(row):
+    """Validates a raw row and returns (entry, error)."""
+    if row is None:
+        return None, "Malformed row"
+    try:
+        user = _text(row.get('user'))
+        title = _text(row.get('title'))
+    except TypeError:
+        return None, "user and title must be text"
+    if not user or not title:
+        return None, "user and title are required"
+    rating = row.get('rating')
+    if rating in (None, ''):
+        rating = None
+    else:
+        try:
+            rating = float(str(rating).replace(',', '.'))
+        except ValueError:
+            return None, f"Invalid rating: {rating}"
+        if not 0.0 < rating < 10.0:
+            return None, "Rating must be between 0 and 10"
+    return {'user': user, 'title': title, 'rating': rating}, None
+
+
+def import_watchlist(stream, fmt, data_manager, fetch, chunk_size=IMPORT_CHUNK_SIZE,
+                     concurrency=IMPORT_CONCURRENCY, progress=None):
+    """
+    Imports users and their watchlists from a CSV or JSON Lines stream.
+
+    Rows are processed in chunks. Titles are resolved against the local
+    catalog first; only unknown titles are looked up through ``fetch``, with
+    at most ``concurrency`` lookups in flight. Each chunk is written by the
+    data manager in a single transaction.
+
+    :param stream: Text stream with the input data
+    :param fmt: "csv" or "jsonl"
+    :param data_manager: DataManagerInterface implementation
+    :param fetch: Callable returning OMDb data for a title
+    :param chunk_size: Rows per transaction
+    :param concurrency: Maximum concurrent OMDb lookups
+    :param progress: Optional callable invoked with the report after each chunk
+    :return: ImportReport
+    """
+    report = ImportReport()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for chunk in chunked(read_rows(stream, fmt), chunk_size):
+            entries = []
+            for line, row in chunk:
+                report.rows += 1
+                entry, error = _parse_row(row)
+                if error:
+                    report.add_error(line, error)
+                    continue
+                entry['line'] = line
+                entries.append(entry)
+
+            known = data_manager.get_movies_by_titles({entry['title'] for entry in entries})
+            missing = sorted({entry['title'] for entry in entries} - set(known))
+            report.omdb_lookups += len(missing)
+            fetched = dict(zip(missing, executor.map(fetch, missing)))
+
+            ready = []
+            for entry in entries:
+                movie = fetched.get(entry['title'])
+                if entry['title'] not in known:
+                    if not movie:
+                        report.add_error(entry['line'], "Error fetching data")
+                        continue
+                    if 'error' in movie:
+                        report.add_error(entry['line'], movie['error'])
+                        continue
+                    entry['movie'] = movie
+                ready.append(entry)
+
+            errors = data_manager.import_watchlist_chunk(ready) if ready else []
+            for line, message in errors:
+                report.add_error(line, message)
+            report.imported += len(ready) - len(errors)
+            report.chunks += 1
+            if progress:
+                progress(report)
+    return report
+
+
+def open_text(binary_stream):
+    """Wraps an uploaded binary stream for line-by-line text reading."""
+    return io.TextIOWrapper(binary_stream, encoding="utf-8-sig", newline="")
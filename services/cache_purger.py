@@ -0,0 +1,42 @@
+import os
+import threading
+
+CACHE_PURGE_INTERVAL = int(os.getenv("CACHE_PURGE_INTERVAL", str(10 * 60)))
+
+
+class CachePurger:
+    """
+    Background thread that periodically deletes expired rows from SQLite caches.
+
+    SQLiteCache only drops an expired row when its key is read again, and
+    most keys never are (titles nobody looks up again, tokens of abandoned
+    searches), so the files would keep growing. In-memory caches are
+    bounded and skipped.
+    """
+
+    def __init__(self, caches=(), interval=CACHE_PURGE_INTERVAL):
+        self.caches = [cache for cache in caches if hasattr(cache, 'purge_expired')]
+        self.interval = interval
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Starts the purge loop in a daemon thread."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="cache-purge", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Stops the purge loop after the current purge."""
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def purge(self):
+        """Purges every cache once and returns the number of rows deleted."""
+        return sum(cache.purge_expired() for cache in self.caches)
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            self.purge()
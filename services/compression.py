@@ -0,0 +1,94 @@
+import gzip
+import os
+
+from flask import request
+
+try:
+    import brotli
+except ImportError:  # optional: gzip only
+    brotli = None
+
+COMPRESS_MIN_SIZE = int(os.getenv("COMPRESS_MIN_SIZE", "1024"))
+COMPRESS_LEVEL = int(os.getenv("COMPRESS_LEVEL", "6"))
+COMPRESSIBLE_TYPES = ("text/", "application/json", "application/javascript", "image/svg+xml")
+
+
+def available_encodings():
+    """Content codings this process can produce, preferred first."""
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def choose_encoding(accept_encoding, encodings=None):
+    """
+    Picks the best supported coding from an Accept-Encoding header.
+
+    :param accept_encoding: werkzeug MIMEAccept-like object with quality()
+    :param encodings: Codings to choose from, preferred first; defaults to
+                      available_encodings()
+    :return: "br", "gzip" or None
+    """
+    for encoding in available_encodings() if encodings is None else encodings:
+        if accept_encoding.quality(encoding) > 0:
+            return encoding
+    return None
+
+
+def compress(data, encoding, level=COMPRESS_LEVEL):
+    """Compresses bytes with "br" or "gzip"."""
+    if encoding == "br":
+        return brotli.compress(data, quality=min(level, 11))
+    return gzip.compress(data, compresslevel=level, mtime=0)
+
+
+def is_compressible(response, min_size=COMPRESS_MIN_SIZE):
+    """True for buffered, uncompressed text responses of at least min_size bytes."""
+    if response.direct_passthrough or response.is_streamed:
+        return False
+    if response.status_code < 200 or response.status_code in (204, 206, 304):
+        return False
+    if "Content-Encoding" in response.headers:
+        return False
+    if not (response.mimetype or "").startswith(COMPRESSIBLE_TYPES):
+        return False
+    return (response.content_length or 0) >= min_size
+
+
+def compress_response(response, request, min_size=COMPRESS_MIN_SIZE, level=COMPRESS_LEVEL):
+    """
+    Compresses a response in place according to the request's Accept-Encoding.
+
+    Streamed and file responses are passed through untouched. ETags are
+    marked weak, since the bytes on the wire differ from the identity body.
+
+    :return: The response
+    """
+    response.vary.add("Accept-Encoding")
+    if not is_compressible(response, min_size):
+        return response
+    encoding = choose_encoding(request.accept_encodings)
+    if encoding is None:
+        return response
+    response.set_data(compress(response.get_data(), encoding, level))
+    response.headers["Content-Encoding"] = encoding
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
+
+
+class Compression:
+    """
+    Compresses HTML and JSON responses of every endpoint.
+
+    Responses below ``min_size`` bytes are sent as they are; for them the
+    framing overhead outweighs the saving.
+    """
+
+    def __init__(self, app, min_size=COMPRESS_MIN_SIZE, level=COMPRESS_LEVEL):
+        self.min_size = min_size
+        self.level = level
+        app.after_request(self.after_request)
+        app.extensions['compression'] = self
+
+    def after_request(self, response):
+        return compress_response(response, request, self.min_size, self.level)
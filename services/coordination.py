@@ -0,0 +1,286 @@
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+
+try:
+    import fcntl
+except ImportError:  # Windows: no worker processes to coordinate
+    fcntl = None
+
+from services.omdb_cache import BASE_DIR
+
+COORDINATION_PATH = os.getenv("COORDINATION_PATH",
+                              os.path.join(BASE_DIR, "data", "coordination.db"))
+LEADER_RETRY_INTERVAL = int(os.getenv("LEADER_RETRY_INTERVAL", "30"))
+CHANGE_FEED_RETENTION = int(os.getenv("CHANGE_FEED_RETENTION", str(60 * 60)))
+
+
+def coordination_path(name, path=COORDINATION_PATH):
+    """
+    Returns the file worker processes coordinate through.
+
+    :param name: "process" when the app runs in a single process, so
+                 nothing is shared, "sqlite" for gunicorn and other
+                 servers running several worker processes on the host
+    :return: Path of the SQLite file, None for "process"
+    """
+    return path if name == "sqlite" else None
+
+
+def _connect(path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Autocommit, so BEGIN IMMEDIATE takes the write lock before reading.
+    connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None,
+                                 timeout=10)
+    connection.execute("PRAGMA journal_mode=WAL")
+    return connection
+
+
+class LeaderLock:
+    """
+    Elects the one process that runs the app's singleton jobs.
+
+    Every worker process tries to take an exclusive lock on a file; the
+    one that gets it runs the jobs and the others retry every
+    ``interval`` seconds, so another worker takes over when the leader
+    exits. The operating system releases the lock of a process that dies.
+    Without a path the process is always the leader.
+    """
+
+    def __init__(self, path=None, interval=LEADER_RETRY_INTERVAL):
+        self.path = path
+        self.interval = interval
+        self.held = False
+        self._file = None
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def acquire(self):
+        """Takes the lock if no other process holds it and returns whether it is held."""
+        if self.held:
+            return True
+        if self.path is None or fcntl is None:
+            self.held = True
+            return True
+        if self._file is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._file = open(self.path, "a")
+        try:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            return False
+        self.held = True
+        return True
+
+    def run_when_leader(self, callback):
+        """
+        Calls callback once this process holds the lock: right away if it
+        can take it, otherwise from a thread that keeps retrying.
+        """
+        if self.acquire():
+            callback()
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._wait_for_lock, args=(callback,),
+                                        name="leader-lock", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stops waiting for the lock; the jobs of a leader keep running."""
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def release(self):
+        """Stops waiting and gives up the lock, once the singleton jobs were stopped."""
+        self.stop()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self.held = False
+
+    def _wait_for_lock(self, callback):
+        while not self._stopped.wait(self.interval):
+            if self.acquire():
+                try:
+                    callback()
+                except Exception as error:
+                    print(f"Error starting background jobs: {error}")
+                return
+
+
+class DailyBudget:
+    """
+    Number of requests allowed per UTC day.
+
+    With a path the count is kept in a SQLite file and taken in one
+    transaction, so every worker process on the host draws from the same
+    budget and a restart does not reset it.
+    """
+
+    def __init__(self, limit, path=None):
+        self.limit = limit
+        self.path = path
+        self._lock = threading.Lock()
+        self._day = None
+        self._used = 0
+        self._connection = None
+
+    def used(self):
+        """Requests counted for the current UTC day."""
+        today = self._today()
+        if self.path is None:
+            with self._lock:
+                return self._used if self._day == today else 0
+        try:
+            with self._lock:
+                row = self._connect().execute(
+                    "SELECT used FROM request_budget WHERE day = ?", (today,)).fetchone()
+        except sqlite3.Error as error:
+            print(f"Budget read error: {error}")
+            return self.limit
+        return row[0] if row else 0
+
+    def remaining(self):
+        """Requests left for the current UTC day."""
+        return max(0, self.limit - self.used())
+
+    def take(self, count=1):
+        """
+        Counts requests against the budget.
+
+        :return: Number of requests granted, less than count (possibly 0)
+                 once the budget runs out
+        """
+        today = self._today()
+        if self.path is None:
+            with self._lock:
+                if self._day != today:
+                    self._day, self._used = today, 0
+                granted = max(0, min(count, self.limit - self._used))
+                self._used += granted
+                return granted
+        try:
+            with self._lock:
+                connection = self._connect()
+                connection.execute("BEGIN IMMEDIATE")
+                try:
+                    row = connection.execute(
+                        "SELECT used FROM request_budget WHERE day = ?", (today,)).fetchone()
+                    used = row[0] if row else 0
+                    granted = max(0, min(count, self.limit - used))
+                    connection.execute(
+                        "INSERT OR REPLACE INTO request_budget (day, used) VALUES (?, ?)",
+                        (today, used + granted))
+                    connection.execute("DELETE FROM request_budget WHERE day < ?", (today,))
+                    connection.execute("COMMIT")
+                except sqlite3.Error:
+                    connection.execute("ROLLBACK")
+                    raise
+                return granted
+        except sqlite3.Error as error:
+            print(f"Budget write error: {error}")
+            return 0
+
+    def _connect(self):
+        if self._connection is None:
+            self._connection = _connect(self.path)
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS request_budget ("
+                "day TEXT PRIMARY KEY, used INTEGER NOT NULL)")
+        return self._connection
+
+    @staticmethod
+    def _today():
+        return datetime.now(timezone.utc).date().isoformat()
+
+
+class ChangeFeed:
+    """
+    Shares "data_changed" events between the worker processes on a host.
+
+    Each process publishes the users whose data it changed to a SQLite
+    table and polls the rows other processes added since its last poll,
+    so in-process indexes such as the recommendations see every write.
+    Rows older than ``retention`` seconds are deleted; a process that
+    polls after rows it never read were deleted is told to rebuild.
+    """
+
+    def __init__(self, path, retention=CHANGE_FEED_RETENTION):
+        self.path = path
+        self.retention = retention
+        self.origin = uuid.uuid4().hex
+        self._lock = threading.Lock()
+        self._connection = None
+        self._last_seq = None
+
+    def publish(self, user_ids=None):
+        """Records the users whose data changed; "data_changed" subscriber."""
+        if not user_ids:
+            return
+        now = time.time()
+        try:
+            with self._lock:
+                connection = self._connect()
+                connection.execute("BEGIN IMMEDIATE")
+                try:
+                    connection.executemany(
+                        "INSERT INTO change_feed (origin, user_id, created_at) VALUES (?, ?, ?)",
+                        [(self.origin, user_id, now) for user_id in user_ids])
+                    connection.execute("DELETE FROM change_feed WHERE created_at < ?",
+                                       (now - self.retention,))
+                    connection.execute("COMMIT")
+                except sqlite3.Error:
+                    connection.execute("ROLLBACK")
+                    raise
+        except sqlite3.Error as error:
+            print(f"Change feed write error: {error}")
+
+    def poll(self):
+        """
+        Returns the users other processes changed since the last poll.
+
+        The first poll only starts following the feed and returns an
+        empty set.
+
+        :return: Set of user ids, or None if changes were missed
+        """
+        try:
+            with self._lock:
+                connection = self._connect()
+                if self._last_seq is None:
+                    self._last_seq = connection.execute(
+                        "SELECT COALESCE(MAX(seq), 0) FROM change_feed").fetchone()[0]
+                    return set()
+                rows = connection.execute(
+                    "SELECT seq, origin, user_id FROM change_feed WHERE seq > ? ORDER BY seq",
+                    (self._last_seq,)).fetchall()
+                missed = bool(rows) and rows[0][0] > self._last_seq + 1
+                if rows:
+                    self._last_seq = rows[-1][0]
+        except sqlite3.Error as error:
+            print(f"Change feed read error: {error}")
+            return set()
+        if missed:
+            return None
+        return {user_id for _, origin, user_id in rows if origin != self.origin}
+
+    def close(self):
+        """Closes the feed's connection."""
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+    def _connect(self):
+        if self._connection is None:
+            self._connection = _connect(self.path)
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS change_feed ("
+                "seq INTEGER PRIMARY KEY AUTOINCREMENT, origin TEXT NOT NULL, "
+                "user_id INTEGER NOT NULL, created_at REAL NOT NULL)")
+        return self._connection
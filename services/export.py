@@ -0,0 +1,58 @@
+import csv
+import io
+import json
+import os
+import zlib
+
+EXPORT_FORMATS = ("csv", "jsonl")
+EXPORT_MIMETYPES = {'csv': "text/csv", 'jsonl': "application/x-ndjson"}
+# Text buffered per chunk: large enough to compress well and keep writes
+# few, small enough that memory stays flat.
+EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", str(64 * 1024)))
+EXPORT_GZIP_LEVEL = 6
+
+
+def encode_records(records, fmt, fields, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Encodes records as CSV (with a header row) or JSON Lines.
+
+    :param records: Iterable of dicts
+    :param fmt: "csv" or "jsonl"
+    :param fields: Keys to write, in column order
+    :return: Generator of text chunks of about chunk_size characters
+    """
+    buffer = io.StringIO()
+    if fmt == "csv":
+        writer = csv.writer(buffer)
+        writer.writerow(fields)
+
+        def write(record):
+            writer.writerow([record.get(name) for name in fields])
+    else:
+        def write(record):
+            buffer.write(json.dumps({name: record.get(name) for name in fields}, default=str))
+            buffer.write("\n")
+
+    for record in records:
+        write(record)
+        if buffer.tell() >= chunk_size:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def gzip_chunks(chunks, level=EXPORT_GZIP_LEVEL):
+    """
+    Compresses text chunks into one gzip stream as they arrive.
+
+    :return: Generator of bytes; empty compressor output is skipped
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode("utf-8"))
+        if data:
+            yield data
+    yield compressor.flush()
+
@@ -0,0 +1,90 @@
+import time
+
+from flask import before_render_template, g, has_request_context, request, template_rendered
+from sqlalchemy import event
+
+from services.metrics import COUNT_BUCKETS, metrics
+
+HTTP_REQUEST_SECONDS = metrics.histogram(
+    "http_request_duration_seconds", "Latency of HTTP requests by route.",
+    ("method", "endpoint", "status"))
+HTTP_REQUEST_STATEMENTS = metrics.histogram(
+    "http_request_sql_statements", "SQL statements executed per HTTP request.",
+    ("endpoint",), buckets=COUNT_BUCKETS)
+SQL_STATEMENT_SECONDS = metrics.histogram(
+    "sql_statement_duration_seconds", "Latency of SQL statements by operation.",
+    ("operation",))
+TEMPLATE_RENDER_SECONDS = metrics.histogram(
+    "template_render_duration_seconds", "Time spent rendering Jinja templates.",
+    ("template",))
+
+# Longest statement text kept per entry in the slow request log.
+SLOW_LOG_STATEMENT_LENGTH = 500
+
+
+class Instrumentation:
+    """
+    Records request, SQL and template timings into the metrics registry.
+
+    With a ``slow_request_threshold`` (seconds), requests taking longer are
+    logged through app.logger together with the SQL they executed.
+    """
+
+    def __init__(self, app, engines=(), slow_request_threshold=None):
+        self.app = app
+        self.slow_request_threshold = slow_request_threshold
+        app.before_request(self._request_started)
+        app.after_request(self._request_finished)
+        before_render_template.connect(self._render_started, app)
+        template_rendered.connect(self._render_finished, app)
+        for engine in engines:
+            self.instrument_engine(engine)
+
+    def instrument_engine(self, engine):
+        """Times every statement executed on an engine."""
+        event.listen(engine, "before_cursor_execute", self._statement_started)
+        event.listen(engine, "after_cursor_execute", self._statement_finished)
+
+    def _request_started(self):
+        g.metrics_started = time.perf_counter()
+        g.sql_statements = 0
+        g.sql_log = [] if self.slow_request_threshold else None
+
+    def _request_finished(self, response):
+        started = g.get('metrics_started')
+        if started is None:
+            return response
+        elapsed = time.perf_counter() - started
+        endpoint = request.endpoint or "unmatched"
+        HTTP_REQUEST_SECONDS.observe(elapsed, method=request.method, endpoint=endpoint,
+                                     status=response.status_code)
+        HTTP_REQUEST_STATEMENTS.observe(g.sql_statements, endpoint=endpoint)
+        if self.slow_request_threshold and elapsed >= self.slow_request_threshold:
+            statements = "\n".join(f"  {duration * 1000:.1f} ms  {statement}"
+                                   for duration, statement in g.sql_log)
+            self.app.logger.warning("Slow request: %s %s took %.1f ms, %d SQL statements\n%s",
+                                    request.method, request.full_path, elapsed * 1000,
+                                    g.sql_statements, statements)
+        return response
+
+    def _statement_started(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('statement_started', []).append(time.perf_counter())
+
+    def _statement_finished(self, conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info['statement_started'].pop()
+        operation = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else ""
+        SQL_STATEMENT_SECONDS.observe(elapsed, operation=operation)
+        if has_request_context() and 'sql_statements' in g:
+            g.sql_statements += 1
+            if g.sql_log is not None:
+                g.sql_log.append((elapsed, " ".join(statement.split())
+                                  [:SLOW_LOG_STATEMENT_LENGTH]))
+
+    def _render_started(self, sender, template, context, **extra):
+        g.setdefault('render_started', []).append(time.perf_counter())
+
+    def _render_finished(self, sender, template, context, **extra):
+        starts = g.get('render_started')
+        if starts:
+            TEMPLATE_RENDER_SECONDS.observe(time.perf_counter() - starts.pop(),
+                                            template=template.name)
@@ -0,0 +1,126 @@
+import os
+import threading
+from datetime import datetime, timedelta, timezone
+
+from requests.exceptions import RequestException
+
+from data_model import Movie, OMDB_METADATA_COLUMNS
+from services.coordination import DailyBudget
+from services.omdb_api import movie_from_response
+from services.omdb_client import api_error
+
+# The free OMDb tier allows 1000 requests a day; leave half for searches.
+METADATA_REFRESH_BUDGET = int(os.getenv("METADATA_REFRESH_BUDGET", "500"))
+METADATA_REFRESH_BATCH = int(os.getenv("METADATA_REFRESH_BATCH", "25"))
+METADATA_REFRESH_INTERVAL = int(os.getenv("METADATA_REFRESH_INTERVAL", str(15 * 60)))
+METADATA_MAX_AGE = int(os.getenv("METADATA_MAX_AGE", str(7 * 24 * 60 * 60)))
+
+
+class MetadataRefresher:
+    """
+    Background thread that refreshes stale OMDb metadata in batches.
+
+    Every ``interval`` seconds it looks up to ``batch_size`` movies whose
+    metadata is older than ``max_age`` seconds, never refreshed ones first,
+    by IMDb id (title and year for movies without one, which gives them
+    an IMDb id) and stores rating, poster, genre, runtime and plot. At
+    most ``daily_budget`` OMDb requests are made per UTC day, so the
+    refresher never takes more of the API quota than configured; pass a
+    SQLite-backed ``budget`` to count them across processes and restarts.
+    A network error or an OMDb error other than "not found" (e.g. an
+    exhausted quota) ends the batch; the movies are retried next time.
+    """
+
+    def __init__(self, app, data_manager, client, poster_verifier=None,
+                 daily_budget=METADATA_REFRESH_BUDGET, batch_size=METADATA_REFRESH_BATCH,
+                 interval=METADATA_REFRESH_INTERVAL, max_age=METADATA_MAX_AGE, budget=None):
+        self.app = app
+        self.data_manager = data_manager
+        self.client = client
+        self.poster_verifier = poster_verifier
+        self.batch_size = batch_size
+        self.interval = interval
+        self.max_age = max_age
+        self.budget = budget if budget is not None else DailyBudget(daily_budget)
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Starts the refresh loop in a daemon thread."""
+        if self._thread is None:
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._run, name="metadata-refresher",
+                                            daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Stops the refresh loop after the current batch."""
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    @property
+    def daily_budget(self):
+        """OMDb requests allowed per UTC day."""
+        return self.budget.limit
+
+    @daily_budget.setter
+    def daily_budget(self, limit):
+        self.budget.limit = limit
+
+    @property
+    def requests_today(self):
+        """OMDb requests made for the current UTC day."""
+        return self.budget.used()
+
+    def remaining_budget(self):
+        """OMDb requests left for the current UTC day."""
+        return self.budget.remaining()
+
+    def refresh_batch(self):
+        """Refreshes one batch and returns the number of movies whose metadata changed."""
+        limit = min(self.batch_size, self.remaining_budget())
+        if limit <= 0:
+            return 0
+        refreshed_before = datetime.now(timezone.utc) - timedelta(seconds=self.max_age)
+        with self.app.app_context():
+            stale = [(movie.id, movie.imdb_id, movie.title, movie.release_year)
+                     for movie in self.data_manager.get_stale_movies(refreshed_before, limit)]
+
+        updates = {}
+        for movie_id, imdb_id, title, year in stale:
+            params = {'i': imdb_id} if imdb_id else {'t': title, 'y': year}
+            if not self.budget.take():
+                break
+            try:
+                response = self.client.get_json(**params)
+            except (RequestException, ValueError) as error:
+                print(f"Error refreshing metadata of {title}: {error}")
+                break
+            error = api_error(response)
+            if error:
+                # Quota or key problems say nothing about the movie.
+                print(f"Error refreshing metadata of {title}: {error}")
+                break
+            movie = movie_from_response(response)
+            if 'error' in movie:
+                updates[movie_id] = {}
+                continue
+            values = Movie.values_from_omdb(movie)
+            updates[movie_id] = {column: values[column] for column in OMDB_METADATA_COLUMNS}
+
+        if not updates:
+            return 0
+        with self.app.app_context():
+            changed = self.data_manager.update_movie_metadata(updates)
+        if changed and self.poster_verifier is not None:
+            self.poster_verifier.submit_pending()
+        return changed
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            try:
+                self.refresh_batch()
+            except Exception as error:
+                print(f"Error refreshing movie metadata: {error}")
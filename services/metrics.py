@@ -0,0 +1,195 @@
+import bisect
+import threading
+
+# Latency buckets in seconds, from sub-millisecond SQL to slow OMDb calls.
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0,
+                   2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    """Base class of labelled metrics."""
+
+    kind = "untyped"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def render(self):
+        """Returns the metric in Prometheus text exposition format."""
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.extend(self._samples(key, value))
+        return lines
+
+    def _samples(self, key, value):
+        return [f"{self.name}{_labels(self.labelnames, key)} {_number(value)}"]
+
+
+class Counter(Metric):
+    """Monotonically increasing count."""
+
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        """Adds amount to the labelled series."""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Histogram(Metric):
+    """Cumulative bucketed distribution with sum and count."""
+
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        """Records one observation."""
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                series = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def _samples(self, key, value):
+        counts, total, count = value
+        lines = []
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += bucket_count
+            le = (("le", _number(bound)),)
+            lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, le)} {cumulative}")
+        labels = _labels(self.labelnames, key)
+        lines.append(f"{self.name}_sum{labels} {_number(total)}")
+        lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class CallbackMetric(Metric):
+    """Metric whose labelled values are read from a callback at scrape time."""
+
+    def __init__(self, name, documentation, labelnames, callback):
+        super().__init__(name, documentation, labelnames)
+        self.callback = callback
+
+    def render(self):
+        """Refreshes the values from the callback before rendering."""
+        try:
+            values = self.callback()
+        except Exception as error:
+            print(f"Error collecting {self.name}: {error}")
+            values = {}
+        with self._lock:
+            self._values = {key if isinstance(key, tuple) else (key,): value
+                            for key, value in values.items()}
+        return super().render()
+
+
+class CallbackGauge(CallbackMetric):
+    """Gauge read from a callback at scrape time."""
+
+    kind = "gauge"
+
+
+class CallbackCounter(CallbackMetric):
+    """
+    Counter read from a callback at scrape time, for totals the app already
+    keeps, such as cache hits. The callback must never return less than
+    before, so rate() works.
+    """
+
+    kind = "counter"
+
+
+class MetricsRegistry:
+    """Named collection of metrics rendered together for /metrics."""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        """Adds a metric, returning the existing one if the name is taken."""
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name, documentation, labelnames=()):
+        """Registers a Counter."""
+        return self.register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        """Registers a Histogram."""
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def gauge_callback(self, name, documentation, labelnames, callback):
+        """
+        Registers a gauge read from callback, which returns a dict of label
+        value (or tuple of label values) to number.
+        """
+        with self._lock:
+            metric = CallbackGauge(name, documentation, labelnames, callback)
+            self._metrics[name] = metric
+            return metric
+
+    def counter_callback(self, name, documentation, labelnames, callback):
+        """
+        Registers a counter read from callback, which returns a dict of
+        label value (or tuple of label values) to a running total.
+        """
+        with self._lock:
+            metric = CallbackCounter(name, documentation, labelnames, callback)
+            self._metrics[name] = metric
+            return metric
+
+    def render(self):
+        """Returns every metric in Prometheus text exposition format."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+
+OMDB_REQUEST_SECONDS = metrics.histogram(
+    "omdb_request_duration_seconds", "Latency of OMDb API calls.", ("outcome",))
+OMDB_ERRORS = metrics.counter(
+    "omdb_errors_total", "Failed OMDb API calls by error type.", ("error",))
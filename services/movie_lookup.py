@@ -0,0 +1,41 @@
+from data_model import year_value
+from services.omdb_api import fetch_movie_data
+
+
+def lookup_movie(data_manager, title, fetch=fetch_movie_data, year=None):
+    """
+    Resolves a title to OMDb-style movie data.
+
+    The catalog is searched first, so OMDb is only called for titles it
+    does not have. With a year only that release matches, so a remake of
+    a movie in the catalog is fetched; without one the most recent movie
+    with the title is used. An OMDb result is still matched against the
+    catalog by IMDb id (see identity.match_movie), so a movie already
+    there is shown as stored.
+
+    :param year: Release year narrowing the search, optional
+    :return: Movie dict, a dict with an "error" key, or None on network errors
+    """
+    local_movie = data_manager.find_movie_by_title(title, year_value(year))
+    if local_movie:
+        return local_movie.to_omdb()
+    movie = fetch(title, year)
+    if movie and 'error' not in movie:
+        local_movie = data_manager.find_movie(movie)
+        if local_movie:
+            return local_movie.to_omdb()
+    return movie
+
+
+def lookup_movie_by_id(data_manager, imdb_id, fetch):
+    """
+    Resolves an IMDb id to OMDb-style movie data, from the catalog if it
+    has the movie.
+
+    :param fetch: Function fetching the OMDb details of an IMDb id
+    :return: Movie dict, a dict with an "error" key, or None on network errors
+    """
+    local_movie = data_manager.find_movie({'imdbID': imdb_id})
+    if local_movie:
+        return local_movie.to_omdb()
+    return fetch(imdb_id)
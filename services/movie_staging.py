@@ -0,0 +1,74 @@
+import os
+import secrets
+
+from services.omdb_cache import BASE_DIR, LRUCache, SQLiteCache
+
+MOVIE_STAGING_SIZE = int(os.getenv("MOVIE_STAGING_SIZE", "1024"))
+MOVIE_STAGING_TTL = int(os.getenv("MOVIE_STAGING_TTL", str(30 * 60)))
+MOVIE_STAGING_PATH = os.getenv("MOVIE_STAGING_PATH",
+                               os.path.join(BASE_DIR, "data", "movie_staging.db"))
+
+
+def create_staging_backend(name, max_entries=MOVIE_STAGING_SIZE, path=MOVIE_STAGING_PATH):
+    """
+    Creates a staging store backend.
+
+    :param name: "memory" for an in-process LRU, "sqlite" for a file shared
+                 by every worker process on the host, so a search and its
+                 confirmation may be served by different workers
+    :return: Object with get(key), set(key, value, ttl) and delete(key)
+    """
+    if name == "sqlite":
+        return SQLiteCache(path=path, table="movie_staging")
+    return LRUCache(max_entries=max_entries)
+
+
+class MovieStaging:
+    """
+    Server-side store for OMDb results waiting to be confirmed.
+
+    A search stages its result under a random token and the confirm form
+    posts only that token, so the movie added is the one the server looked
+    up rather than whatever the browser sends back. Entries belong to the
+    user who searched and expire after ``ttl`` seconds. Confirmed entries
+    are kept until then, so submitting the form again adds nothing and
+    checks no poster twice.
+    """
+
+    def __init__(self, backend=None, ttl=MOVIE_STAGING_TTL):
+        self.backend = backend if backend is not None else LRUCache(MOVIE_STAGING_SIZE)
+        self.ttl = ttl
+
+    def stage(self, user_id, movie):
+        """
+        Stores a movie for a user to confirm.
+
+        :param movie: OMDb movie dict
+        :return: Token identifying the staged movie
+        """
+        token = secrets.token_urlsafe(16)
+        self.backend.set(self._key(token), {'user_id': user_id, 'movie': movie,
+                                            'confirmed': False}, self.ttl)
+        return token
+
+    def get(self, user_id, token):
+        """
+        Returns a staged entry of a user.
+
+        :return: Dict with the movie and whether it was confirmed, or None
+                 for unknown, expired or other users' tokens
+        """
+        if not token:
+            return None
+        entry = self.backend.get(self._key(token))
+        if entry is None or entry.get('user_id') != user_id:
+            return None
+        return entry
+
+    def confirm(self, token, entry):
+        """Marks a staged entry as added, so confirming it again is a no-op."""
+        self.backend.set(self._key(token), dict(entry, confirmed=True), self.ttl)
+
+    @staticmethod
+    def _key(token):
+        return f"staged:{token}"
@@ -1,48 +1,67 @@
 import os
 
-import requests
 from dotenv import load_dotenv
-from requests.exceptions import HTTPError, ConnectionError, Timeout, MissingSchema
+from requests.exceptions import RequestException
+
+from services.omdb_cache import omdb_cache
+from services.omdb_client import OmdbClient, CircuitOpenError
 
 load_dotenv()
 OMDB_API_KEY = os.getenv("OMDB_API_KEY")
 
+omdb_client = OmdbClient(api_key=OMDB_API_KEY)
+
+
+def fetch_movie_data(title, year=None):
+    """
+    Fetches movie data from the OMDb API for a given title.
+
+    Results, including "not found" answers, are served from the OMDb cache
+    when available. Network and parsing errors and OMDb errors such as an
+    exhausted quota are not cached.
+
+    :param year: Release year, to pick one of several movies with the title
+    """
+    cache_key = f"{title} ({year})" if year else title
+    cached = omdb_cache.get(cache_key)
+    if cached is not None:
+        return cached
 
-def fetch_movie_data(title):
-    """Fetches movie data from the OMDb API for a given title."""
-    fetch_url = f"https://www.omdbapi.com/?apikey={OMDB_API_KEY}&t={title}"
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 '
-                      '(KHTML, like Gecko) Chrome/85.0.4183.121 Safari/537.36',
-        'Accept-Language': 'en-US,en;q=0.5'
-    }
     try:
-        response = requests.get(fetch_url, headers=headers)
-        response.raise_for_status()
-    except(HTTPError, ConnectionError, Timeout) as error:
+        movie = omdb_client.get_json(t=title, y=year)
+    except CircuitOpenError as error:
+        return {'error': str(error)}
+    except RequestException as error:
         print(f"Request error occurred: {error}")
         return None
-
-    try:
-        movie = response.json()
     except ValueError as error:
         print(f"Error parsing JSON: {error}")
         return None
 
+    result = movie_from_response(movie)
+    omdb_cache.set(cache_key, result)
+    return result
+
+
+def movie_from_response(movie):
+    """Maps an OMDb detail response to the movie dict used by the app."""
+    if movie.get('Response') == 'False':
+        return {'error': movie.get('Error', 'Movie not found!')}
     return {
         'Title': movie.get('Title'),
         'Director': movie.get('Director'),
         'Year': movie.get('Year'),
         'imdbRating': movie.get('imdbRating'),
-        'Poster': movie.get('Poster')
+        'Poster': movie.get('Poster'),
+        'imdbID': movie.get('imdbID'),
+        'Genre': movie.get('Genre'),
+        'Runtime': movie.get('Runtime'),
+        'Plot': movie.get('Plot'),
     }
 
 
 def check_poster_availability(url):
     """Checks if a poster URL is valid, returns fallback if not."""
-    try:
-        response = requests.get(url)
-        response.raise_for_status()
+    if omdb_client.url_available(url):
         return url
-    except(ConnectionError, Timeout, HTTPError, MissingSchema):
-        return "/static/fallback_poster.jpeg"
+    return "/static/fallback_poster.jpeg"
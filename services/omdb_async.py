@@ -0,0 +1,134 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode
+
+from requests.exceptions import RequestException
+
+from services.omdb_api import movie_from_response
+from services.omdb_cache import LRUCache, OMDB_CACHE_TTL, OMDB_CACHE_NEGATIVE_TTL
+from services.omdb_client import api_error
+
+OMDB_SEARCH_RESULTS = int(os.getenv("OMDB_SEARCH_RESULTS", "5"))
+OMDB_SEARCH_CONCURRENCY = int(os.getenv("OMDB_SEARCH_CONCURRENCY", "8"))
+
+
+class SingleFlight:
+    """
+    Deduplicates identical in-flight calls.
+
+    While a call for a key is running, further submissions for the same key
+    get the same future instead of starting another call. Works across
+    threads, so concurrent requests share one upstream call.
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.shared = 0
+        self._futures = {}
+        self._lock = threading.RLock()
+
+    def submit(self, executor, key, function, *args):
+        """Returns the running future for key, starting function(*args) if there is none."""
+        with self._lock:
+            future = self._futures.get(key)
+            if future is not None:
+                self.shared += 1
+                return future
+            self.calls += 1
+            future = executor.submit(function, *args)
+            self._futures[key] = future
+        future.add_done_callback(lambda done: self._forget(key, done))
+        return future
+
+    def _forget(self, key, future):
+        with self._lock:
+            if self._futures.get(key) is future:
+                del self._futures[key]
+
+
+class AsyncOmdbSearch:
+    """
+    Concurrent OMDb title search.
+
+    Runs the ``s=`` search and then fetches the details of the top hits
+    concurrently with asyncio. HTTP calls go through the pooled OmdbClient
+    on a bounded thread pool, identical in-flight calls are coalesced, and
+    responses are cached in memory, except OMDb errors other than "not
+    found".
+    """
+
+    def __init__(self, client, cache=None, max_concurrency=OMDB_SEARCH_CONCURRENCY):
+        self.client = client
+        self.cache = cache if cache is not None else LRUCache()
+        self.flights = SingleFlight()
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency,
+                                            thread_name_prefix="omdb-search")
+
+    async def search(self, query, limit=OMDB_SEARCH_RESULTS):
+        """
+        Searches OMDb and returns detailed results for the best hits.
+
+        :param query: Title search text
+        :param limit: Maximum number of detailed results
+        :return: List of movie dicts with an added "imdbID" key
+        """
+        try:
+            results = await self._get(s=query, type="movie")
+        except (RequestException, ValueError) as error:
+            print(f"Request error occurred: {error}")
+            return []
+        hits = (results.get('Search') or [])[:limit]
+        details = await asyncio.gather(*(self._get(i=hit.get('imdbID')) for hit in hits),
+                                       return_exceptions=True)
+        movies = []
+        for hit, detail in zip(hits, details):
+            if isinstance(detail, dict):
+                movie = movie_from_response(detail)
+                if 'error' not in movie:
+                    movie['imdbID'] = hit.get('imdbID')
+                    movies.append(movie)
+        return movies
+
+    def search_sync(self, query, limit=OMDB_SEARCH_RESULTS):
+        """Runs search() to completion from synchronous code."""
+        return asyncio.run(self.search(query, limit))
+
+    async def movie(self, imdb_id):
+        """
+        Fetches the details of one movie, from the cache if a search
+        already fetched them.
+
+        :return: Movie dict, a dict with an "error" key, or None on network errors
+        """
+        try:
+            detail = await self._get(i=imdb_id)
+        except (RequestException, ValueError) as error:
+            print(f"Request error occurred: {error}")
+            return None
+        return movie_from_response(detail)
+
+    def movie_sync(self, imdb_id):
+        """Runs movie() to completion from synchronous code."""
+        return asyncio.run(self.movie(imdb_id))
+
+    def shutdown(self, wait=True):
+        """Stops the worker threads."""
+        self._executor.shutdown(wait=wait)
+
+    async def _get(self, **params):
+        key = urlencode(sorted(params.items()))
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+        future = self.flights.submit(self._executor, key, self._fetch, key, params)
+        return await asyncio.wrap_future(future)
+
+    def _fetch(self, key, params):
+        response = self.client.get_json(**params)
+        if response.get('Response') != 'False':
+            self.cache.set(key, response, OMDB_CACHE_TTL)
+        elif not api_error(response):
+            self.cache.set(key, response, OMDB_CACHE_NEGATIVE_TTL)
+        return response
@@ -0,0 +1,214 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from data_model import normalize_title
+from services.omdb_client import is_not_found
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+
+OMDB_CACHE_SIZE = int(os.getenv("OMDB_CACHE_SIZE", "512"))
+OMDB_CACHE_TTL = int(os.getenv("OMDB_CACHE_TTL", str(24 * 60 * 60)))
+OMDB_CACHE_NEGATIVE_TTL = int(os.getenv("OMDB_CACHE_NEGATIVE_TTL", str(60 * 60)))
+OMDB_CACHE_PATH = os.getenv("OMDB_CACHE_PATH",
+                            os.path.join(BASE_DIR, "data", "omdb_cache.db"))
+
+
+class LRUCache:
+    """Bounded in-process cache with per-entry expiry."""
+
+    def __init__(self, max_entries=OMDB_CACHE_SIZE):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Returns the cached value or None if missing or expired."""
+        entry = self.get_entry(key)
+        return entry[0] if entry is not None else None
+
+    def get_entry(self, key):
+        """Returns the cached (value, expiry timestamp) or None if missing or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] < time.time():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def set(self, key, value, ttl):
+        """Stores a value for ttl seconds, evicting the least recently used entry."""
+        with self._lock:
+            self._entries[key] = (value, time.time() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        """Removes a key if present."""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        """Drops every entry."""
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SQLiteCache:
+    """Persistent key/value cache stored in its own SQLite file."""
+
+    def __init__(self, path=OMDB_CACHE_PATH, table="omdb_cache"):
+        self.path = path
+        self.table = table
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._connection = None
+
+    def _connect(self):
+        if self._connection is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._connection = sqlite3.connect(self.path, check_same_thread=False)
+            self._connection.execute(
+                f"CREATE TABLE IF NOT EXISTS {self.table} ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)")
+        return self._connection
+
+    def get(self, key):
+        """Returns the cached value or None if missing or expired."""
+        entry = self.get_entry(key)
+        return entry[0] if entry is not None else None
+
+    def get_entry(self, key):
+        """Returns the cached (value, expiry timestamp) or None if missing or expired."""
+        try:
+            with self._lock:
+                row = self._connect().execute(
+                    f"SELECT value, expires_at FROM {self.table} WHERE key = ?",
+                    (key,)).fetchone()
+        except sqlite3.Error as error:
+            print(f"Cache read error: {error}")
+            row = None
+        if row is None or row[1] < time.time():
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json.loads(row[0]), row[1]
+
+    def set(self, key, value, ttl):
+        """Stores a JSON-serializable value for ttl seconds."""
+        try:
+            with self._lock:
+                connection = self._connect()
+                connection.execute(
+                    f"INSERT OR REPLACE INTO {self.table} (key, value, expires_at) "
+                    "VALUES (?, ?, ?)",
+                    (key, json.dumps(value), time.time() + ttl))
+                connection.commit()
+        except sqlite3.Error as error:
+            print(f"Cache write error: {error}")
+
+    def delete(self, key):
+        """Removes a key if present."""
+        try:
+            with self._lock:
+                connection = self._connect()
+                connection.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+                connection.commit()
+        except sqlite3.Error as error:
+            print(f"Cache delete error: {error}")
+
+    def purge_expired(self):
+        """Deletes expired rows and returns how many were removed."""
+        try:
+            with self._lock:
+                connection = self._connect()
+                cursor = connection.execute(
+                    f"DELETE FROM {self.table} WHERE expires_at < ?", (time.time(),))
+                connection.commit()
+                return cursor.rowcount
+        except sqlite3.Error as error:
+            print(f"Cache purge error: {error}")
+            return 0
+
+
+class OmdbCache:
+    """
+    Two-tier cache for OMDb lookups keyed on the normalized title.
+
+    Lookups check the in-process LRU first and then the SQLite store,
+    promoting persistent hits into memory for the rest of their TTL.
+    "Not found" answers are cached as negative entries with a shorter
+    TTL; other errors, such as an exhausted quota, are not cached.
+    """
+
+    def __init__(self, memory=None, persistent=None, ttl=OMDB_CACHE_TTL,
+                 negative_ttl=OMDB_CACHE_NEGATIVE_TTL):
+        self.memory = memory if memory is not None else LRUCache()
+        self.persistent = persistent if persistent is not None else SQLiteCache()
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+
+    def get(self, title):
+        """Returns the cached lookup result for a title or None."""
+        key = normalize_title(title)
+        if not key:
+            return None
+        value = self.memory.get(key)
+        if value is not None:
+            return value
+        entry = self.persistent.get_entry(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        self.memory.set(key, value, expires_at - time.time())
+        return value
+
+    def set(self, title, value):
+        """Caches a lookup result in both tiers, unless it is a transient error."""
+        key = normalize_title(title)
+        if not key or value is None:
+            return
+        ttl = self._ttl_for(value)
+        if ttl is None:
+            return
+        self.memory.set(key, value, ttl)
+        self.persistent.set(key, value, ttl)
+
+    def invalidate(self, title):
+        """Forgets a title in both tiers."""
+        key = normalize_title(title)
+        self.memory.delete(key)
+        self.persistent.delete(key)
+
+    def stats(self):
+        """Returns hit/miss counters for both tiers."""
+        return {
+            'memory_hits': self.memory.hits,
+            'memory_misses': self.memory.misses,
+            'persistent_hits': self.persistent.hits,
+            'persistent_misses': self.persistent.misses,
+            'memory_entries': len(self.memory),
+        }
+
+    def _ttl_for(self, value):
+        """TTL of a lookup result, None for errors that must not be cached."""
+        if 'error' not in value:
+            return self.ttl
+        return self.negative_ttl if is_not_found(value['error']) else None
+
+
+omdb_cache = OmdbCache()
@@ -0,0 +1,200 @@
+import os
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.exceptions import RequestException
+from urllib3.util.retry import Retry
+
+from services.metrics import OMDB_ERRORS, OMDB_REQUEST_SECONDS
+
+OMDB_API_URL = os.getenv("OMDB_API_URL", "https://www.omdbapi.com/")
+OMDB_CONNECT_TIMEOUT = float(os.getenv("OMDB_CONNECT_TIMEOUT", "3.05"))
+OMDB_READ_TIMEOUT = float(os.getenv("OMDB_READ_TIMEOUT", "5"))
+OMDB_MAX_RETRIES = int(os.getenv("OMDB_MAX_RETRIES", "2"))
+OMDB_BACKOFF_FACTOR = float(os.getenv("OMDB_BACKOFF_FACTOR", "0.3"))
+OMDB_POOL_SIZE = int(os.getenv("OMDB_POOL_SIZE", "10"))
+OMDB_FAILURE_THRESHOLD = int(os.getenv("OMDB_FAILURE_THRESHOLD", "5"))
+OMDB_RESET_TIMEOUT = float(os.getenv("OMDB_RESET_TIMEOUT", "30"))
+
+# Error messages OMDb answers lookups with when it has no such movie. Any
+# other error (request limit reached, invalid API key, ...) says nothing
+# about the movie and is transient.
+OMDB_NOT_FOUND_ERRORS = frozenset({"Movie not found!", "Incorrect IMDb ID.",
+                                   "Series or episode not found!", "Too many results."})
+
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 '
+                  '(KHTML, like Gecko) Chrome/85.0.4183.121 Safari/537.36',
+    'Accept-Language': 'en-US,en;q=0.5'
+}
+
+
+def is_not_found(error):
+    """True if an OMDb error message means the movie does not exist."""
+    return error in OMDB_NOT_FOUND_ERRORS
+
+
+def api_error(response):
+    """
+    Returns the error of an OMDb answer that failed for reasons other than
+    the movie not existing, e.g. "Request limit reached!", else None.
+    """
+    if response.get('Response') != 'False':
+        return None
+    error = response.get('Error', "Unknown OMDb error")
+    return None if is_not_found(error) else error
+
+
+class CircuitOpenError(RequestException):
+    """Raised when the circuit breaker rejects a call without trying it."""
+
+
+class CircuitBreaker:
+    """
+    Fails fast after a run of consecutive failures.
+
+    Once ``failure_threshold`` calls in a row have failed the circuit opens
+    and every call is rejected until ``reset_timeout`` seconds have passed.
+    The next call is then let through as a trial: success closes the
+    circuit again, failure re-opens it.
+    """
+
+    def __init__(self, failure_threshold=OMDB_FAILURE_THRESHOLD,
+                 reset_timeout=OMDB_RESET_TIMEOUT):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self):
+        """True while calls are being rejected."""
+        with self._lock:
+            return (self.opened_at is not None
+                    and time.monotonic() - self.opened_at < self.reset_timeout)
+
+    def before_call(self):
+        """Raises CircuitOpenError if the call must not be attempted."""
+        if self.is_open:
+            raise CircuitOpenError("OMDb is unavailable, try again later")
+
+    def record_success(self):
+        """Closes the circuit."""
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self):
+        """Counts a failure and opens the circuit once the threshold is reached."""
+        with self._lock:
+            self.failures += 1
+            if self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+
+class OmdbClient:
+    """
+    HTTP client for OMDb and poster hosts.
+
+    Owns a keep-alive session with a bounded connection pool, applies
+    connect/read timeouts and retries with exponential backoff, and guards
+    OMDb API calls with a circuit breaker. Answers reporting an API error
+    rather than a missing movie, such as an exhausted quota or a bad API
+    key, count as failures for the breaker.
+    """
+
+    def __init__(self, api_key=None, base_url=OMDB_API_URL,
+                 connect_timeout=OMDB_CONNECT_TIMEOUT, read_timeout=OMDB_READ_TIMEOUT,
+                 max_retries=OMDB_MAX_RETRIES, backoff_factor=OMDB_BACKOFF_FACTOR,
+                 pool_size=OMDB_POOL_SIZE, breaker=None):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.timeout = (connect_timeout, read_timeout)
+        self.breaker = breaker if breaker is not None else CircuitBreaker()
+        self.session = requests.Session()
+        self.session.headers.update(DEFAULT_HEADERS)
+        retry = Retry(total=max_retries, backoff_factor=backoff_factor,
+                      status_forcelist=(429, 500, 502, 503, 504),
+                      allowed_methods=("GET", "HEAD"),
+                      raise_on_status=False)
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size,
+                              max_retries=retry)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def get_json(self, **params):
+        """
+        Calls the OMDb API with the given query parameters.
+
+        :return: Decoded JSON response, possibly an OMDb error answer
+        :raises RequestException: on network, HTTP or circuit breaker errors
+        :raises ValueError: if the response is not valid JSON
+        """
+        try:
+            self.breaker.before_call()
+        except CircuitOpenError:
+            OMDB_ERRORS.inc(error="CircuitOpenError")
+            raise
+        started = time.perf_counter()
+        try:
+            response = self.session.get(self.base_url,
+                                        params={'apikey': self.api_key, **params},
+                                        timeout=self.timeout)
+            response.raise_for_status()
+        except RequestException as error:
+            OMDB_REQUEST_SECONDS.observe(time.perf_counter() - started, outcome="error")
+            OMDB_ERRORS.inc(error=type(error).__name__)
+            self.breaker.record_failure()
+            raise
+        OMDB_REQUEST_SECONDS.observe(time.perf_counter() - started, outcome="ok")
+        data = response.json()
+        if api_error(data):
+            OMDB_ERRORS.inc(error="ApiError")
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+        return data
+
+    def url_available(self, url):
+        """
+        Returns True if the URL answers with a successful status.
+
+        Uses a HEAD request and falls back to a one-byte ranged GET for
+        hosts that do not allow HEAD, so no image body is downloaded.
+        """
+        try:
+            response = self.session.head(url, timeout=self.timeout, allow_redirects=True)
+            if response.status_code in (403, 405, 501):
+                with self.session.get(url, timeout=self.timeout, stream=True,
+                                      headers={'Range': 'bytes=0-0'}) as response:
+                    pass
+            response.raise_for_status()
+            return True
+        except (RequestException, ValueError):
+            return False
+
+    def download(self, url, max_bytes=5 * 1024 * 1024):
+        """
+        Downloads a resource into memory.
+
+        :return: Tuple of (content bytes, content type)
+        :raises RequestException: on network or HTTP errors
+        :raises ValueError: if the body is larger than max_bytes
+        """
+        with self.session.get(url, timeout=self.timeout, stream=True) as response:
+            response.raise_for_status()
+            chunks = []
+            size = 0
+            for chunk in response.iter_content(chunk_size=64 * 1024):
+                size += len(chunk)
+                if size > max_bytes:
+                    raise ValueError(f"{url} is larger than {max_bytes} bytes")
+                chunks.append(chunk)
+            return b"".join(chunks), response.headers.get('Content-Type', '')
+
+    def close(self):
+        """Closes the pooled connections."""
+        self.session.close()
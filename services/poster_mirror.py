@@ -0,0 +1,142 @@
+import hashlib
+import io
+import os
+import re
+import threading
+
+from requests.exceptions import RequestException
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+POSTER_MIRROR_DIR = os.getenv("POSTER_MIRROR_DIR",
+                              os.path.join(BASE_DIR, "static", "posters"))
+
+# Variant name -> bounding box in pixels; sized for the .movie-grid cards.
+POSTER_VARIANTS = {
+    'thumb': (300, 450),
+}
+
+DIGEST_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+
+IMAGE_SIGNATURES = [
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"GIF8", "image/gif"),
+]
+
+
+def guess_mimetype(content):
+    """Returns the image MIME type based on the file signature."""
+    for signature, mimetype in IMAGE_SIGNATURES:
+        if content.startswith(signature):
+            return mimetype
+    if content[:4] == b"RIFF" and content[8:12] == b"WEBP":
+        return "image/webp"
+    return "application/octet-stream"
+
+
+class PosterMirror:
+    """
+    Content-addressed local store for poster images.
+
+    Each poster is stored once under ``<root>/<digest[:2]>/<digest>``, where
+    digest is the SHA-256 of the image, together with resized variants when
+    Pillow is installed. Without Pillow the original is served for every
+    variant.
+    """
+
+    def __init__(self, client, root=POSTER_MIRROR_DIR, variants=None):
+        self.client = client
+        self.root = root
+        self.variants = POSTER_VARIANTS if variants is None else variants
+
+    def mirror(self, poster_url):
+        """
+        Downloads a poster and stores it with its variants.
+
+        :param poster_url: Remote poster URL
+        :return: Digest of the stored poster or None on failure
+        """
+        try:
+            content, _ = self.client.download(poster_url)
+        except (RequestException, ValueError) as error:
+            print(f"Error mirroring poster {poster_url}: {error}")
+            return None
+
+        digest = hashlib.sha256(content).hexdigest()
+        original = self.path_for(digest)
+        if not os.path.exists(original):
+            os.makedirs(os.path.dirname(original), exist_ok=True)
+            if not self._write(original, content):
+                return None
+            for variant, size in self.variants.items():
+                self._write_variant(content, self.path_for(digest, variant), size)
+        return digest
+
+    def path_for(self, digest, variant=None):
+        """Returns the file path of a poster, falling back to the original."""
+        if not DIGEST_PATTERN.match(digest or ""):
+            raise ValueError(f"Invalid poster digest: {digest!r}")
+        original = os.path.join(self.root, digest[:2], digest)
+        if variant is None:
+            return original
+        if variant not in self.variants:
+            raise ValueError(f"Unknown poster variant: {variant!r}")
+        return f"{original}.{variant}"
+
+    def existing_path_for(self, digest, variant=None):
+        """Returns the path of a stored poster variant or None if missing."""
+        for path in (self.path_for(digest, variant), self.path_for(digest)):
+            if os.path.exists(path):
+                return path
+        return None
+
+    def remove(self, poster_hashes):
+        """Deletes stored posters and their variants."""
+        for digest in poster_hashes:
+            try:
+                paths = [self.path_for(digest)]
+                paths += [self.path_for(digest, variant) for variant in self.variants]
+            except ValueError:
+                continue
+            for path in paths:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+    @staticmethod
+    def _write(path, content):
+        """Writes a file atomically; returns False if it could not be written."""
+        # Threads and worker processes may mirror the same poster at once.
+        temporary = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(temporary, "wb") as handle:
+                handle.write(content)
+            os.replace(temporary, path)
+            return True
+        except OSError as error:
+            print(f"Error writing poster {path}: {error}")
+            try:
+                os.remove(temporary)
+            except OSError:
+                pass
+            return False
+
+    def _write_variant(self, content, path, size):
+        if Image is None:
+            return
+        try:
+            with Image.open(io.BytesIO(content)) as image:
+                image = image.convert("RGB")
+                image.thumbnail(size)
+                buffer = io.BytesIO()
+                image.save(buffer, format="JPEG", quality=85, optimize=True)
+        except (OSError, ValueError) as error:
+            print(f"Error resizing poster: {error}")
+            return
+        self._write(path, buffer.getvalue())
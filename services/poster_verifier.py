@@ -0,0 +1,110 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app, url_for
+
+from services.assets import asset_url
+
+POSTER_OK = "ok"
+POSTER_BROKEN = "broken"
+FALLBACK_POSTER = "fallback_poster.jpeg"
+
+POSTER_WORKERS = int(os.getenv("POSTER_WORKERS", "4"))
+
+
+class PosterVerifier:
+    """
+    Background worker pool that checks poster URLs off the request path.
+
+    Each submitted URL is checked once with a cheap HEAD/ranged request and
+    the result is stored on every ``Movie`` row that uses it. Working
+    posters are copied into the poster mirror when one is configured. URLs
+    already queued or running are not submitted twice.
+
+    A poster whose last movie was deleted while it was being mirrored may
+    have its files removed before the new movie points at them, so the
+    mirror is checked again once the hash is stored.
+    """
+
+    def __init__(self, app, data_manager, client, mirror=None, max_workers=POSTER_WORKERS):
+        self.app = app
+        self.data_manager = data_manager
+        self.client = client
+        self.mirror = mirror
+        self._executor = ThreadPoolExecutor(max_workers=max_workers,
+                                            thread_name_prefix="poster-verifier")
+        self._in_flight = set()
+        self._lock = threading.Lock()
+
+    def submit(self, poster_url):
+        """Queues a poster URL for verification."""
+        if not poster_url:
+            return None
+        with self._lock:
+            if poster_url in self._in_flight:
+                return None
+            self._in_flight.add(poster_url)
+        return self._executor.submit(self._verify, poster_url)
+
+    def submit_pending(self, limit=100):
+        """
+        Queues every poster that has never been verified.
+
+        :param limit: Number of URLs read per query
+        """
+        return self._executor.submit(self._queue_pending, limit)
+
+    def shutdown(self, wait=True, cancel_pending=False):
+        """
+        Stops accepting work and optionally waits for queued checks.
+
+        :param cancel_pending: Drop checks that have not started; posters
+                               left unverified are queued again by the next
+                               submit_pending()
+        """
+        self._executor.shutdown(wait=wait, cancel_futures=cancel_pending)
+
+    def _queue_pending(self, limit):
+        after = None
+        while True:
+            with self.app.app_context():
+                poster_urls = self.data_manager.get_unverified_posters(limit, after=after)
+            for poster_url in poster_urls:
+                self.submit(poster_url)
+            if len(poster_urls) < limit:
+                return
+            after = poster_urls[-1]
+
+    def _verify(self, poster_url):
+        try:
+            status = POSTER_OK if self.client.url_available(poster_url) else POSTER_BROKEN
+            poster_hash = None
+            if status == POSTER_OK and self.mirror is not None:
+                poster_hash = self.mirror.mirror(poster_url)
+            with self.app.app_context():
+                self.data_manager.set_poster_status(poster_url, status, poster_hash)
+            if poster_hash and self.mirror.existing_path_for(poster_hash) is None:
+                self.mirror.mirror(poster_url)
+            return status
+        finally:
+            with self._lock:
+                self._in_flight.discard(poster_url)
+
+
+def poster_url(movie):
+    """
+    Returns the poster to display for a movie.
+
+    Prefers the grid-sized variant from the local mirror while its file
+    exists, then the remote URL, and falls back to the placeholder image
+    for missing or broken posters.
+    """
+    poster_hash = getattr(movie, 'poster_hash', None)
+    mirror = current_app.extensions.get('poster_mirror')
+    if poster_hash and mirror is not None and mirror.existing_path_for(poster_hash, 'thumb'):
+        return url_for('web.serve_poster', digest=poster_hash, variant='thumb')
+    poster = getattr(movie, 'poster', None)
+    if not poster or poster == 'N/A' or getattr(movie, 'poster_status', None) == POSTER_BROKEN:
+        return asset_url(FALLBACK_POSTER)
+    return poster
@@ -0,0 +1,319 @@
+import heapq
+import math
+import os
+import threading
+from collections import defaultdict
+
+RECOMMENDATION_NEIGHBORS = int(os.getenv("RECOMMENDATION_NEIGHBORS", "20"))
+RECOMMENDATION_LIMIT = 12
+RECOMMENDATION_FEED_INTERVAL = float(os.getenv("RECOMMENDATION_FEED_INTERVAL", "2"))
+# Co-raters at which a similarity counts half; pairs rated by few users
+# otherwise reach similarities near 1 by chance.
+SIMILARITY_SHRINKAGE = 10
+
+
+class RatingMatrix:
+    """
+    Sparse user x movie matrix of mean-centered ratings.
+
+    Stored twice, as rows (a user's ratings) and columns (a movie's
+    raters), so the similarities of one movie are computed from the rows
+    of its raters only. Centering on the user's mean compares taste
+    rather than how generously someone rates (adjusted cosine).
+
+    ``users`` maps a user id to a (row, mean) pair, so a reader always
+    gets a row together with the mean it was centered on.
+    """
+
+    def __init__(self):
+        self.users = {}
+        self.columns = {}
+        self.norms = {}
+
+    def set_user(self, user_id, rated):
+        """
+        Replaces a user's ratings.
+
+        The (row, mean) pair is replaced in one assignment rather than
+        changed in place, so readers see either the old pair or the new one.
+
+        :param rated: Dict of movie id to rating, empty to remove the user
+        :return: Set of movie ids whose column changed
+        """
+        old = self.row(user_id)
+        row = {}
+        if rated:
+            mean = sum(rated.values()) / len(rated)
+            row = {movie_id: rating - mean for movie_id, rating in rated.items()}
+            self.users[user_id] = (row, mean)
+        else:
+            self.users.pop(user_id, None)
+        changed = {movie_id for movie_id in old.keys() | row.keys()
+                   if old.get(movie_id) != row.get(movie_id)}
+        for movie_id in changed:
+            column = self.columns.setdefault(movie_id, {})
+            if movie_id in row:
+                column[user_id] = row[movie_id]
+            else:
+                column.pop(user_id, None)
+            norm = math.sqrt(sum(value * value for value in column.values()))
+            if norm:
+                self.norms[movie_id] = norm
+            else:
+                self.norms.pop(movie_id, None)
+            if not column:
+                del self.columns[movie_id]
+        return changed
+
+    def row(self, user_id):
+        """Returns a user's centered ratings, empty for unknown users."""
+        return self.users.get(user_id, ({}, None))[0]
+
+    def similarities(self, movie_id, shrinkage=SIMILARITY_SHRINKAGE):
+        """
+        Returns the positive similarities of a movie to every movie sharing a rater.
+
+        The dot products of the movie's column with all other columns are
+        accumulated in one pass over its raters' rows, the sparse
+        equivalent of one row of X^T X.
+
+        :return: Dict of movie id to similarity
+        """
+        norm = self.norms.get(movie_id)
+        if not norm:
+            return {}
+        dots = defaultdict(float)
+        overlap = defaultdict(int)
+        for user_id, value in self.columns[movie_id].items():
+            for other, other_value in self.row(user_id).items():
+                dots[other] += value * other_value
+                overlap[other] += 1
+        dots.pop(movie_id, None)
+        similarities = {}
+        for other, dot in dots.items():
+            other_norm = self.norms.get(other)
+            if dot > 0 and other_norm:
+                shared = overlap[other]
+                similarities[other] = dot / (norm * other_norm) * shared / (shared + shrinkage)
+        return similarities
+
+
+class RecommendationIndex:
+    """
+    Item-item recommendations answered from precomputed neighbor lists.
+
+    A background thread keeps the top ``neighbors`` most similar movies of
+    every movie. It builds them on start and, on "data_changed", reloads
+    only the changed users' ratings and recomputes the movies they touch;
+    other movies' lists are patched with the new similarities and only
+    recomputed when a neighbor got less similar. Requests then combine
+    the lists of the movies a user rated, without reading user_movies.
+
+    With several worker processes, each keeps its own index and ``feed``
+    (a coordination.ChangeFeed) brings in the users other processes
+    changed: the thread polls it every ``feed_interval`` seconds.
+
+    The thread is the only writer. Rows and neighbor lists are replaced,
+    never changed in place, so readers take no lock.
+    """
+
+    def __init__(self, app, data_manager, neighbors=RECOMMENDATION_NEIGHBORS,
+                 shrinkage=SIMILARITY_SHRINKAGE, feed=None,
+                 feed_interval=RECOMMENDATION_FEED_INTERVAL):
+        self.app = app
+        self.data_manager = data_manager
+        self.neighbors = neighbors
+        self.shrinkage = shrinkage
+        self.feed = feed
+        self.feed_interval = feed_interval
+        self.matrix = RatingMatrix()
+        self.similar = {}
+        self.ready = False
+        self.builds = 0
+        self.refreshes = 0
+        self._condition = threading.Condition()
+        self._rebuild = True
+        self._pending = set()
+        self._busy = False
+        self._stopped = False
+        self._thread = None
+
+    def start(self):
+        """Starts the thread that builds and refreshes the index."""
+        with self._condition:
+            if self._thread is None:
+                self._stopped = False
+                self._thread = threading.Thread(target=self._run, name="recommendations",
+                                                daemon=True)
+                self._thread.start()
+
+    def stop(self):
+        """Stops the thread after the current refresh."""
+        with self._condition:
+            self._stopped = True
+            self._condition.notify_all()
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            thread.join()
+
+    def data_changed(self, user_ids=None):
+        """
+        Queues the users whose ratings changed; "data_changed" subscriber.
+
+        Rating changes always name their users. None is sent for other
+        catalog changes, which leave the matrix as it is; users named for
+        changes that kept their ratings, such as poster checks, are
+        reloaded without touching the neighbor lists.
+        """
+        if not user_ids:
+            return
+        with self._condition:
+            self._pending.update(user_ids)
+            self._condition.notify_all()
+
+    def invalidate(self):
+        """Schedules a full rebuild, e.g. after ratings were changed outside the app."""
+        with self._condition:
+            self._rebuild = True
+            self._condition.notify_all()
+
+    def wait(self, timeout=None):
+        """
+        Waits until every queued change is in the index.
+
+        :return: False if the timeout expired first
+        """
+        with self._condition:
+            return self._condition.wait_for(
+                lambda: not (self._rebuild or self._pending or self._busy), timeout)
+
+    def recommend(self, user_id, limit=RECOMMENDATION_LIMIT):
+        """
+        Ranks movies the user has not rated by the ratings of their neighbors.
+
+        A candidate's score sums similarity times the user's centered
+        rating over the rated movies it neighbors, so movies close to
+        several liked ones come first.
+
+        :return: List of (movie id, predicted rating) pairs, best first;
+                 empty for users without ratings or before the first build
+        """
+        row, mean = self.matrix.users.get(user_id, ({}, None))
+        if not row:
+            return []
+        scores = defaultdict(float)
+        weights = defaultdict(float)
+        for movie_id, value in row.items():
+            for similarity, other in self.similar.get(movie_id, ()):
+                if other not in row:
+                    scores[other] += similarity * value
+                    weights[other] += similarity
+        ranked = heapq.nlargest(limit, scores, key=lambda movie_id: (scores[movie_id],
+                                                                    weights[movie_id]))
+        return [(movie_id, max(0.0, min(10.0, mean + scores[movie_id] / weights[movie_id])))
+                for movie_id in ranked]
+
+    def rebuild(self):
+        """Recomputes the whole index from every user's ratings."""
+        ratings = self.data_manager.get_ratings()
+        if ratings is None:
+            return
+        matrix = RatingMatrix()
+        for user_id, rated in ratings.items():
+            matrix.set_user(user_id, rated)
+        similar = {}
+        for movie_id in matrix.columns:
+            top = self._top(matrix.similarities(movie_id, self.shrinkage))
+            if top:
+                similar[movie_id] = top
+        self.matrix, self.similar = matrix, similar
+        self.ready = True
+        self.builds += 1
+
+    def refresh(self, user_ids):
+        """Reloads the ratings of some users and updates the neighbor lists they affect."""
+        ratings = self.data_manager.get_ratings(user_ids)
+        if ratings is None:
+            return
+        changed = set()
+        for user_id in user_ids:
+            changed |= self.matrix.set_user(user_id, ratings.get(user_id, {}))
+        if changed:
+            self._update_neighbors(changed)
+        self.refreshes += 1
+
+    def _top(self, similarities):
+        """Returns the most similar movies as (similarity, movie id) pairs, best first."""
+        return heapq.nlargest(self.neighbors, ((similarity, movie_id) for movie_id, similarity
+                                               in similarities.items()))
+
+    def _update_neighbors(self, changed):
+        fresh = {movie_id: self.matrix.similarities(movie_id, self.shrinkage)
+                 for movie_id in changed}
+        lists = {movie_id: self._top(similarities) for movie_id, similarities in fresh.items()}
+
+        candidates = defaultdict(list)
+        for movie_id, similarities in fresh.items():
+            for other, similarity in similarities.items():
+                if other not in changed:
+                    candidates[other].append((similarity, movie_id))
+        affected = set(candidates)
+        affected.update(movie_id for movie_id, neighbors in self.similar.items()
+                        if movie_id not in changed
+                        and any(other in changed for _, other in neighbors))
+
+        for movie_id in affected:
+            neighbors = self.similar.get(movie_id, [])
+            new = dict((other, similarity) for similarity, other in candidates.get(movie_id, ()))
+            # A neighbor that got less similar may now rank below a movie
+            # that was cut off, which only a full recompute finds.
+            if any(new.get(other, 0.0) < similarity
+                   for similarity, other in neighbors if other in changed):
+                lists[movie_id] = self._top(self.matrix.similarities(movie_id, self.shrinkage))
+                continue
+            kept = [(similarity, other) for similarity, other in neighbors if other not in changed]
+            lists[movie_id] = heapq.nlargest(self.neighbors, kept + [
+                (similarity, other) for other, similarity in new.items()])
+
+        for movie_id, top in lists.items():
+            if top:
+                self.similar[movie_id] = top
+            else:
+                self.similar.pop(movie_id, None)
+
+    def _poll_feed(self):
+        """Queues the changes other processes made; the first poll starts following the feed."""
+        user_ids = self.feed.poll()
+        with self._condition:
+            if user_ids is None:
+                self._rebuild = True
+            else:
+                self._pending.update(user_ids)
+
+    def _run(self):
+        timeout = self.feed_interval if self.feed is not None else None
+        while True:
+            if self.feed is not None:
+                self._poll_feed()
+            with self._condition:
+                self._condition.wait_for(
+                    lambda: self._rebuild or self._pending or self._stopped, timeout)
+                if self._stopped:
+                    return
+                if not (self._rebuild or self._pending):
+                    continue
+                rebuild, user_ids = self._rebuild, self._pending
+                self._rebuild, self._pending = False, set()
+                self._busy = True
+            try:
+                with self.app.app_context():
+                    if rebuild:
+                        self.rebuild()
+                    else:
+                        self.refresh(user_ids)
+            except Exception as error:
+                print(f"Error refreshing recommendations: {error}")
+            finally:
+                with self._condition:
+                    self._busy = False
+                    self._condition.notify_all()
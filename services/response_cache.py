@@ -0,0 +1,157 @@
+import hashlib
+import os
+import time
+from datetime import datetime, timezone
+from functools import wraps
+
+from flask import Response, current_app, make_response, request
+from markupsafe import Markup
+from werkzeug.http import is_resource_modified
+
+from services.omdb_cache import BASE_DIR, LRUCache, SQLiteCache
+
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "1024"))
+RESPONSE_CACHE_TTL = int(os.getenv("RESPONSE_CACHE_TTL", str(60 * 60)))
+RESPONSE_CACHE_PATH = os.getenv("RESPONSE_CACHE_PATH",
+                                os.path.join(BASE_DIR, "data", "response_cache.db"))
+
+# Version scopes. Pages listing users or movies depend on GLOBAL, a user's
+# collection on user_scope(user_id), and every cached entry on EPOCH,
+# which is bumped for changes that can show up anywhere (e.g. posters).
+EPOCH = "epoch"
+GLOBAL = "global"
+
+
+def user_scope(user_id):
+    """Returns the version scope of one user's pages."""
+    return f"user:{user_id}"
+
+
+def create_cache_backend(name, max_entries=RESPONSE_CACHE_SIZE, path=RESPONSE_CACHE_PATH):
+    """
+    Creates a response cache backend.
+
+    :param name: "memory" for an in-process LRU, "sqlite" for a file shared
+                 by every worker process on the host
+    :return: Object with get(key), set(key, value, ttl) and delete(key)
+    """
+    if name == "sqlite":
+        return SQLiteCache(path=path, table="response_cache")
+    return LRUCache(max_entries=max_entries)
+
+
+class ResponseCache:
+    """
+    Version-keyed cache for rendered pages and template fragments.
+
+    Every scope has a version token that is part of the cache keys and
+    ETags of the pages depending on it. Writes replace the token instead
+    of deleting entries: stale entries are never looked up again, and are
+    evicted by the LRU backend or deleted from the SQLite one by the
+    CachePurger once their TTL has passed. Tokens are nanosecond
+    timestamps, so they also give pages their Last-Modified date, and a
+    token lost to eviction is replaced by a newer one rather than reused.
+    """
+
+    def __init__(self, backend=None, ttl=RESPONSE_CACHE_TTL):
+        self.backend = backend if backend is not None else LRUCache(RESPONSE_CACHE_SIZE)
+        self.ttl = ttl
+
+    def version(self, scope):
+        """Returns the current version token of a scope."""
+        token = self.backend.get(f"version:{scope}")
+        if token is None:
+            token = self.bump(scope)
+        return token
+
+    def bump(self, scope):
+        """Invalidates everything cached under a scope."""
+        token = str(time.time_ns())
+        # Versions outlive the entries that use them.
+        self.backend.set(f"version:{scope}", token, self.ttl * 2)
+        return token
+
+    def data_changed(self, user_ids=None):
+        """
+        "data_changed" subscriber.
+
+        :param user_ids: IDs of the users whose pages changed, None if any
+                         page may have changed
+        """
+        if user_ids is None:
+            self.bump(EPOCH)
+            return
+        self.bump(GLOBAL)
+        for user_id in user_ids:
+            self.bump(user_scope(user_id))
+
+    def cached(self, scopes):
+        """
+        Decorator caching a GET view's 200 responses and answering
+        conditional requests with 304 before the view runs.
+
+        :param scopes: Callable receiving the view arguments and returning
+                       the version scopes the page depends on
+        """
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                return self.respond(view, scopes, *args, **kwargs)
+            return wrapper
+        return decorator
+
+    def respond(self, view, scopes, *args, **kwargs):
+        """Answers a request for a view from the cache, calling it on a miss; see cached()."""
+        if request.method != "GET":
+            return view(*args, **kwargs)
+        versions = [self.version(scope) for scope in [EPOCH, *scopes(**kwargs)]]
+        key = f"page:{request.full_path}:{':'.join(versions)}"
+        etag = hashlib.sha1(key.encode()).hexdigest()
+        last_modified = datetime.fromtimestamp(
+            max(int(version) for version in versions) // 10 ** 9, timezone.utc)
+        if not is_resource_modified(request.environ, etag=etag,
+                                    last_modified=last_modified):
+            response = Response(status=304)
+        else:
+            page = self.backend.get(key)
+            if page is None:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+                page = {'body': response.get_data(as_text=True),
+                        'mimetype': response.mimetype}
+                self.backend.set(key, page, self.ttl)
+            response = Response(page['body'], mimetype=page['mimetype'])
+        response.set_etag(etag)
+        response.last_modified = last_modified
+        response.cache_control.no_cache = True
+        return response
+
+    def fragment(self, name, *parts, caller):
+        """
+        Jinja call block caching the rendered body under its key parts.
+
+        Usage: ``{% call cached_fragment('movie-card', movie.id, ...) %}``.
+        The parts must include every value the fragment renders that can
+        change; the epoch version is added automatically.
+        """
+        key = f"fragment:{name}:{self.version(EPOCH)}:" + ":".join(str(part) for part in parts)
+        html = self.backend.get(key)
+        if html is None:
+            html = str(caller())
+            self.backend.set(key, html, self.ttl)
+        return Markup(html)
+
+
+def cached(scopes):
+    """
+    ResponseCache.cached for views defined before their app exists: uses
+    the cache create_app stored in the current app's extensions.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            response_cache = current_app.extensions['response_cache']
+            return response_cache.respond(view, scopes, *args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,46 @@
+import io
+
+import pytest
+
+from services.bulk_import import _parse_row, import_watchlist, read_rows
+from tests.test_data_managers import omdb_movie
+
+
+@pytest.mark.parametrize("row, entry", [
+    ({'user': " alice ", 'title': "Heat ", 'rating': "8,5"},
+     {'user': "alice", 'title': "Heat", 'rating': 8.5}),
+    ({'user': "alice", 'title': 1917, 'rating': 9}, {'user': "alice", 'title': "1917", 'rating': 9.0}),
+    ({'user': "alice", 'title': "Heat", 'rating': ""}, {'user': "alice", 'title': "Heat", 'rating': None}),
+])
+def test_valid_rows_are_normalized(row, entry):
+    assert _parse_row(row) == (entry, None)
+
+
+@pytest.mark.parametrize("row, error", [
+    (None, "Malformed row"),
+    ({'user': "alice"}, "user and title are required"),
+    ({'user': "alice", 'title': ["Heat"]}, "user and title must be text"),
+    ({'user': True, 'title': "Heat"}, "user and title must be text"),
+    ({'user': {'name': "alice"}, 'title': "Heat"}, "user and title must be text"),
+    ({'user': "alice", 'title': "Heat", 'rating': "great"}, "Invalid rating: great"),
+    ({'user': "alice", 'title': "Heat", 'rating': 11}, "Rating must be between 0 and 10"),
+])
+def test_invalid_rows_are_reported(row, error):
+    assert _parse_row(row) == (None, error)
+
+
+def test_jsonl_lines_that_are_not_objects_are_malformed():
+    stream = io.StringIO('{"user": "a", "title": "Heat"}\n[1, 2]\nnot json\n\n"text"\n')
+    assert [row for _, row in read_rows(stream, "jsonl")] == [
+        {'user': "a", 'title': "Heat"}, None, None, None]
+
+
+def test_bad_rows_fail_alone(data_manager):
+    stream = io.StringIO('{"user": "a", "title": 1917}\n'
+                         '{"user": "a", "title": {"name": "Heat"}}\n'
+                         '{"user": "b", "title": "Heat", "rating": 7}\n')
+    report = import_watchlist(stream, "jsonl", data_manager,
+                              fetch=lambda title: omdb_movie(title, "2019"), concurrency=1)
+    assert report.to_dict()['errors'] == [{'line': 2, 'error': "user and title must be text"}]
+    assert report.imported == 2
+    assert sorted(movie.title for movie in data_manager.get_all_movies()) == ["1917", "Heat"]
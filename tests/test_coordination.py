@@ -0,0 +1,80 @@
+"""
+Coordination of the worker processes gunicorn runs: each test uses two
+instances on the same files, standing in for two processes.
+"""
+import time
+
+from app import create_app, shutdown_app
+from services.coordination import ChangeFeed, DailyBudget, LeaderLock
+
+
+def test_one_process_holds_the_leader_lock(tmp_path):
+    path = str(tmp_path / "coordination.db.lock")
+    first, second = LeaderLock(path), LeaderLock(path, interval=0.01)
+    started = []
+    first.run_when_leader(lambda: started.append("first"))
+    second.run_when_leader(lambda: started.append("second"))
+    assert started == ["first"]
+    first.release()
+    deadline = time.monotonic() + 5
+    while started == ["first"] and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert started == ["first", "second"]
+    second.release()
+
+
+def test_processes_share_the_daily_budget(tmp_path):
+    path = str(tmp_path / "coordination.db")
+    first, second = DailyBudget(5, path), DailyBudget(5, path)
+    assert first.take(3) == 3
+    assert second.take(3) == 2
+    assert first.take() == 0
+    assert (first.remaining(), second.used()) == (0, 5)
+
+
+def test_change_feed_brings_in_other_processes_changes(tmp_path):
+    path = str(tmp_path / "coordination.db")
+    first, second = ChangeFeed(path), ChangeFeed(path)
+    assert first.poll() == set() and second.poll() == set()
+    first.publish({1, 2})
+    second.publish({3})
+    assert second.poll() == {1, 2}
+    assert first.poll() == {3}
+    assert first.poll() == set()
+
+
+def test_change_feed_reports_changes_deleted_before_they_were_read(tmp_path):
+    path = str(tmp_path / "coordination.db")
+    reader, writer = ChangeFeed(path), ChangeFeed(path, retention=0)
+    reader.poll()
+    writer.publish({1})
+    time.sleep(0.01)
+    writer.publish({2})
+    assert reader.poll() is None
+
+
+def test_recommendations_follow_rating_changes_of_other_processes(tmp_path):
+    config = {'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'movies.db'}",
+              'DATA_MANAGER_BACKEND': "sqlite", 'BACKGROUND_WORKERS': False,
+              'COORDINATION_BACKEND': "sqlite",
+              'COORDINATION_PATH': str(tmp_path / "coordination.db"),
+              'RECOMMENDATION_FEED_INTERVAL': 0.01}
+    writer, reader = create_app(config), create_app(config)
+    recommendations = reader.extensions['recommendations']
+    recommendations.start()
+    try:
+        assert recommendations.wait(5)
+        data_manager = writer.extensions['data_manager']
+        with writer.app_context():
+            data_manager.import_watchlist_chunk([
+                {'line': 1, 'user': "alice", 'title': "Heat", 'rating': 8,
+                 'movie': {'Title': "Heat", 'Director': "Michael Mann", 'Year': "1995",
+                           'imdbRating': "8.3", 'Poster': "N/A", 'imdbID': "tt0113277"}}])
+            user_id = data_manager.get_user_by_name("alice").id
+        deadline = time.monotonic() + 5
+        while user_id not in recommendations.matrix.users and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert user_id in recommendations.matrix.users
+    finally:
+        shutdown_app(reader)
+        shutdown_app(writer)
@@ -0,0 +1,272 @@
+"""
+Contract tests run against every data manager backend: they must agree
+on results, errors and events.
+"""
+import base64
+import json
+import threading
+from datetime import datetime, timezone
+
+import pytest
+
+from datamanager.pagination import decode_cursor
+
+
+def omdb_movie(title, year="2000", imdb_id=None, rating="7.0", poster=None):
+    """Returns a movie in the OMDb result format."""
+    return {'Title': title, 'Director': "Director", 'Year': year, 'imdbRating': rating,
+            'Poster': poster or "N/A", 'imdbID': imdb_id, 'Genre': "Drama",
+            'Runtime': "100 min", 'Plot': "Plot"}
+
+
+def cursor(position):
+    """Encodes an arbitrary cursor position, like a crafted request would."""
+    return base64.urlsafe_b64encode(json.dumps(position).encode()).decode()
+
+
+def collection_titles(data_manager, user_id):
+    return sorted(link.movie.title for link in data_manager.get_user_movies(user_id))
+
+
+def test_add_user_rejects_duplicate_names(data_manager):
+    user = data_manager.add_user("alice")
+    assert user.id
+    assert data_manager.add_user("alice") is None
+    assert data_manager.get_user_by_name("alice").id == user.id
+    assert data_manager.get_user_by_name("nobody") == "Error"
+
+
+def test_add_movie_returns_the_linked_movie_id(data_manager):
+    alice = data_manager.add_user("alice")
+    bob = data_manager.add_user("bob")
+    movie_id, error = data_manager.add_movie(omdb_movie("Heat", "1995", "tt0113277"), alice.id)
+    assert error is None
+    assert data_manager.get_movie(movie_id).title == "Heat"
+    assert data_manager.add_movie(omdb_movie("Heat", "1995", "tt0113277"), alice.id) == (
+        None, "Movie already exists")
+    assert data_manager.add_movie(omdb_movie("HEAT!", "1995", "tt0113277"), bob.id) == (
+        movie_id, None)
+    assert len(data_manager.get_all_movies()) == 1
+
+
+def test_remakes_sharing_a_title_stay_separate(data_manager):
+    user = data_manager.add_user("alice")
+    first, _ = data_manager.add_movie(omdb_movie("Dune", "1984", "tt0087182"), user.id)
+    second, _ = data_manager.add_movie(omdb_movie("Dune", "2021", "tt1160419"), user.id)
+    assert first != second
+    assert data_manager.find_movie(omdb_movie("Dune", "2021", "tt1160419")).id == second
+    assert data_manager.find_movie({'imdbID': "tt0087182"}).id == first
+    assert data_manager.find_movie({'imdbID': "tt0000001"}) is None
+
+
+
+def test_title_lookup_picks_the_release_by_year(data_manager):
+    user = data_manager.add_user("alice")
+    first, _ = data_manager.add_movie(omdb_movie("Dune", "1984", "tt0087182"), user.id)
+    second, _ = data_manager.add_movie(omdb_movie("Dune", "2021", "tt1160419"), user.id)
+    assert data_manager.find_movie_by_title("dune", 1984).id == first
+    assert data_manager.find_movie_by_title("Dune", 2021).id == second
+    assert data_manager.find_movie_by_title("Dune").id == second
+    assert data_manager.find_movie_by_title("Dune", 2000) is None
+    assert data_manager.find_movie_by_title("Arrival") is None
+
+def test_titles_match_ignoring_case_and_punctuation(data_manager):
+    user = data_manager.add_user("alice")
+    movie_id, _ = data_manager.add_movie(omdb_movie("Schindler's List", "1993"), user.id)
+    titles = ["schindlers list", "SCHINDLER’S LIST", "Schindler's List!", "Other"]
+    assert data_manager.get_movies_by_titles(titles) == {title: movie_id
+                                                         for title in titles[:3]}
+
+
+def test_ratings_update_the_leaderboard(data_manager):
+    alice = data_manager.add_user("alice")
+    bob = data_manager.add_user("bob")
+    heat, _ = data_manager.add_movie(omdb_movie("Heat", rating="8.0"), alice.id)
+    data_manager.add_movie(omdb_movie("Heat", rating="8.0"), bob.id)
+    up, _ = data_manager.add_movie(omdb_movie("Up", rating="6.0"), bob.id)
+    data_manager.update_movie(data_manager.get_user_movie(bob.id, heat), 4.0)
+    leaderboard = data_manager.get_top_movies_page("user_rating").items
+    assert [(movie.id, movie.rating_stats.rating_mean) for movie in leaderboard] == [
+        (up, 6.0), (heat, 6.0)]
+    assert data_manager.get_ratings([bob.id]) == {bob.id: {heat: 4.0, up: 6.0}}
+
+
+@pytest.mark.parametrize("sort", ["title", "year", "rating", "recent"])
+def test_pages_walk_every_movie_once(data_manager, sort):
+    user = data_manager.add_user("alice")
+    for number in range(7):
+        data_manager.add_movie(omdb_movie(f"Movie {number % 3}", str(1990 + number % 2),
+                                          f"tt{number:07d}", rating=str(5 + number % 4)),
+                               user.id)
+    seen = []
+    page = data_manager.get_movies_page(sort, limit=3)
+    while True:
+        seen += [movie.id for movie in page.items]
+        if page.next_cursor is None:
+            break
+        page = data_manager.get_movies_page(sort, after=page.next_cursor, limit=3)
+    assert sorted(seen) == sorted(movie.id for movie in data_manager.get_all_movies())
+    previous = data_manager.get_movies_page(sort, before=page.prev_cursor, limit=3)
+    assert [movie.id for movie in previous.items] == seen[-len(page.items) - 3:-len(page.items)]
+
+
+@pytest.mark.parametrize("position", [["Heat", "1"], [["Heat"], 1], ["Heat", True], ["Heat"],
+                                      "Heat", None])
+def test_crafted_cursors_start_from_the_first_page(data_manager, position):
+    user = data_manager.add_user("alice")
+    for title in ("Alien", "Brazil", "Heat"):
+        data_manager.add_movie(omdb_movie(title), user.id)
+    token = cursor(position)
+    assert decode_cursor(token) is None
+    for page in (data_manager.get_movies_page("title", after=token),
+                 data_manager.get_users_page("name", before=token),
+                 data_manager.get_user_movies_page(user.id, "title", after=token)):
+        assert page.prev_cursor is None
+        assert len(page.items) in (1, 3)
+
+
+def test_failed_write_rolls_back_the_transaction(data_manager, events):
+    alice = data_manager.add_user("alice")
+    data_manager.add_movie(omdb_movie("Heat"), alice.id)
+    events.clear()
+    with data_manager.transaction():
+        bob = data_manager.add_user("bob")
+        data_manager.add_movie(omdb_movie("Up"), bob.id)
+        assert data_manager.add_movie(omdb_movie("Heat"), alice.id)[1] == "Movie already exists"
+    assert data_manager.get_user_by_name("bob") == "Error"
+    assert [movie.title for movie in data_manager.get_all_movies()] == ["Heat"]
+    assert events == []
+
+
+def test_exception_rolls_back_the_transaction(data_manager, events):
+    alice = data_manager.add_user("alice")
+    heat, _ = data_manager.add_movie(omdb_movie("Heat", rating="8.0"), alice.id)
+    events.clear()
+    with pytest.raises(RuntimeError):
+        with data_manager.transaction():
+            data_manager.update_movie(data_manager.get_user_movie(alice.id, heat), 2.0)
+            data_manager.delete_movie(alice.id, heat)
+            raise RuntimeError("abort")
+    assert [link.movie_rating for link in data_manager.get_user_movies(alice.id)] == [8.0]
+    assert data_manager.get_top_movies_page("most_rated").items[0].rating_stats.rating_count == 1
+    assert events == []
+
+
+def test_transaction_emits_coalesced_events_after_commit(data_manager, events):
+    with data_manager.transaction():
+        alice = data_manager.add_user("alice")
+        bob = data_manager.add_user("bob")
+        data_manager.add_movie(omdb_movie("Heat"), bob.id)
+        assert events == []
+    assert events == [("data_changed", {'user_ids': {alice.id, bob.id}})]
+
+
+def test_deleting_the_last_link_deletes_the_movie(data_manager, events):
+    alice = data_manager.add_user("alice")
+    bob = data_manager.add_user("bob")
+    heat, _ = data_manager.add_movie(omdb_movie("Heat", poster="http://posters/heat.jpg"),
+                                     alice.id)
+    data_manager.add_movie(omdb_movie("Heat"), bob.id)
+    data_manager.set_poster_status("http://posters/heat.jpg", "ok", "a" * 64)
+    events.clear()
+    assert data_manager.delete_movie(alice.id, heat).id == heat
+    assert data_manager.get_movie(heat) is not None
+    data_manager.delete_user(bob.id)
+    assert data_manager.get_movie(heat) is None
+    assert ("posters_released", {'poster_hashes': {"a" * 64}}) in events
+    assert data_manager.delete_movie(alice.id, heat) is None
+
+
+def test_deferred_orphan_gc_leaves_movies_to_the_sweep(make_data_manager):
+    data_manager = make_data_manager(ORPHAN_GC_MODE="deferred")
+    alice = data_manager.add_user("alice")
+    heat, _ = data_manager.add_movie(omdb_movie("Heat"), alice.id)
+    data_manager.add_movie(omdb_movie("Up"), alice.id)
+    data_manager.delete_movie(alice.id, heat)
+    data_manager.delete_user(alice.id)
+    assert len(data_manager.get_all_movies()) == 2
+    assert data_manager.sweep_orphans() == 2
+    assert data_manager.get_all_movies() == []
+
+
+def test_poster_checks_notify_the_owners(data_manager, events):
+    alice = data_manager.add_user("alice")
+    data_manager.add_user("bob")
+    for number in range(5):
+        data_manager.add_movie(omdb_movie(f"Movie {number}", poster=f"http://p/{number}.jpg"),
+                               alice.id)
+    first = data_manager.get_unverified_posters(limit=3)
+    rest = data_manager.get_unverified_posters(limit=3, after=first[-1])
+    assert first + rest == [f"http://p/{number}.jpg" for number in range(5)]
+    events.clear()
+    assert data_manager.set_poster_status("http://p/0.jpg", "broken") == 1
+    assert events == [("data_changed", {'user_ids': {alice.id}})]
+    assert "http://p/0.jpg" not in data_manager.get_unverified_posters()
+
+
+def test_import_chunk_creates_users_and_movies(data_manager):
+    errors = data_manager.import_watchlist_chunk([
+        {'line': 1, 'user': "alice", 'title': "Heat", 'rating': 9.0,
+         'movie': omdb_movie("Heat", imdb_id="tt0113277")},
+        {'line': 2, 'user': "bob", 'title': "heat", 'rating': None,
+         'movie': omdb_movie("Heat!", imdb_id="tt0113277", rating="8.3")},
+        {'line': 3, 'user': "alice", 'title': "HEAT", 'rating': 5.0,
+         'movie': omdb_movie("Heat", imdb_id="tt0113277")},
+    ])
+    assert errors == [(3, "Movie already exists")]
+    alice = data_manager.get_user_by_name("alice")
+    bob = data_manager.get_user_by_name("bob")
+    assert collection_titles(data_manager, alice.id) == ["Heat"]
+    # Unrated rows take the rating of the movie already in the catalog.
+    assert [link.movie_rating for link in data_manager.get_user_movies(bob.id)] == [7.0]
+    assert len(data_manager.get_all_movies()) == 1
+
+
+def test_records_use_the_same_fields(data_manager):
+    user = data_manager.add_user("alice")
+    movie_id, _ = data_manager.add_movie(omdb_movie("Heat", "1995", rating="8.3"), user.id)
+    assert data_manager.get_record("movies", movie_id, ["id", "title", "year"]) == {
+        'id': movie_id, 'title': "Heat", 'year': 1995}
+    assert list(data_manager.iter_records("user_movies", ["title", "rating"],
+                                          user_id=user.id)) == [{'id': 1, 'title': "Heat", 'rating': 8.3}]
+    with pytest.raises(ValueError):
+        data_manager.get_records("movies", ["password"])
+
+
+def test_search_records_return_the_requested_fields(data_manager):
+    user = data_manager.add_user("alice")
+    heat, _ = data_manager.add_movie(omdb_movie("Heat", "1995"), user.id)
+    data_manager.add_movie(omdb_movie("Heathers", "1988"), user.id)
+    data_manager.add_movie(omdb_movie("Alien", "1979"), user.id)
+    assert data_manager.search_records("heat 1995", ["title", "genre"]) == [
+        {'id': heat, 'title': "Heat", 'genre': "Drama"}]
+    assert [record['title'] for record in data_manager.search_records("hea")] == [
+        "Heat", "Heathers"]
+    with pytest.raises(ValueError):
+        data_manager.search_records("heat", ["password"])
+
+
+@pytest.mark.parametrize("backend", ["memory"])
+def test_background_reads_survive_concurrent_writes(data_manager):
+    user = data_manager.add_user("alice")
+    for number in range(2000):
+        data_manager.add_movie(omdb_movie(f"Movie {number}", poster=f"http://p/{number}.jpg"),
+                               user.id)
+    stop = threading.Event()
+
+    def write():
+        number = 2000
+        while not stop.is_set():
+            movie_id, _ = data_manager.add_movie(omdb_movie(f"Movie {number}"), user.id)
+            data_manager.delete_movie(user.id, movie_id)
+            number += 1
+    writer = threading.Thread(target=write)
+    writer.start()
+    try:
+        for _ in range(100):
+            data_manager.get_unverified_posters(limit=10)
+            data_manager.get_stale_movies(datetime.now(timezone.utc), limit=10)
+            data_manager.get_top_movies_page()
+    finally:
+        stop.set()
+        writer.join()
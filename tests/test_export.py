@@ -0,0 +1,70 @@
+"""
+Exports stream rows as they are sent, so a database error midway must
+abort the transfer instead of ending it like a complete file.
+"""
+import pytest
+from sqlalchemy.exc import OperationalError
+
+import datamanager.sqlalchemy_data_manager as sqlalchemy_data_manager
+from app import create_app, shutdown_app
+from datamanager.sqlalchemy_data_manager import SQLAlchemyDataManager
+from tests.test_data_managers import omdb_movie
+
+
+class InterruptedQuery:
+    """Iterates a query and interrupts its SQLite connection after some rows."""
+
+    def __init__(self, query, rows):
+        self.query = query
+        self.rows = rows
+
+    def __iter__(self):
+        for number, row in enumerate(self.query):
+            if number == self.rows:
+                self.query.session.connection().connection.dbapi_connection.interrupt()
+            yield row
+
+
+@pytest.fixture(params=["sqlite", "sqlalchemy"])
+def app(request, tmp_path, monkeypatch):
+    monkeypatch.setattr(sqlalchemy_data_manager, "EXPORT_BATCH", 5)
+    app = create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'movies.db'}",
+                      'DATA_MANAGER_BACKEND': request.param, 'BACKGROUND_WORKERS': False})
+    data_manager = app.extensions['data_manager']
+    with app.app_context():
+        user = data_manager.add_user("alice")
+        for number in range(40):
+            data_manager.add_movie(omdb_movie(f"Movie {number}", imdb_id=f"tt{number:07d}"),
+                                   user.id)
+    yield app
+    shutdown_app(app)
+
+
+@pytest.fixture
+def interrupted(monkeypatch):
+    """Makes every export query fail after its third row."""
+    stream_records = SQLAlchemyDataManager._stream_records
+    monkeypatch.setattr(SQLAlchemyDataManager, "_stream_records", staticmethod(
+        lambda resource, query: stream_records(resource, InterruptedQuery(query, 3))))
+
+
+def test_complete_exports_have_every_row(app):
+    response = app.test_client().get("/movies/export?format=jsonl")
+    assert response.status_code == 200
+    assert len(response.get_data().splitlines()) == 40
+
+
+@pytest.mark.parametrize("headers", [{}, {'Accept-Encoding': "gzip"}])
+def test_failing_export_aborts_the_download(app, interrupted, headers):
+    # The WSGI server sees the error and drops the connection before the
+    # final chunk, which clients report as an incomplete transfer.
+    with pytest.raises(OperationalError):
+        app.test_client().get("/movies/export?format=csv", headers=headers).get_data()
+
+
+def test_failing_export_command_leaves_no_file(app, interrupted, tmp_path):
+    output = tmp_path / "movies.csv.gz"
+    result = app.test_cli_runner().invoke(args=["export", "movies", "--output", str(output)])
+    assert result.exit_code == 1
+    assert "Export failed" in result.output
+    assert not output.exists()
@@ -0,0 +1,25 @@
+from datetime import datetime, timezone
+
+from flask import current_app
+
+from services.metadata_refresher import MetadataRefresher
+from tests.test_data_managers import omdb_movie
+from tests.test_omdb import NOT_FOUND, QUOTA, fake_client
+
+
+def stale_titles(data_manager, refreshed_before):
+    return sorted(movie.title for movie in data_manager.get_stale_movies(refreshed_before, 10))
+
+
+def test_api_errors_end_the_batch_without_marking_movies_refreshed(data_manager):
+    user = data_manager.add_user("alice")
+    for title in ("Alien", "Brazil", "Casino"):
+        data_manager.add_movie(omdb_movie(title), user.id)
+    client = fake_client(NOT_FOUND, QUOTA)
+    refresher = MetadataRefresher(current_app._get_current_object(), data_manager, client,
+                                  daily_budget=10, batch_size=10)
+    started = datetime.now(timezone.utc)
+    refresher.refresh_batch()
+    assert client.session.calls == 2
+    assert stale_titles(data_manager, started) == ["Brazil", "Casino"]
+    assert refresher.requests_today == 2
@@ -0,0 +1,30 @@
+from app import create_app, shutdown_app
+from services.metrics import MetricsRegistry
+
+
+def test_callback_counters_render_as_counters():
+    registry = MetricsRegistry()
+    hits = {'omdb': 3}
+    registry.counter_callback("cache_lookups_total", "Cache lookups.", ("cache",),
+                              lambda: dict(hits))
+    registry.gauge_callback("queue_size", "Queued jobs.", (), lambda: {(): 2})
+    assert registry.render().splitlines() == [
+        "# HELP cache_lookups_total Cache lookups.",
+        "# TYPE cache_lookups_total counter",
+        'cache_lookups_total{cache="omdb"} 3',
+        "# HELP queue_size Queued jobs.",
+        "# TYPE queue_size gauge",
+        "queue_size 2",
+    ]
+
+
+def test_cache_lookups_are_exported_as_counters(tmp_path):
+    app = create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'movies.db'}",
+                      'DATA_MANAGER_BACKEND': "memory", 'BACKGROUND_WORKERS': False})
+    try:
+        body = app.test_client().get("/metrics").get_data(as_text=True)
+    finally:
+        shutdown_app(app)
+    assert "# TYPE cache_lookups_total counter" in body
+    assert "# TYPE omdb_search_flights_total counter" in body
+    assert 'cache_lookups_total{cache="response",result="miss"}' in body
@@ -0,0 +1,38 @@
+from services.movie_lookup import lookup_movie
+from tests.test_data_managers import omdb_movie
+
+
+class FakeOmdb:
+    """Stands in for fetch_movie_data, recording the titles it was asked for."""
+
+    def __init__(self, movie):
+        self.movie = movie
+        self.calls = []
+
+    def __call__(self, title, year=None):
+        self.calls.append((title, year))
+        return self.movie
+
+
+def test_catalog_titles_skip_omdb(data_manager):
+    user = data_manager.add_user("alice")
+    data_manager.add_movie(omdb_movie("Dune", "1984", "tt0087182"), user.id)
+    fetch = FakeOmdb(None)
+    assert lookup_movie(data_manager, "dune", fetch=fetch)['imdbID'] == "tt0087182"
+    assert lookup_movie(data_manager, "Dune", fetch=fetch, year="1984")['Year'] == 1984
+    assert fetch.calls == []
+
+
+def test_remakes_missing_from_the_catalog_are_fetched(data_manager):
+    user = data_manager.add_user("alice")
+    data_manager.add_movie(omdb_movie("Dune", "1984", "tt0087182"), user.id)
+    fetch = FakeOmdb(omdb_movie("Dune", "2021", "tt1160419"))
+    assert lookup_movie(data_manager, "Dune", fetch=fetch, year="2021")['imdbID'] == "tt1160419"
+    assert fetch.calls == [("Dune", "2021")]
+
+
+def test_fetched_movies_already_in_the_catalog_are_shown_as_stored(data_manager):
+    user = data_manager.add_user("alice")
+    data_manager.add_movie(omdb_movie("Se7en", "1995", "tt0114369", rating="8.6"), user.id)
+    fetch = FakeOmdb(omdb_movie("Seven", "1995", "tt0114369", rating="9.9"))
+    assert lookup_movie(data_manager, "Seven", fetch=fetch)['Title'] == "Se7en"
@@ -0,0 +1,131 @@
+import time
+
+import pytest
+from requests.exceptions import ConnectionError
+
+import services.omdb_api as omdb_api
+from services.omdb_async import AsyncOmdbSearch
+from services.omdb_cache import LRUCache, OmdbCache, SQLiteCache
+from services.omdb_client import CircuitBreaker, CircuitOpenError, OmdbClient
+
+NOT_FOUND = {'Response': "False", 'Error': "Movie not found!"}
+QUOTA = {'Response': "False", 'Error': "Request limit reached!"}
+HEAT = {'Response': "True", 'Title': "Heat", 'Year': "1995", 'imdbID': "tt0113277"}
+
+
+class FakeResponse:
+    def __init__(self, body):
+        self.body = body
+
+    def raise_for_status(self):
+        if isinstance(self.body, Exception):
+            raise self.body
+
+    def json(self):
+        return self.body
+
+
+class FakeSession:
+    """Answers OMDb calls with queued bodies; exceptions are raised."""
+
+    def __init__(self, *bodies):
+        self.bodies = list(bodies)
+        self.calls = 0
+
+    def get(self, url, params=None, timeout=None):
+        self.calls += 1
+        return FakeResponse(self.bodies.pop(0))
+
+
+def fake_client(*bodies, failure_threshold=3):
+    client = OmdbClient(api_key="key", breaker=CircuitBreaker(failure_threshold, 60))
+    client.session = FakeSession(*bodies)
+    return client
+
+
+@pytest.fixture
+def omdb(monkeypatch, tmp_path):
+    """Points fetch_movie_data at a fresh cache; returns a function installing a client."""
+    cache = OmdbCache(LRUCache(), SQLiteCache(str(tmp_path / "omdb.db")))
+    monkeypatch.setattr(omdb_api, "omdb_cache", cache)
+
+    def install(*bodies):
+        client = fake_client(*bodies)
+        monkeypatch.setattr(omdb_api, "omdb_client", client)
+        return client
+    return install
+
+
+def test_circuit_opens_after_consecutive_failures_and_retries_after_the_timeout():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.05)
+    breaker.record_failure()
+    breaker.before_call()
+    breaker.record_failure()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    time.sleep(0.06)
+    breaker.before_call()
+    breaker.record_failure()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    time.sleep(0.06)
+    breaker.record_success()
+    breaker.record_failure()
+    breaker.before_call()
+
+
+def test_network_errors_and_api_errors_open_the_circuit():
+    client = fake_client(ConnectionError("down"), QUOTA, QUOTA, HEAT)
+    with pytest.raises(ConnectionError):
+        client.get_json(t="Heat")
+    assert client.get_json(t="Heat") == QUOTA
+    assert client.get_json(t="Heat") == QUOTA
+    with pytest.raises(CircuitOpenError):
+        client.get_json(t="Heat")
+    assert client.session.calls == 3
+
+
+def test_not_found_answers_keep_the_circuit_closed():
+    client = fake_client(NOT_FOUND, NOT_FOUND, NOT_FOUND, HEAT)
+    for _ in range(3):
+        assert client.get_json(t="Nope") == NOT_FOUND
+    assert client.get_json(t="Heat") == HEAT
+
+
+def test_not_found_answers_are_cached(omdb):
+    client = omdb(NOT_FOUND)
+    assert omdb_api.fetch_movie_data("Nope") == {'error': "Movie not found!"}
+    assert omdb_api.fetch_movie_data("nope!") == {'error': "Movie not found!"}
+    assert client.session.calls == 1
+
+
+def test_quota_errors_are_not_cached(omdb):
+    client = omdb(QUOTA, HEAT)
+    assert omdb_api.fetch_movie_data("Heat") == {'error': "Request limit reached!"}
+    assert omdb_api.fetch_movie_data("Heat")['imdbID'] == "tt0113277"
+    assert omdb_api.fetch_movie_data("Heat")['imdbID'] == "tt0113277"
+    assert client.session.calls == 2
+
+
+def test_persistent_hits_keep_their_expiry_in_memory(tmp_path):
+    persistent = SQLiteCache(str(tmp_path / "omdb.db"))
+    persistent.set("heat", {'Title': "Heat"}, 10)
+    cache = OmdbCache(LRUCache(), persistent, ttl=3600)
+    assert cache.get("Heat") == {'Title': "Heat"}
+    _, expires_at = cache.memory.get_entry("heat")
+    assert expires_at <= time.time() + 10
+
+
+def test_search_caches_details_but_not_api_errors():
+    client = fake_client({'Response': "True", 'Search': [{'imdbID': "tt0113277"}]},
+                         QUOTA, HEAT, NOT_FOUND)
+    search = AsyncOmdbSearch(client)
+    try:
+        assert search.search_sync("heat") == []
+        assert search.movie_sync("tt0113277")['Title'] == "Heat"
+        assert search.movie_sync("tt0113277")['Title'] == "Heat"
+        assert search.movie_sync("tt9999999") == {'error': "Movie not found!"}
+        assert search.movie_sync("tt9999999") == {'error': "Movie not found!"}
+    finally:
+        search.shutdown()
+    assert client.session.calls == 4
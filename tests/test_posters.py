@@ -0,0 +1,61 @@
+import pytest
+
+from app import create_app, shutdown_app
+from data_model import Movie
+from services.poster_mirror import PosterMirror
+from services.poster_verifier import PosterVerifier, poster_url
+from tests.test_data_managers import omdb_movie
+
+POSTER = "http://posters.example/heat.jpg"
+JPEG = b"\xff\xd8\xff" + b"poster" * 10
+
+
+class FakeClient:
+    def url_available(self, url):
+        return True
+
+    def download(self, url):
+        return JPEG, "image/jpeg"
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'movies.db'}",
+                      'DATA_MANAGER_BACKEND': "memory", 'BACKGROUND_WORKERS': False})
+    app.extensions['poster_mirror'] = PosterMirror(FakeClient(), root=str(tmp_path / "posters"))
+    yield app
+    shutdown_app(app)
+
+
+def test_posters_missing_from_the_mirror_use_the_remote_url(app):
+    mirror = app.extensions['poster_mirror']
+    digest = mirror.mirror(POSTER)
+    movie = Movie(title="Heat", poster=POSTER, poster_hash=digest)
+    with app.test_request_context():
+        assert poster_url(movie) == f"/posters/{digest}/thumb"
+        mirror.remove({digest})
+        assert poster_url(movie) == POSTER
+
+
+def test_posters_released_while_mirrored_are_written_again(app):
+    data_manager = app.extensions['data_manager']
+    mirror = app.extensions['poster_mirror']
+    mirror_poster = mirror.mirror
+
+    def mirror_then_release(url):
+        # The last movie using the poster is deleted right after the write.
+        digest = mirror_poster(url)
+        mirror.mirror = mirror_poster
+        mirror.remove({digest})
+        return digest
+    mirror.mirror = mirror_then_release
+
+    with app.app_context():
+        user = data_manager.add_user("alice")
+        movie_id, _ = data_manager.add_movie(omdb_movie("Heat", poster=POSTER), user.id)
+    verifier = PosterVerifier(app, data_manager, FakeClient(), mirror=mirror)
+    verifier.submit(POSTER).result()
+    verifier.shutdown()
+    with app.app_context():
+        digest = data_manager.get_movie(movie_id).poster_hash
+    assert digest and mirror.existing_path_for(digest)
@@ -0,0 +1,94 @@
+"""
+Statement budgets of the pages and API endpoints. Pages must load their
+rows with a fixed number of queries, however many rows they show, on the
+write engine and on the SQLite read-only engine alike.
+"""
+import pytest
+
+from app import create_app, shutdown_app
+from datamanager.query_counter import QueryCounter, assert_max_queries
+
+ROUTES = [
+    ("/users", 1),
+    ("/users/{user_id}", 2),
+    ("/users/{user_id}?sort=title", 2),
+    ("/users/{user_id}/update_movie/{movie_id}", 1),
+    ("/users/{user_id}/recommendations", 1),
+    ("/movies", 1),
+    ("/movies?sort=user_rating", 1),
+    ("/movies/top", 1),
+    ("/movies/search?q=movie", 1),
+    ("/api/v1/users", 1),
+    ("/api/v1/users/{user_id}/movies", 2),
+    ("/api/v1/movies", 1),
+    ("/api/v1/movies/{movie_id}", 1),
+    ("/api/v1/movies/search?q=movie", 1),
+    ("/api/v1/movies/search?q=movie&fields=title,genre", 1),
+]
+
+
+def watchlist(user, movies, first=0):
+    """Import rows adding movies first..first+movies-1 to a user's collection."""
+    return [{'line': number, 'user': user, 'title': f"Movie {number}", 'rating': number % 10,
+             'movie': {'Title': f"Movie {number}", 'Director': "Director",
+                       'Year': str(1950 + number), 'imdbRating': "7.0",
+                       'Poster': f"http://posters/{number}.jpg",
+                       'imdbID': f"tt{number:07d}"}}
+            for number in range(first, first + movies)]
+
+
+@pytest.fixture(params=["sqlite", "sqlalchemy"])
+def app(request, tmp_path):
+    app = create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'movies.db'}",
+                      'DATA_MANAGER_BACKEND': request.param, 'BACKGROUND_WORKERS': False})
+    data_manager = app.extensions['data_manager']
+    with app.app_context():
+        for user in range(4):
+            data_manager.import_watchlist_chunk(watchlist(f"user {user}", 30, user * 10))
+    yield app
+    shutdown_app(app)
+
+
+def engines(app):
+    with app.app_context():
+        return app.extensions['data_manager'].engines()
+
+
+def ids(app):
+    data_manager = app.extensions['data_manager']
+    with app.app_context():
+        user = data_manager.get_user_by_name("user 1")
+        return {'user_id': user.id, 'movie_id': data_manager.get_user_movies(user.id)[0].movie_id}
+
+
+@pytest.mark.parametrize("path, budget", ROUTES)
+def test_route_stays_within_its_query_budget(app, path, budget):
+    client, url = app.test_client(), path.format(**ids(app))
+    with assert_max_queries(budget, *engines(app)):
+        response = client.get(url)
+    assert response.status_code == 200
+
+
+def test_collection_queries_do_not_grow_with_its_size(app):
+    data_manager = app.extensions['data_manager']
+    with app.app_context():
+        data_manager.import_watchlist_chunk(watchlist("small", 2, 500))
+        small = data_manager.get_user_by_name("small").id
+        large = data_manager.get_user_by_name("user 3").id
+    client = app.test_client()
+    counts = []
+    for user_id in (small, large):
+        with QueryCounter(*engines(app)) as counter:
+            assert client.get(f"/users/{user_id}").status_code == 200
+        counts.append(counter.count)
+    assert counts[0] == counts[1], counts
+
+
+def test_sqlite_pages_read_through_the_read_only_engine(app):
+    if app.config['DATA_MANAGER_BACKEND'] != "sqlite":
+        pytest.skip("only the sqlite backend has a read-only engine")
+    write_engine, read_engine = engines(app)
+    client = app.test_client()
+    with QueryCounter(write_engine) as writes, QueryCounter(read_engine) as reads:
+        assert client.get("/movies").status_code == 200
+    assert (writes.count, reads.count) == (0, 1)
@@ -0,0 +1,37 @@
+import sys
+import threading
+
+from services.recommendations import RatingMatrix, RecommendationIndex
+
+
+def test_rows_are_centered_on_the_users_mean():
+    matrix = RatingMatrix()
+    matrix.set_user(1, {10: 8.0, 11: 6.0})
+    assert matrix.users[1] == ({10: 1.0, 11: -1.0}, 7.0)
+    assert matrix.set_user(1, {}) == {10, 11}
+    assert matrix.row(1) == {} and not matrix.columns
+
+
+def test_recommendations_read_while_ratings_change():
+    index = RecommendationIndex(app=None, data_manager=None)
+    index.similar = {10: [(0.9, 12)], 11: [(0.5, 12)]}
+    stop = threading.Event()
+
+    def refresh():
+        while not stop.is_set():
+            index.matrix.set_user(1, {10: 8.0, 11: 6.0})
+            index.matrix.set_user(1, {10: 2.0, 11: 4.0})
+            index.matrix.set_user(1, {})
+    switch_interval = sys.getswitchinterval()
+    # Switch threads often, so reads land between the writer's steps.
+    sys.setswitchinterval(1e-6)
+    writer = threading.Thread(target=refresh)
+    writer.start()
+    try:
+        for _ in range(200000):
+            for movie_id, rating in index.recommend(1):
+                assert movie_id == 12 and 0.0 <= rating <= 10.0
+    finally:
+        stop.set()
+        writer.join()
+        sys.setswitchinterval(switch_interval)
@@ -0,0 +1,447 @@
+import os
+import re
+
+import click
+from flask import (Blueprint, Response, abort, current_app, jsonify, redirect, render_template,
+                   request, send_file, stream_with_context, url_for)
+from sqlalchemy.exc import SQLAlchemyError
+
+from api import api_v1, http_error as api_http_error
+from datamanager.records import RESOURCES, resolve_fields
+from services.assets import asset_url
+from services.bulk_import import (import_watchlist, guess_format, open_text,
+                                  IMPORT_FORMATS, IMPORT_CHUNK_SIZE, IMPORT_CONCURRENCY)
+from services.compression import choose_encoding
+from services.export import EXPORT_FORMATS, EXPORT_MIMETYPES, encode_records, gzip_chunks
+from services.metrics import metrics, CONTENT_TYPE as METRICS_CONTENT_TYPE
+from services.movie_lookup import lookup_movie, lookup_movie_by_id
+from services.omdb_api import fetch_movie_data as fetch_from_api
+from services.poster_mirror import guess_mimetype
+from services.poster_verifier import FALLBACK_POSTER
+from services.response_cache import GLOBAL, cached, user_scope
+
+web = Blueprint('web', __name__, cli_group=None)
+
+IMDB_ID = re.compile(r"tt\d{7,10}")
+
+
+def _service(name):
+    """Returns a service create_app stored in the app's extensions."""
+    return current_app.extensions[name]
+
+
+def _data_manager():
+    return current_app.extensions['data_manager']
+
+
+def _export_records(resource, fields=None, user_id=None):
+    """
+    Returns the columns and streamed records of an export.
+
+    Collections start with a "user" column holding the user's name, so
+    the file can be imported again.
+
+    :return: (fields, iterator of dicts), None if the user is not found
+    :raises ValueError: For unknown field names
+    """
+    fields = resolve_fields(RESOURCES[resource], fields)
+    records = _data_manager().iter_records(resource, fields, user_id=user_id)
+    if records is None:
+        return None
+    if resource != 'user_movies':
+        return fields, records
+    name = _data_manager().get_record('users', user_id, ['id', 'name'])['name']
+    return ['user'] + fields, ({'user': name, **record} for record in records)
+
+
+def _export_response(name, resource, user_id=None):
+    """
+    Streams an export as a download in the format given by ?format=.
+
+    The body is generated while it is sent, gzip-encoded on the fly when
+    the client accepts it, so memory stays flat for any table size. A
+    database error midway aborts the connection, so the client sees a
+    truncated transfer rather than a complete-looking file.
+    """
+    fmt = request.args.get('format', 'csv')
+    if fmt not in EXPORT_FORMATS:
+        abort(400, description=f"Unsupported format: {fmt}")
+    fields = request.args.get('fields')
+    try:
+        export = _export_records(resource, fields.split(',') if fields else None, user_id)
+    except ValueError as error:
+        abort(400, description=str(error))
+    if export is None:
+        abort(404, description="User not found")
+    chunks = encode_records(export[1], fmt, export[0])
+    encoding = choose_encoding(request.accept_encodings, ("gzip",))
+    if encoding:
+        chunks = gzip_chunks(chunks)
+    response = Response(stream_with_context(chunks), mimetype=EXPORT_MIMETYPES[fmt])
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add("Accept-Encoding")
+    response.headers['Content-Disposition'] = f'attachment; filename="{name}.{fmt}"'
+    return response
+
+
+@web.route('/', methods=['GET', 'POST'])
+def home():
+    """Displays the homepage."""
+    return render_template("home.html")
+
+
+@web.route('/users')
+@cached(lambda: [GLOBAL])
+def list_users():
+    """Lists registered users, one page at a time."""
+    page = _data_manager().get_users_page(request.args.get('sort', 'name'),
+                                          after=request.args.get('after'),
+                                          before=request.args.get('before'))
+    return render_template('list_users.html', users=page.items, page=page)
+
+
+@web.route('/users/<int:user_id>', methods=["GET"])
+@cached(lambda user_id: [user_scope(user_id)])
+def list_user_movies(user_id):
+    """
+       Displays and manages a specific user's movie collection.
+       Allows adding, rating, and deleting movies for a given user.
+    """
+    page = _data_manager().get_user_movies_page(user_id, request.args.get('sort', 'recent'),
+                                                after=request.args.get('after'),
+                                                before=request.args.get('before'))
+    if page is None:
+        abort(404, description="User not found")
+
+    return render_template("user_movies.html",
+                           user_id=user_id,
+                           user_movies=page.items,
+                           page=page)
+
+
+@web.route('/users/<int:user_id>/recommendations')
+def user_recommendations(user_id):
+    """Suggests movies similar to the ones the user rated highly."""
+    user = _data_manager().get_record('users', user_id, ['id', 'name'])
+    if user is None:
+        abort(404, description="User not found")
+    recommendations = _service('recommendations')
+    ranked = recommendations.recommend(user_id)
+    movies = _data_manager().get_movies_by_ids(movie_id for movie_id, _ in ranked)
+    suggestions = [(movies[movie_id], predicted) for movie_id, predicted in ranked
+                   if movie_id in movies]
+    return render_template('recommendations.html', user=user, suggestions=suggestions,
+                           ready=recommendations.ready)
+
+
+@web.route('/users/<int:user_id>/export')
+def export_user_movies(user_id):
+    """Downloads a user's collection as CSV or JSON Lines."""
+    return _export_response(f"collection-{user_id}", 'user_movies', user_id)
+
+
+@web.route('/users/add', methods=['GET', 'POST'])
+def add_user():
+    """Allows a new user to be added."""
+    if request.method == 'POST':
+        username = request.form.get('name')
+        if not username:
+            return render_template('add_user.html',
+                                   error='Username is required')
+
+        result = _data_manager().add_user(username)
+        if not result:
+            return render_template('add_user.html',
+                                   error='Failed to add user (maybe duplicate?)')
+
+        return render_template('add_user.html',
+                               message=f'User added successfully')
+
+    return render_template('add_user.html')
+
+
+@web.route('/users/<int:user_id>/update_movie/<int:movie_id>', methods=['GET', 'POST'])
+def update_movie(user_id, movie_id):
+    """
+      Updates the rating of a specific movie.
+      Displays current data and accepts new rating via form.
+    """
+    movie = _data_manager().get_user_movie(user_id, movie_id)
+    if not movie:
+        abort(404, description="Movie not found")
+
+    if request.method == 'POST':
+        rating = request.form.get('rating')
+        if not rating:
+            return render_template('update_movie.html', movie=movie,
+                                   user_id=user_id)
+        rating_str = rating.replace(',', '.')
+
+        try:
+            rating_float = float(rating_str)
+            if not 0.0 < rating_float < 10.0:
+                return render_template('update_movie.html', movie=movie,
+                                       error="Rating must be between 0 and 10", user_id=user_id)
+        except (ValueError, TypeError):
+            return render_template('update_movie.html', movie=movie,
+                                   error="Please enter a valid rating between 0 and 10.",
+                                   user_id=user_id)
+
+        result = _data_manager().update_movie(movie, rating_float)
+        if not result:
+            if not result:
+                return render_template("update_movie.html", movie=movie,
+                                       error="No update was made", user_id=user_id)
+
+    return render_template('update_movie.html', movie=movie, user_id=user_id)
+
+
+@web.route('/users/delete/<int:user_id>', methods=['POST'])
+def delete_user(user_id):
+    """delete a user in the database."""
+    _data_manager().delete_user(user_id)
+    return redirect(url_for('web.list_users'))
+
+
+@web.route('/movies')
+@cached(lambda: [GLOBAL])
+def list_movies():
+    """Lists movies in the database, one page at a time."""
+    page = _data_manager().get_movies_page(request.args.get('sort', 'title'),
+                                           after=request.args.get('after'),
+                                           before=request.args.get('before'))
+    return render_template('list_movies.html', movies=page.items, page=page)
+
+
+@web.route('/movies/top')
+@cached(lambda: [GLOBAL])
+def top_movies():
+    """Ranks movies by their users' ratings."""
+    page = _data_manager().get_top_movies_page(
+        request.args.get('sort', 'user_rating'),
+        min_ratings=current_app.config.setdefault('LEADERBOARD_MIN_RATINGS', 1),
+        after=request.args.get('after'), before=request.args.get('before'))
+    return render_template('top_movies.html', movies=page.items, page=page)
+
+
+@web.route('/movies/search')
+def search_movies():
+    """Searches the local movie catalog."""
+    query = request.args.get('q', '').strip()
+    movies = _data_manager().search_movies(query) if query else []
+    return render_template('list_movies.html', movies=movies, page=None, query=query)
+
+
+@web.route('/movies/export')
+def export_movies():
+    """Downloads the movie catalog as CSV or JSON Lines."""
+    return _export_response("movies", 'movies')
+
+
+@web.route('/movies/suggest')
+def suggest_movies():
+    """Returns OMDb search suggestions for the type-ahead as JSON."""
+    query = request.args.get('q', '').strip()
+    if len(query) < current_app.config.setdefault('SUGGEST_MIN_LENGTH', 3):
+        return jsonify([])
+    movies = _service('omdb_search').search_sync(query)
+    response = jsonify(movies)
+    response.cache_control.public = True
+    response.cache_control.max_age = 300
+    return response
+
+
+@web.route('/users/<int:user_id>/add_movie', methods=["GET", "POST"])
+def add_movie(user_id):
+    """add a movie in the database."""
+    if request.method == 'POST':
+        movie_title = request.form.get('Title')
+        if movie_title:
+            imdb_id = request.form.get('imdbID', '').strip()
+            if IMDB_ID.fullmatch(imdb_id):
+                # Picked from the suggestions, whose details are cached.
+                movie = lookup_movie_by_id(_data_manager(), imdb_id,
+                                           fetch=_service('omdb_search').movie_sync)
+            else:
+                movie = lookup_movie(_data_manager(), movie_title, fetch=fetch_from_api,
+                                     year=request.form.get('Year', '').strip() or None)
+            if not movie:
+                return render_template('add_movie.html',
+                                       error="Error fetching data", user_id=user_id)
+            if 'error' in movie:
+                return render_template('add_movie.html',
+                                       error=movie['error'], user_id=user_id)
+            return render_template('add_movie.html', movie=movie,
+                                   token=_service('movie_staging').stage(user_id, movie),
+                                   fallback_poster=asset_url(FALLBACK_POSTER), user_id=user_id)
+
+        token = request.form.get("movie_token")
+        if token is not None:
+            movie_staging = _service('movie_staging')
+            staged = movie_staging.get(user_id, token)
+            if staged is None:
+                return render_template('add_movie.html',
+                                       error="This search has expired, please search again",
+                                       user_id=user_id)
+            movie_data = staged['movie']
+            if not staged['confirmed']:
+                _, error = _data_manager().add_movie(movie_data, user_id)
+                if error:
+                    return render_template('add_movie.html', error=error,
+                                           user_id=user_id)
+                movie_staging.confirm(token, staged)
+                _service('poster_verifier').submit(movie_data.get('Poster'))
+            return render_template('add_movie.html',
+                                   error=f"{movie_data.get('Title')} added successfully",
+                                   user_id=user_id)
+    return render_template('add_movie.html', user_id=user_id)
+
+
+@web.route('/users/<int:user_id>/delete_movie/<int:movie_id>', methods=['POST'])
+def delete_movie(user_id, movie_id):
+    """Deletes a movie from a user's collection."""
+    _data_manager().delete_movie(user_id, movie_id)
+    return redirect(url_for('web.list_user_movies', user_id=user_id))
+
+
+@web.route('/import', methods=['POST'])
+def bulk_import():
+    """
+    Imports users and watchlists from an uploaded CSV or JSON Lines file.
+    Returns a JSON report with per-row errors.
+    """
+    upload = request.files.get('file')
+    if not upload:
+        abort(400, description="A file upload named 'file' is required")
+    fmt = request.form.get('format') or guess_format(upload.filename)
+    if fmt not in IMPORT_FORMATS:
+        abort(400, description=f"Unsupported format: {fmt}")
+
+    report = import_watchlist(open_text(upload.stream), fmt, _data_manager(),
+                              fetch_from_api)
+    _service('poster_verifier').submit_pending()
+    return jsonify(report.to_dict())
+
+
+@web.cli.command('import-watchlist')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'fmt', type=click.Choice(IMPORT_FORMATS), default=None,
+              help="Input format, guessed from the file name by default.")
+@click.option('--chunk-size', default=IMPORT_CHUNK_SIZE, show_default=True)
+@click.option('--concurrency', default=IMPORT_CONCURRENCY, show_default=True,
+              help="Maximum concurrent OMDb lookups.")
+def import_watchlist_command(path, fmt, chunk_size, concurrency):
+    """Imports users and watchlists from a CSV or JSON Lines file."""
+    def progress(report):
+        click.echo(f"{report.rows} rows read, {report.imported} imported, "
+                   f"{len(report.errors)} failed")
+
+    with open(path, encoding="utf-8-sig", newline="") as stream:
+        report = import_watchlist(stream, fmt or guess_format(path), _data_manager(),
+                                  fetch_from_api, chunk_size=chunk_size,
+                                  concurrency=concurrency, progress=progress)
+    for line, message in report.errors:
+        click.echo(f"line {line}: {message}", err=True)
+    poster_verifier = _service('poster_verifier')
+    poster_verifier.submit_pending()
+    poster_verifier.shutdown()
+
+
+@web.cli.command('sweep-orphans')
+def sweep_orphans_command():
+    """Deletes movies that no user has in their collection."""
+    click.echo(f"{_service('orphan_collector').sweep()} orphaned movies deleted")
+
+
+@web.cli.command('export')
+@click.argument('what', type=click.Choice(['movies', 'collection']))
+@click.option('--user-id', type=int, help="User whose collection to export.")
+@click.option('--format', 'fmt', type=click.Choice(EXPORT_FORMATS), default="csv",
+              show_default=True)
+@click.option('--output', '-o', default="-", type=click.Path(dir_okay=False, allow_dash=True),
+              help="File to write, standard output by default. Names ending in .gz "
+                   "are gzip-compressed.")
+def export_command(what, user_id, fmt, output):
+    """Streams the movie catalog or a user's collection as CSV or JSON Lines."""
+    if what == 'collection' and user_id is None:
+        raise click.UsageError("collection exports need --user-id")
+    export = _export_records('movies' if what == 'movies' else 'user_movies', user_id=user_id)
+    if export is None:
+        raise click.ClickException(f"User {user_id} not found")
+    chunks = encode_records(export[1], fmt, export[0])
+    try:
+        if output == "-":
+            for chunk in chunks:
+                click.echo(chunk, nl=False)
+        elif output.endswith(".gz"):
+            with open(output, "wb") as stream:
+                for data in gzip_chunks(chunks):
+                    stream.write(data)
+        else:
+            with open(output, "w", encoding="utf-8", newline="") as stream:
+                for chunk in chunks:
+                    stream.write(chunk)
+    except SQLAlchemyError as error:
+        if output != "-":
+            os.remove(output)
+        raise click.ClickException(f"Export failed, no complete file was written: {error}")
+
+
+@web.route('/posters/<digest>', defaults={'variant': None})
+@web.route('/posters/<digest>/<variant>')
+def serve_poster(digest, variant):
+    """Serves a mirrored poster with immutable cache headers."""
+    try:
+        path = _service('poster_mirror').existing_path_for(digest, variant)
+    except ValueError:
+        path = None
+    if not path:
+        abort(404, description="Poster not found")
+
+    with open(path, 'rb') as handle:
+        mimetype = guess_mimetype(handle.read(12))
+    response = send_file(path, mimetype=mimetype, conditional=True, max_age=31536000,
+                         etag=f"{digest}-{variant or 'original'}")
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+
+@web.route('/healthz')
+def health():
+    """Liveness probe: the worker is up and serving requests."""
+    return jsonify(status="ok")
+
+
+@web.route('/readyz')
+def readiness():
+    """
+    Readiness probe: 503 until the app finished starting, once it began
+    shutting down, or while the database does not answer.
+    """
+    if not current_app.extensions.get('ready') or not _data_manager().ping():
+        response = jsonify(status="unavailable")
+        response.status_code = 503
+        return response
+    return jsonify(status="ready")
+
+
+@web.route('/metrics')
+def metrics_endpoint():
+    """Exposes the collected metrics in Prometheus text format."""
+    return Response(metrics.render(), content_type=METRICS_CONTENT_TYPE)
+
+
+@web.app_errorhandler(400)
+def bad_request(error):
+    """Handles bad request (400) errors with a custom error page."""
+    return render_template("error.html", error=error)
+
+
+@web.app_errorhandler(404)
+def not_found(error):
+    """Handles not found (404) errors with a custom error page."""
+    if request.path.startswith(api_v1.url_prefix):
+        return api_http_error(error)
+    return render_template("error.html", error=error)
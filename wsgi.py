@@ -0,0 +1,11 @@
+"""
+Production entry point: ``gunicorn -c gunicorn.conf.py wsgi:app``.
+
+Gunicorn imports this module in every worker after forking, so each
+worker creates its own engines, caches and threads. Jobs that must run
+once per host (metadata refresh, orphan sweeps, cache purges, pending
+poster checks) run in the worker holding the leader lock only.
+"""
+from app import create_app
+
+app = create_app()